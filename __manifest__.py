@@ -27,6 +27,7 @@
         'finance/views/dino_bank_acc_views.xml',
         'finance/views/dino_bank_transaction_views.xml',
         'finance/views/dino_bank_balance_history_views.xml',
+        'finance/views/dino_bank_cash_position_views.xml',
         'finance/views/dino_currency_rate_views.xml',
         'finance/views/dino_cashbook_views.xml',
 
@@ -37,9 +38,11 @@
         'documents/data/parser_agents.xml',
         'documents/data/groq_parser_agents.xml',
         'documents/data/google_gemini_parser_agents.xml',
+        'documents/data/ir_cron_data.xml',
         'documents/wizard/import_specification_excel_views.xml',
         'documents/views/dino_document_type_views.xml',
         'documents/views/dino_parser_agent_views.xml',
+        'documents/views/dino_parse_job_views.xml',
         'documents/views/dino_document_views.xml',
         'documents/views/dino_document_specification_views.xml',
         'documents/views/dino_document_attachment_views.xml',
@@ -48,6 +51,7 @@
         'projects/views/dino_project_views_sale.xml',
         'projects/views/dino_project_views.xml',
         'projects/views/dino_project_type_views.xml',
+        'projects/views/dino_payment_match_views.xml',
         'projects/security/ir.model.access.csv',
         'projects/data/project_categories.xml',
         'projects/data/project_types.xml',
@@ -78,6 +82,7 @@
 
         'finance/data/ir_cron_data.xml',
         'api_integration/security/ir.model.access.csv',
+        'api_integration/data/ir_cron_data.xml',
         'api_integration/views/dino_api_menu.xml',
         'api_integration/views/dino_api_endpoint_views.xml',
         'core/main_menu_actions.xml',
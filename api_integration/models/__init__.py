@@ -1,4 +1,7 @@
 from . import dino_api_endpoint
 from . import dino_api_log
+from . import dino_api_log_stats
+from . import dino_api_checkpoint
+from . import dino_partner_registry_cache
 
 # -*- End of api_integration/models/__init__.py -*-
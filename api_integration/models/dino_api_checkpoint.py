@@ -0,0 +1,133 @@
+#
+#  -*- File: api_integration/models/dino_api_checkpoint.py -*-
+#
+
+# -*- coding: utf-8 -*-
+import json
+import logging
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class DinoApiCheckpoint(models.Model):
+    """
+    Точка возобновления длинной синхронизации (по одной на endpoint).
+
+    Импортер коммитит страницы пачками и после каждого коммита сохраняет
+    followId следующей страницы. Если импорт упал или исчерпал бюджет
+    страниц на один запуск, следующий тик крона продолжит ровно с этого места.
+    """
+    _name = 'dino.api.checkpoint'
+    _description = 'API Sync Checkpoint'
+    _order = 'write_date desc'
+
+    endpoint_id = fields.Many2one('dino.api.endpoint', string='Endpoint', required=True, ondelete='cascade', index=True)
+    operation_type = fields.Selection(related='endpoint_id.operation_type', store=True)
+    state = fields.Selection([
+        ('running', 'In Progress'),
+        ('done', 'Done'),
+    ], string='State', default='running', required=True)
+
+    # Окно загрузки, для которого валиден next_page_id
+    date_from = fields.Date(string='Date From')
+    date_to = fields.Date(string='Date To')
+    next_page_id = fields.Char(string='Next Page ID', help='followId следующей незагруженной страницы')
+
+    # Очередь окон выписки (Монобанк, см. services/mono_schedule.py) и момент последнего запроса к API
+    pending_windows = fields.Text(string='Pending Windows', help='JSON очереди окон выписки')
+    last_request_at = fields.Datetime(string='Last API Request', help='Для лимита запросов между тиками крона')
+
+    pages_done = fields.Integer(string='Pages Done', default=0)
+    stats = fields.Text(string='Stats', default='{}', help='JSON с накопленной статистикой created/updated/skipped')
+    last_error = fields.Text(string='Last Error')
+
+    _sql_constraints = [
+        ('endpoint_uniq', 'unique(endpoint_id)', 'Only one checkpoint per endpoint!'),
+    ]
+
+    @api.model
+    def get_for(self, endpoint):
+        """Текущий checkpoint endpoint'а (или пустой recordset)."""
+        return self.search([('endpoint_id', '=', endpoint.id)], limit=1)
+
+    @api.model
+    def start(self, endpoint, date_from, date_to=None):
+        """Новый проход с начала окна: сбрасывает followId и статистику."""
+        vals = {
+            'state': 'running',
+            'date_from': date_from,
+            'date_to': date_to,
+            'next_page_id': False,
+            'pending_windows': False,
+            'pages_done': 0,
+            'stats': '{}',
+            'last_error': False,
+        }
+        checkpoint = self.get_for(endpoint)
+        if checkpoint:
+            checkpoint.write(vals)
+        else:
+            checkpoint = self.create(dict(vals, endpoint_id=endpoint.id))
+        return checkpoint
+
+    def is_resumable(self):
+        """Есть незавершенный проход с сохраненным followId."""
+        self.ensure_one()
+        return self.state == 'running' and bool(self.next_page_id)
+
+    def get_stats(self):
+        self.ensure_one()
+        try:
+            return json.loads(self.stats or '{}')
+        except ValueError:
+            return {}
+
+    def save_progress(self, next_page_id, stats, pages=1, commit=True):
+        """
+        Фиксирует обработанные страницы: followId следующей страницы и накопленную статистику.
+        commit=True - коммитит транзакцию, чтобы прогресс пережил падение воркера.
+        """
+        self.ensure_one()
+        self.write({
+            'next_page_id': next_page_id or False,
+            'pages_done': self.pages_done + pages,
+            'stats': json.dumps(stats),
+            'last_error': False,
+        })
+        if commit:
+            self.env.cr.commit()
+            _logger.info(f"Checkpoint {self.endpoint_id.name}: committed, pages={self.pages_done}, next={next_page_id}")
+
+    def save_windows(self, pending_windows, stats, last_request_at=None, pages=0, commit=True):
+        """Фиксирует очередь окон выписки (JSON) и накопленную статистику, как save_progress."""
+        self.ensure_one()
+        vals = {
+            'pending_windows': pending_windows,
+            'pages_done': self.pages_done + pages,
+            'stats': json.dumps(stats),
+            'last_error': False,
+        }
+        if last_request_at:
+            vals['last_request_at'] = last_request_at
+        self.write(vals)
+        if commit:
+            self.env.cr.commit()
+            _logger.info(f"Checkpoint {self.endpoint_id.name}: committed, pages={self.pages_done}")
+
+    def finish(self, stats):
+        self.ensure_one()
+        self.write({'state': 'done', 'next_page_id': False, 'pending_windows': False, 'stats': json.dumps(stats)})
+
+    def record_error(self, error):
+        """Сохраняет ошибку в отдельном курсоре - основная транзакция будет откачена."""
+        self.ensure_one()
+        try:
+            with self.pool.cursor() as cr:
+                cr.execute(
+                    f'UPDATE {self._table} SET last_error = %s, write_date = now() at time zone \'UTC\' WHERE id = %s',
+                    (str(error), self.id)
+                )
+        except Exception:
+            _logger.exception(f"Cannot record checkpoint error for {self.endpoint_id.name}")
+# End of file api_integration/models/dino_api_checkpoint.py
@@ -6,11 +6,9 @@
 import json
 import logging
 import pytz
-from datetime import datetime, timedelta
-from dateutil import relativedelta
+from datetime import datetime
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
-import requests
 
 _logger = logging.getLogger(__name__)
 
@@ -83,8 +81,8 @@ class DinoApiEndpoint(models.Model):
     cron_day_of_month = fields.Integer(string='Day of Month', help='1-31, used for Months interval')
     cron_last_day_of_month = fields.Boolean(string='Last Day of Month', help='If true, overrides Day of Month')
 
-    # Computed next run
-    next_run = fields.Datetime(string='Next Run', compute='_compute_next_run')
+    # Computed next run (stored: cron selects due endpoints with next_run <= now)
+    next_run = fields.Datetime(string='Next Run', compute='_compute_next_run', store=True, index=True)
 
     # Operation parameters (JSON)
     config_params = fields.Text(string='Config Params', default='{}',
@@ -92,6 +90,7 @@ class DinoApiEndpoint(models.Model):
 
     # Relations
     log_ids = fields.One2many('dino.api.log', 'endpoint_id', string='Logs')
+    checkpoint_ids = fields.One2many('dino.api.checkpoint', 'endpoint_id', string='Checkpoints')
 
     # Computed last result
     last_result = fields.Char(string='Last Result', compute='_compute_last_result')
@@ -114,8 +113,9 @@ class DinoApiEndpoint(models.Model):
         url = f"{self.seafile_url.rstrip('/')}/api/v2.1/via-repo-token/repo-info/"
         headers = {'Authorization': f'Token {self.auth_token}'}
 
+        from ..services.http_sessions import get_session
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = get_session(self.seafile_url).get(url, headers=headers, timeout=15)
             if response.status_code == 200:
                 repo_id = response.json().get('repo_id')
                 self.write({'seafile_repo_id': repo_id})
@@ -137,120 +137,28 @@ class DinoApiEndpoint(models.Model):
 
             # Get timezone
             tz = pytz.timezone(record.cron_timezone or 'UTC')
-            now_utc = datetime.now(pytz.UTC)
+            now_local = datetime.now(pytz.UTC).astimezone(tz).replace(tzinfo=None)
 
-            # Base time: last sync in TZ
+            # Base time: last sync in TZ (naive local time)
             base_time = record.last_sync_date
             if base_time:
-                base_time = fields.Datetime.from_string(base_time).replace(tzinfo=pytz.UTC).astimezone(tz)
+                base_time = fields.Datetime.from_string(base_time).replace(tzinfo=pytz.UTC).astimezone(tz).replace(tzinfo=None)
             else:
-                base_time = now_utc.astimezone(tz)
+                base_time = now_local
 
             _logger.debug(f'Computing next_run for {record.name}: base_time={base_time}, tz={tz}')
 
             # Calculate next time
-            next_time = self._calculate_next_run_time(record, base_time, tz)
+            next_time = self._calculate_next_run_time(record, base_time, now_local)
 
             # Convert to UTC for storage (naive datetime)
-            if next_time:
-                record.next_run = next_time.astimezone(pytz.UTC).replace(tzinfo=None)
-                _logger.debug(f'Next run for {record.name}: {record.next_run}')
-            else:
-                record.next_run = False
-                _logger.warning(f'Could not calculate next_run for {record.name}')
-
-    def _calculate_next_run_time(self, record, base_time, tz):
-        """Calculate next run time considering all filters"""
-        interval = record.cron_interval_number or 1
-        itype = record.cron_interval_type or 'days'
-
-        # Start from base_time
-        candidate = base_time
-
-        max_attempts = 1000  # Prevent infinite loop
-        attempts = 0
-
-        while attempts < max_attempts:
-            # Apply interval
-            if itype == 'minutes':
-                candidate += timedelta(minutes=interval)
-            elif itype == 'hours':
-                candidate += timedelta(hours=interval)
-            elif itype == 'days':
-                candidate += timedelta(days=interval)
-            elif itype == 'weeks':
-                candidate += timedelta(weeks=interval)
-            elif itype == 'months':
-                candidate += relativedelta.relativedelta(months=interval)
-            else:
-                candidate += timedelta(days=interval)
-
-            # For Days/Weeks/Months: set exact time from start_time
-            if itype in ('days', 'weeks', 'months'):
-                if record.cron_start_time is not None:
-                    hours = int(record.cron_start_time)
-                    minutes = int((record.cron_start_time - hours) * 60)
-                    candidate = candidate.replace(hour=hours, minute=minutes, second=0, microsecond=0)
-
-                # Apply day of month for months
-                if itype == 'months':
-                    if record.cron_last_day_of_month:
-                        # Last day of month
-                        next_month = candidate.replace(day=28) + timedelta(days=4)
-                        candidate = next_month - timedelta(days=next_month.day)
-                    elif record.cron_day_of_month:
-                        try:
-                            candidate = candidate.replace(day=record.cron_day_of_month)
-                        except ValueError:
-                            # Invalid day, use last day
-                            next_month = candidate.replace(day=28) + timedelta(days=4)
-                            candidate = next_month - timedelta(days=next_month.day)
-
-            # For Minutes/Hours: check if within window
-            elif itype in ('minutes', 'hours'):
-                if record.cron_start_time is not None and record.cron_end_time is not None:
-                    start_h = int(record.cron_start_time)
-                    start_m = int((record.cron_start_time - start_h) * 60)
-                    end_h = int(record.cron_end_time)
-                    end_m = int((record.cron_end_time - end_h) * 60)
-
-                    start_window = candidate.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
-                    end_window = candidate.replace(hour=end_h, minute=end_m, second=0, microsecond=0)
-
-                    if candidate < start_window:
-                        candidate = start_window
-                    elif candidate > end_window:
-                        # Move to next day start
-                        candidate = (candidate + timedelta(days=1)).replace(hour=start_h, minute=start_m, second=0, microsecond=0)
-
-            # Check weekdays
-            weekday_map = {
-                0: record.cron_monday,
-                1: record.cron_tuesday,
-                2: record.cron_wednesday,
-                3: record.cron_thursday,
-                4: record.cron_friday,
-                5: record.cron_saturday,
-                6: record.cron_sunday,
-            }
-            allowed_weekdays = [day for day, enabled in weekday_map.items() if enabled]
-            
-            if allowed_weekdays:
-                current_wd = candidate.weekday()  # 0=Mon, 6=Sun
-                if current_wd not in allowed_weekdays:
-                    # Find next allowed weekday
-                    days_ahead = min((wd - current_wd) % 7 for wd in allowed_weekdays)
-                    if days_ahead == 0:
-                        days_ahead = 7  # Next week
-                    candidate += timedelta(days=days_ahead)
-
-            # Ensure it's in future
-            if candidate > datetime.now(tz):
-                return candidate
-
-            attempts += 1
-
-        return None  # Could not find valid time
+            record.next_run = tz.localize(next_time).astimezone(pytz.UTC).replace(tzinfo=None)
+            _logger.debug(f'Next run for {record.name}: {record.next_run}')
+
+    def _calculate_next_run_time(self, record, base_time, now):
+        """Next slot after `now` considering interval, window, weekdays and day of month (local naive time)"""
+        from ..services.cron_schedule import next_run_time, schedule_from_record
+        return next_run_time(schedule_from_record(record), base_time, now)
 
     @api.depends('log_ids')
     def _compute_last_result(self):
@@ -334,31 +242,39 @@ class DinoApiEndpoint(models.Model):
     
 
 
-    def run_endpoint(self, trigger_type='manual'):
-        """Execute the endpoint"""
+    def run_endpoint(self, trigger_type='manual', metrics=None):
+        """
+        Execute the endpoint
+
+        :param metrics: RunMetrics to fill; the cron passes its own to log a failed run after rollback
+        """
         self.ensure_one()
+        from ..services.http_sessions import configure_from_env
+        from ..services.run_metrics import RunMetrics
         _logger.info(f"Running endpoint: {self.name} (trigger: {trigger_type})")
 
+        # Pool size / retries / idle eviction of shared HTTP sessions (system parameters)
+        configure_from_env(self.env)
+
+        metrics = metrics if metrics is not None else RunMetrics(self.env.cr)
+        handler = None
         try:
             # Get handler
             handler_class = self._get_handler_class()
-            handler = handler_class(self)
-            result = handler.execute()
-
-            # Log success with progress steps if available
-            if isinstance(result, dict) and 'steps' in result:
-                # Create progress log entries
-                for step in result['steps']:
-                    self._log_execution('info', {'progress': step}, 'progress')
-                # Log final result
-                self._log_execution('success', result.get('final', result), trigger_type)
-            else:
-                self._log_execution('success', result, trigger_type)
+            handler = handler_class(self, trigger_type=trigger_type)
+            with metrics:
+                result = handler.execute()
+
+            # Log success: one row per run, progress steps as a JSON document
+            final = result.get('final', result) if isinstance(result, dict) else result
+            metrics.set_rows(final)
+            self._log_execution('success', final, trigger_type, metrics=metrics, steps=handler.steps)
             return result
 
         except Exception as e:
             _logger.error(f"Endpoint {self.name} failed: {e}")
-            self._log_execution('error', str(e), trigger_type)
+            self._log_execution('error', str(e), trigger_type, metrics=metrics,
+                                steps=handler.steps if handler else None)
             raise
 
     def _get_handler_class(self):
@@ -387,16 +303,21 @@ class DinoApiEndpoint(models.Model):
 
         return handler_class
 
-    def _log_execution(self, status, data, trigger_type='manual'):
-        """Log execution result"""
-        self.env['dino.api.log'].create({
+    def _log_execution(self, status, data, trigger_type='manual', metrics=None, steps=None):
+        """Log execution result with run metrics (wall/HTTP/DB time, pages, rows, queries)"""
+        vals = {
             'endpoint_id': self.id,
             'trigger_type': trigger_type,
             'status': status,
             'request_data': json.dumps({'endpoint': self.name, 'operation': self.operation_type}, ensure_ascii=False),
             'response_data': json.dumps(data, ensure_ascii=False) if isinstance(data, dict) else str(data),
-            'execution_time': 0  # TODO: measure actual time
-        })
+            'execution_time': 0,
+        }
+        if metrics is not None:
+            vals.update(metrics.as_log_vals())
+        if steps:
+            vals['progress_data'] = json.dumps({'steps': steps}, ensure_ascii=False)
+        self.env['dino.api.log'].create(vals)
 
     @api.model
     def _get_timezone_selection(self):
@@ -33,4 +33,15 @@ class DinoApiLog(models.Model):
     error_message = fields.Text(string='Error Message')
     execution_time = fields.Float(string='Execution Time (sec)', help='Time in seconds')
 
+    # Metrics of the run (see services/run_metrics.py)
+    operation_type = fields.Selection(related='endpoint_id.operation_type', store=True, index=True)
+    http_time = fields.Float(string='HTTP Time (sec)', help='Сумма времени HTTP запросов, включая фоновые потоки')
+    http_requests = fields.Integer(string='HTTP Requests')
+    db_time = fields.Float(string='DB Time (sec)', help='Время SQL запросов курсора запуска')
+    query_count = fields.Integer(string='SQL Queries')
+    pages = fields.Integer(string='Pages Fetched')
+    rows = fields.Integer(string='Rows', help='created + updated + skipped')
+    rows_per_sec = fields.Float(string='Rows/sec')
+    progress_data = fields.Text(string='Progress', help='JSON: шаги выполнения одного запуска')
+
 # End of file api_integration/models/dino_api_log.py# End of file api_integration/models/dino_api_log.py
@@ -0,0 +1,67 @@
+#
+#  -*- File: api_integration/models/dino_api_log_stats.py -*-
+#
+
+# -*- coding: utf-8 -*-
+from odoo import fields, models, tools
+
+
+class DinoApiLogStats(models.Model):
+    """
+    Агрегат длительности запусков по типу операции и неделе (SQL view над dino.api.log).
+
+    p50/p95 по неделям показывают регрессии синхронизаций: рост p95 при том же
+    числе строк - повод смотреть HTTP/DB время в отдельных логах.
+    Успешные логи без замера (execution_time = 0, до появления метрик) не учитываются;
+    ошибки учитываются всегда, но в длительности попадают только замеренные.
+    """
+    _name = 'dino.api.log.stats'
+    _description = 'API Execution Stats'
+    _auto = False
+    _order = 'week desc, operation_type'
+
+    operation_type = fields.Selection(
+        selection=lambda self: self.env['dino.api.endpoint']._fields['operation_type'].selection,
+        string='Operation', readonly=True)
+    week = fields.Date(string='Week', readonly=True)
+    run_count = fields.Integer(string='Runs', readonly=True)
+    error_count = fields.Integer(string='Errors', readonly=True)
+    avg_duration = fields.Float(string='Avg (sec)', readonly=True)
+    p50_duration = fields.Float(string='p50 (sec)', readonly=True)
+    p95_duration = fields.Float(string='p95 (sec)', readonly=True)
+    max_duration = fields.Float(string='Max (sec)', readonly=True)
+    avg_http_time = fields.Float(string='Avg HTTP (sec)', readonly=True)
+    avg_db_time = fields.Float(string='Avg DB (sec)', readonly=True)
+    avg_query_count = fields.Float(string='Avg SQL Queries', readonly=True)
+    avg_rows_per_sec = fields.Float(string='Avg Rows/sec', readonly=True)
+    last_run = fields.Datetime(string='Last Run', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT
+                    MIN(l.id) AS id,
+                    l.operation_type,
+                    date_trunc('week', l.executed_at)::date AS week,
+                    COUNT(*) AS run_count,
+                    COUNT(*) FILTER (WHERE l.status = 'error') AS error_count,
+                    AVG(l.execution_time) FILTER (WHERE l.execution_time > 0) AS avg_duration,
+                    percentile_cont(0.5) WITHIN GROUP (ORDER BY l.execution_time)
+                        FILTER (WHERE l.execution_time > 0) AS p50_duration,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY l.execution_time)
+                        FILTER (WHERE l.execution_time > 0) AS p95_duration,
+                    MAX(l.execution_time) AS max_duration,
+                    AVG(l.http_time) AS avg_http_time,
+                    AVG(l.db_time) AS avg_db_time,
+                    AVG(l.query_count) AS avg_query_count,
+                    AVG(l.rows_per_sec) AS avg_rows_per_sec,
+                    MAX(l.executed_at) AS last_run
+                FROM dino_api_log l
+                WHERE l.status IN ('success', 'error')
+                  AND (l.execution_time > 0 OR l.status = 'error')
+                  AND l.operation_type IS NOT NULL
+                GROUP BY l.operation_type, date_trunc('week', l.executed_at)
+            )
+        """)
+# End of file api_integration/models/dino_api_log_stats.py
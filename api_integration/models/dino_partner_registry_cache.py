@@ -0,0 +1,75 @@
+#
+#  -*- File: api_integration/models/dino_partner_registry_cache.py -*-
+#
+
+# -*- coding: utf-8 -*-
+import json
+from odoo import api, fields, models
+
+# Поля реестра с датами: в JSON хранятся строкой ISO
+DATE_FIELDS = ('date_from', 'date_to', 'inn_date', 'last_update')
+
+
+class DinoPartnerRegistryCache(models.Model):
+    """
+    Кэш ответов реестра ЕДРПОУ (adm.tools), по одной строке на код.
+
+    update_partners_from_registry не ходит в реестр за кодами, чей кэш
+    моложе TTL, а по last_update из реестра видит, что компания не менялась.
+    """
+    _name = 'dino.partner.registry.cache'
+    _description = 'EGRPOU Registry Cache'
+    _rec_name = 'egrpou'
+    _order = 'fetched_at desc'
+
+    egrpou = fields.Char(string='EGRPOU', required=True, index=True)
+    data = fields.Text(string='Data', default='{}', help='JSON с разобранными полями реестра')
+    last_update = fields.Date(string='Registry Last Update', help='Дата последнего изменения компании в реестре')
+    fetched_at = fields.Datetime(string='Fetched At', required=True, default=fields.Datetime.now, index=True)
+
+    _sql_constraints = [
+        ('egrpou_uniq', 'unique(egrpou)', 'Only one registry cache entry per EGRPOU!'),
+    ]
+
+    @api.model
+    def get_map(self, codes):
+        """Записи кэша по кодам одним запросом: {egrpou: record}."""
+        if not codes:
+            return {}
+        entries = self.search_fetch([('egrpou', 'in', list(codes))], ['egrpou', 'data', 'last_update', 'fetched_at'])
+        return {entry.egrpou: entry for entry in entries}
+
+    def get_vals(self):
+        """Поля партнера из кэша (даты - объектами date, как отдает fetch_partner_registry_data)."""
+        self.ensure_one()
+        try:
+            vals = json.loads(self.data or '{}')
+        except ValueError:
+            return {}
+        for key in DATE_FIELDS:
+            if vals.get(key):
+                vals[key] = fields.Date.to_date(vals[key])
+        return vals
+
+    @api.model
+    def store(self, results, existing=None):
+        """
+        Сохраняет свежие ответы реестра {egrpou: vals}.
+        existing - уже загруженные записи {egrpou: record} (см. get_map), новые создаются одним create.
+        """
+        existing = existing if existing is not None else self.get_map(results)
+        now = fields.Datetime.now()
+        create_list = []
+        for code, vals in results.items():
+            entry_vals = {
+                'data': json.dumps(vals, default=str, ensure_ascii=False),
+                'last_update': vals.get('last_update') or False,
+                'fetched_at': now,
+            }
+            if code in existing:
+                existing[code].write(entry_vals)
+            else:
+                create_list.append(dict(entry_vals, egrpou=code))
+        if create_list:
+            self.create(create_list)
+# End of file api_integration/models/dino_partner_registry_cache.py
@@ -1,5 +1,6 @@
 from . import api_client
-from . import handlers# End of file api_integration/services/__init__.py
+from . import handlers
+from . import api_cron# End of file api_integration/services/__init__.py
 
 
 # -*- End of dino_erp/api_integration\services\__init__.py -*-
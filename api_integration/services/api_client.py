@@ -5,8 +5,8 @@
 import requests
 import json
 import logging
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from . import http_sessions
 
 _logger = logging.getLogger(__name__)
 
@@ -16,39 +16,35 @@ class ApiClient:
 
     def __init__(self, endpoint):
         self.endpoint = endpoint
-        self.session = requests.Session()
+        self.headers = {}
+        self.auth = None
         self._setup_session()
 
     def _setup_session(self):
-        """Setup session with authentication and retry strategy"""
+        """Setup authentication and headers; retry strategy and pooling come from http_sessions"""
         # Authentication
         if self.endpoint.auth_type == 'token':
-            self.session.headers['X-Token'] = self.endpoint.auth_token
+            self.headers['X-Token'] = self.endpoint.auth_token
         elif self.endpoint.auth_type == 'api_key':
-            self.session.headers['X-API-Key'] = self.endpoint.auth_api_key
+            self.headers['X-API-Key'] = self.endpoint.auth_api_key
         elif self.endpoint.auth_type == 'basic':
-            self.session.auth = (self.endpoint.auth_username, self.endpoint.auth_password)
+            self.auth = (self.endpoint.auth_username, self.endpoint.auth_password)
 
         # Common headers
-        self.session.headers.update({
+        self.headers.update({
             'User-Agent': 'DinoERP Integration',
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         })
 
-        # Retry strategy
-        retries = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504]
-        )
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
-        self.session.mount('http://', HTTPAdapter(max_retries=retries))
+    def _session_for(self, url):
+        """Shared pooled session for the URL host and this endpoint's credentials"""
+        return http_sessions.get_session(url, headers=self.headers, auth=self.auth)
 
     def execute_request(self, method='GET', url=None, params=None, data=None, timeout=30):
         """Execute HTTP request"""
         try:
-            response = self.session.request(
+            response = self._session_for(url).request(
                 method=method,
                 url=url,
                 params=params,
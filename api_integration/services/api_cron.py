@@ -3,11 +3,83 @@
 #
 # -*- coding: utf-8 -*-
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from odoo import api, fields, models, _
 
+from .run_metrics import RunMetrics
+
 _logger = logging.getLogger(__name__)
 
+# Пространство имен advisory-локов эндпоинтов (первый ключ pg_try_advisory_lock)
+_ENDPOINT_LOCK_NAMESPACE = 7341
+
+
+def _run_endpoint_isolated(registry, uid, context, endpoint_id):
+    """
+    Запускает один эндпоинт в собственном курсоре/транзакции.
+
+    Захват: SELECT ... FOR UPDATE SKIP LOCKED по строке эндпоинта - другой
+    воркер крона, который уже держит строку, просто пропускается. Импортеры
+    с checkpoint коммитят посреди работы (и этим снимают row lock), поэтому
+    на время запуска дополнительно берется сессионный advisory lock.
+
+    Ошибка откатывает только транзакцию этого эндпоинта; в новой транзакции
+    пишется лог ошибки с метриками запуска и next_run сдвигается на следующий
+    слот расписания - иначе упавший эндпоинт (например, с просроченным
+    токеном) запускался бы каждую минуту.
+    """
+    with registry.cursor() as cr:
+        cr.execute(
+            "SELECT id FROM dino_api_endpoint WHERE id = %s AND active AND cron_active FOR UPDATE SKIP LOCKED",
+            (endpoint_id,)
+        )
+        if not cr.fetchone():
+            _logger.info(f'Endpoint {endpoint_id} is claimed by another cron worker, skipping')
+            return False
+        cr.execute("SELECT pg_try_advisory_lock(%s, %s)", (_ENDPOINT_LOCK_NAMESPACE, endpoint_id))
+        if not cr.fetchone()[0]:
+            _logger.info(f'Endpoint {endpoint_id} is still running in another cron worker, skipping')
+            return False
+
+        try:
+            env = api.Environment(cr, uid, context)
+            ep = env['dino.api.endpoint'].browse(endpoint_id)
+            # Пока ждали очереди, эндпоинт мог выполнить другой воркер
+            if not ep.next_run or ep.next_run > fields.Datetime.now():
+                _logger.debug(f'Endpoint {ep.name} is no longer due, skipping')
+                return False
+
+            _logger.info(f'Running scheduled endpoint: {ep.name} (ID: {ep.id})')
+            metrics = RunMetrics(cr)
+            try:
+                # Mark as running
+                ep.write({'cron_running': True})
+                # Run endpoint with cron trigger
+                ep.run_endpoint(trigger_type='cron', metrics=metrics)
+                # After successful run, advance next_run
+                ep._advance_next_run()
+                cr.commit()
+                _logger.info(f'Successfully completed endpoint: {ep.name}')
+                return True
+            except Exception as e:
+                _logger.exception(f'Failed to run endpoint {endpoint_id}')
+                cr.rollback()
+                # Лог ошибки был откачен вместе с транзакцией - пишем заново
+                ep = env['dino.api.endpoint'].browse(endpoint_id)
+                ep._log_execution('error', str(e), 'cron', metrics=metrics)
+                # Следующая попытка - в следующий слот расписания
+                ep._advance_next_run()
+                cr.commit()
+                return False
+        finally:
+            # Все успешные ветки уже закоммичены; если упали лог или commit,
+            # транзакция в состоянии aborted - unlock на ней не выполнится
+            # и лок останется на соединении пула
+            cr.rollback()
+            cr.execute("SELECT pg_advisory_unlock(%s, %s)", (_ENDPOINT_LOCK_NAMESPACE, endpoint_id))
+            cr.commit()
+
 
 class DinoApiCron(models.Model):
     _inherit = 'dino.api.endpoint'
@@ -15,43 +87,58 @@ class DinoApiCron(models.Model):
     # ------------------------------------------------------------------
     # РАЗДЕЛ: Оркестрация / Точки входа планировщика (cron)
     # ------------------------------------------------------------------
-    
+
     def _advance_next_run(self):
         """Advance next_run by updating last_sync_date, which triggers recompute of next_run."""
         for rec in self:
             rec.last_sync_date = fields.Datetime.now()
 
+    @api.model
+    def _get_due_endpoint_ids(self):
+        """IDs of active cron endpoints whose next_run has come, ordered by cron_priority (0 first)."""
+        # next_run хранится и индексирован - отбор целиком в SQL
+        endpoints = self.search([
+            ('active', '=', True),
+            ('cron_active', '=', True),
+            ('next_run', '<=', fields.Datetime.now()),
+        ], order='cron_priority, id')
+        _logger.info(f'Cron check: found {len(endpoints)} due endpoints')
+        return endpoints.ids
+
     @api.model
     def cron_run_endpoints(self):
-        """Cron entrypoint: check per-endpoint `cron_active` and `next_run`, run endpoint when due and advance `next_run` accordingly."""
-        # consider only active endpoints which have cron enabled
-        endpoints = self.search([('active', '=', True), ('cron_active', '=', True)])
-        now = fields.Datetime.now()
-        _logger.info(f'Cron check: found {len(endpoints)} active endpoints with cron enabled')
-        
-        for ep in endpoints:
-            try:
-                # If no next_run is set, skip
-                if not ep.next_run:
-                    _logger.debug(f'Skipping endpoint {ep.name} (ID: {ep.id}): next_run not set')
-                    continue
-                
-                # Compare times
-                _logger.debug(f'Endpoint {ep.name}: next_run={ep.next_run}, now={now}')
-                if ep.next_run <= now:
-                    _logger.info(f'Running scheduled endpoint: {ep.name} (ID: {ep.id})')
-                    try:
-                        # Mark as running
-                        ep.write({'cron_running': True})
-                        # Run endpoint with cron trigger
-                        ep.run_endpoint(trigger_type='cron')
-                        # After successful run, advance next_run
-                        ep._advance_next_run()
-                        _logger.info(f'Successfully completed endpoint: {ep.name}')
-                    except Exception:
-                        _logger.exception(f'Failed to run endpoint {ep.name} (ID: {ep.id})')
-                else:
-                    _logger.debug(f'Endpoint {ep.name} not due yet (next_run: {ep.next_run})')
-            except Exception:
-                _logger.exception(f'Unexpected error in cron_run_endpoints for endpoint {ep.name} (ID: {ep.id})')
+        """
+        Cron entrypoint: dispatch due endpoints, each in its own cursor/transaction.
+
+        Endpoints are started in `cron_priority` order. With the system parameter
+        `dino_api.cron_workers` > 1 independent endpoints run concurrently in a
+        thread pool; several Odoo cron workers can call this at the same time,
+        the row claim guarantees an endpoint is not run twice.
+        """
+        due_ids = self._get_due_endpoint_ids()
+        if not due_ids:
+            return
+
+        workers = int(self.env['ir.config_parameter'].sudo().get_param('dino_api.cron_workers', 1) or 1)
+        registry, uid, context = self.env.registry, self.env.uid, dict(self.env.context)
+        _logger.info(f'Dispatching {len(due_ids)} due endpoints with {workers} worker(s)')
+
+        if workers <= 1 or len(due_ids) == 1:
+            for endpoint_id in due_ids:
+                try:
+                    _run_endpoint_isolated(registry, uid, context, endpoint_id)
+                except Exception:
+                    _logger.exception(f'Unexpected error in cron_run_endpoints for endpoint ID {endpoint_id}')
+            return
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dino-api-cron') as pool:
+            futures = [
+                pool.submit(_run_endpoint_isolated, registry, uid, context, endpoint_id)
+                for endpoint_id in due_ids
+            ]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    _logger.exception('Unexpected error in cron_run_endpoints worker')
 # End of file api_integration/services/api_cron.py
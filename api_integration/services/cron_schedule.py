@@ -0,0 +1,228 @@
+#
+#  -*- File: api_integration/services/cron_schedule.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Расчет следующего запуска эндпоинта по расписанию крона без перебора.
+
+Все вычисления в "наивном" локальном времени часового пояса эндпоинта:
+перевод из/в UTC делает модель (DinoApiEndpoint._compute_next_run).
+
+Семантика совпадает с прежним пошаговым циклом (+интервал, окно, дни недели),
+но вместо до 1000 шагов по одному интервалу движок прыгает сразу к нужному
+слоту: O(1) для minutes/hours, O(7) для days/weeks (цикл по дням недели),
+по одному шагу на интервал для months. Отличия от старого цикла:
+  - результат находится всегда (старый цикл возвращал None после 1000 шагов);
+  - окно end <= start (в т.ч. не заполненное 0:00-0:00) считается "без окна",
+    а не прижимает каждый запуск к полуночи следующего дня.
+"""
+import calendar
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+INTERVAL_STEPS = {
+    'minutes': timedelta(minutes=1),
+    'hours': timedelta(hours=1),
+    'days': timedelta(days=1),
+    'weeks': timedelta(weeks=1),
+}
+
+CronSchedule = namedtuple('CronSchedule', [
+    'interval',          # cron_interval_number
+    'interval_type',     # minutes/hours/days/weeks/months
+    'start_time',        # float часов, 9.5 = 09:30
+    'end_time',          # float часов, только для minutes/hours
+    'weekdays',          # frozenset разрешенных дней недели (0=Пн), пустой = все
+    'day_of_month',      # 1-31 или 0
+    'last_day_of_month',
+])
+
+
+def float_to_time(value):
+    """9.5 -> time(9, 30); то же округление, что было в старом расчете."""
+    value = value or 0.0
+    hours = int(value)
+    minutes = int((value - hours) * 60)
+    return time(hours, minutes)
+
+
+def schedule_from_record(record):
+    """CronSchedule из полей cron_* записи dino.api.endpoint."""
+    flags = (record.cron_monday, record.cron_tuesday, record.cron_wednesday, record.cron_thursday,
+             record.cron_friday, record.cron_saturday, record.cron_sunday)
+    return CronSchedule(
+        interval=max(record.cron_interval_number or 1, 1),
+        interval_type=record.cron_interval_type or 'days',
+        start_time=record.cron_start_time or 0.0,
+        end_time=record.cron_end_time or 0.0,
+        weekdays=frozenset(day for day, enabled in enumerate(flags) if enabled),
+        day_of_month=record.cron_day_of_month or 0,
+        last_day_of_month=bool(record.cron_last_day_of_month),
+    )
+
+
+def _days_to_allowed(weekday, weekdays):
+    """Сколько дней до ближайшего разрешенного дня недели (0 - текущий разрешен)."""
+    if not weekdays or weekday in weekdays:
+        return 0
+    return min((wd - weekday) % 7 for wd in weekdays)
+
+
+def _add_months(moment, months):
+    """relativedelta(months=n): день прижимается к концу месяца."""
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def _window(schedule):
+    """(start, end) окна minutes/hours или None, если окно не задано."""
+    start, end = float_to_time(schedule.start_time), float_to_time(schedule.end_time)
+    if end <= start:
+        return None
+    return start, end
+
+
+def _step(schedule, candidate):
+    """Один шаг прежнего цикла: +интервал, окно/время/день месяца, день недели."""
+    itype = schedule.interval_type
+    if itype == 'months':
+        candidate = _add_months(candidate, schedule.interval)
+    else:
+        candidate += INTERVAL_STEPS.get(itype, INTERVAL_STEPS['days']) * schedule.interval
+
+    if itype in ('minutes', 'hours'):
+        window = _window(schedule)
+        if window:
+            start_window = datetime.combine(candidate.date(), window[0])
+            if candidate < start_window:
+                candidate = start_window
+            elif candidate > datetime.combine(candidate.date(), window[1]):
+                candidate = start_window + timedelta(days=1)
+    else:
+        candidate = datetime.combine(candidate.date(), float_to_time(schedule.start_time))
+        if itype == 'months':
+            candidate = candidate.replace(day=_month_day(schedule, candidate))
+
+    return candidate + timedelta(days=_days_to_allowed(candidate.weekday(), schedule.weekdays))
+
+
+def _month_day(schedule, moment):
+    """День месяца слота months: последний, заданный (с прижатием к концу месяца) или текущий."""
+    last_day = calendar.monthrange(moment.year, moment.month)[1]
+    if schedule.last_day_of_month:
+        return last_day
+    if schedule.day_of_month:
+        return min(schedule.day_of_month, last_day)
+    return moment.day
+
+
+def next_run_time(schedule, base, now):
+    """
+    Ближайший слот расписания строго позже now.
+
+    base - время последней синхронизации (или now), оба аргумента - наивные
+    datetime в часовом поясе расписания.
+    """
+    candidate = _step(schedule, base)
+    if candidate > now:
+        return candidate
+
+    itype = schedule.interval_type
+    if itype in ('minutes', 'hours'):
+        return _next_intraday(schedule, candidate, now)
+    if itype == 'months':
+        return _next_monthly(schedule, candidate, now)
+    return _next_daily(schedule, candidate, now)
+
+
+def _next_intraday(schedule, anchor, now):
+    """
+    minutes/hours. anchor - уже пройденный слот (<= now).
+
+    Слоты идут блоками: от anchor с шагом интервала до конца окна (или до
+    запрещенного дня недели), затем один шаг старого цикла переносит начало
+    следующего блока. Внутри блока ответ считается арифметически, а переход
+    между блоками зависит только от (день недели, время начала блока) -
+    повторившееся состояние дает цикл, который пропускается целиком.
+    """
+    step = INTERVAL_STEPS[schedule.interval_type] * schedule.interval
+    window = _window(schedule)
+    seen = {}
+    candidate = anchor
+    while candidate <= now:
+        last = _block_end(schedule, candidate, step, window, now)
+        if last is None or last > now:
+            return candidate + step * ((now - candidate) // step + 1)
+        state = (candidate.weekday(), candidate.time())
+        if state in seen:
+            cycle_days = (candidate.date() - seen.pop(state)).days
+            candidate += timedelta(days=cycle_days * ((now - candidate).days // cycle_days))
+            seen = {}
+            continue
+        seen[state] = candidate.date()
+        candidate = _step(schedule, last)
+    return candidate
+
+
+def _block_end(schedule, candidate, step, window, now):
+    """Последний слот блока, начатого в candidate; None - блок не кончается до now."""
+    if window:
+        day_end = datetime.combine(candidate.date(), window[1])
+        return candidate + step * max((day_end - candidate) // step, 0)
+    if not schedule.weekdays or len(schedule.weekdays) == 7:
+        return None
+
+    if step < timedelta(days=1):
+        # Первый слот, попавший в ближайший запрещенный день
+        day = candidate.date() + timedelta(days=1)
+        while day.weekday() in schedule.weekdays:
+            day += timedelta(days=1)
+        day_start = datetime.combine(day, time.min)
+        return candidate + step * (-((candidate - day_start) // step) - 1)
+
+    # Интервал от суток: слоты перескакивают дни, проверяем их до now
+    for k in range(1, (now - candidate) // step + 2):
+        if (candidate + step * k).weekday() not in schedule.weekdays:
+            return candidate + step * (k - 1)
+    return None
+
+
+def _next_daily(schedule, anchor, now):
+    """
+    days/weeks. Время слота фиксировано, а сдвиг на следующий слот зависит
+    только от дня недели текущего - последовательность дней недели зациклена
+    (не более 7 состояний). Прыгаем целыми циклами, затем добираем шагами.
+    """
+    candidate = anchor
+    seen = {}
+    path = []
+    while candidate <= now:
+        weekday = candidate.weekday()
+        if weekday in seen:
+            cycle_start = seen[weekday]
+            cycle_days = (candidate - path[cycle_start]).days
+            cycles = (now - candidate).days // cycle_days
+            candidate += timedelta(days=cycle_days * cycles)
+            # После прыжка осталось меньше одного цикла
+            while candidate <= now:
+                candidate = _step(schedule, candidate)
+            return candidate
+        seen[weekday] = len(path)
+        path.append(candidate)
+        candidate = _step(schedule, candidate)
+    return candidate
+
+
+def _next_monthly(schedule, anchor, now):
+    """
+    months: шаги по одному интервалу. День слота может "дрейфовать" от сдвигов
+    по дням недели, поэтому пропустить месяцы арифметически нельзя, но шагов
+    не больше, чем интервалов с момента последней синхронизации.
+    """
+    candidate = anchor
+    while candidate <= now:
+        candidate = _step(schedule, candidate)
+    return candidate
+# End of file api_integration/services/cron_schedule.py
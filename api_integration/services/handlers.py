@@ -9,6 +9,7 @@ Each handler wraps existing services and provides unified interface
 
 import json
 import logging
+import time
 from datetime import datetime, timedelta
 
 _logger = logging.getLogger(__name__)
@@ -19,14 +20,39 @@ class BaseApiHandler:
 
     required_auth_fields = []  # Default: no auth required
 
-    def __init__(self, endpoint):
+    def __init__(self, endpoint, trigger_type='manual'):
         self.endpoint = endpoint
         self.env = endpoint.env
+        self.trigger_type = trigger_type
+        # Progress of the run: stored as one JSON document in dino.api.log
+        self.steps = []
+        self._started = time.perf_counter()
 
     def execute(self):
         """Main execution method"""
         raise NotImplementedError
 
+    def _checkpoint_every(self, params):
+        """
+        Pages between intermediate commits of resumable imports (SyncCheckpoint).
+        Only the cron runs in its own transaction; a manual run happens inside the
+        UI request, which must stay able to roll back - no mid-run commits there
+        (Mono statements follow the same rule through their commit flag).
+        """
+        if self.trigger_type != 'cron':
+            return 0
+        return params.get('checkpoint_every', 1)
+
+    def log_step(self, message):
+        """Add a progress step (wall clock + seconds since handler start)"""
+        step = {
+            'time': datetime.now().strftime('%H:%M:%S'),
+            'elapsed': round(time.perf_counter() - self._started, 3),
+            'message': message,
+        }
+        self.steps.append(step)
+        return step
+
     def _standardize_result(self, service_result):
         """Convert service result to standard format"""
         if isinstance(service_result, dict) and 'stats' in service_result:
@@ -42,7 +68,8 @@ class BaseApiHandler:
                 },
                 'metadata': {
                     'operation': self.endpoint.operation_type,
-                    'bank': self.endpoint.bank_id.name if self.endpoint.bank_id else None
+                    'bank': self.endpoint.bank_id.name if self.endpoint.bank_id else None,
+                    'matching': service_result.get('matching'),
                 }
             }
         return service_result
@@ -54,17 +81,13 @@ class NbuRatesHandler(BaseApiHandler):
 
     def execute(self):
         progress = {
-            'steps': [],
+            'steps': self.steps,
             'final': {}
         }
 
         def log_step(message):
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            step_msg = f"{timestamp} - {message}"
-            progress['steps'].append(step_msg)
-            _logger.warning(f"NbuRatesHandler: {message}")
-            # Log intermediate step to database
-            self.endpoint._log_execution('info', {'step': step_msg}, 'progress')
+            self.log_step(message)
+            _logger.info(f"NbuRatesHandler: {message}")
 
         log_step(">>> START EXECUTION")
         log_step(f"Endpoint: '{self.endpoint.name}'")
@@ -149,7 +172,12 @@ class PrivatTransactionsHandler(BaseApiHandler):
         result = import_transactions(
             self.endpoint,
             startDate=params.get('start_date'),
-            endDate=params.get('end_date')
+            endDate=params.get('end_date'),
+            prefetch=params.get('prefetch_pages', 2),
+            per_account=params.get('per_account', False),
+            rate_limit=params.get('rate_limit'),
+            checkpoint_every=self._checkpoint_every(params),
+            max_pages=params.get('max_pages_per_run', 0)
         )
 
         return self._standardize_result(result)
@@ -162,10 +190,16 @@ class PrivatBalanceHistoryHandler(BaseApiHandler):
     def execute(self):
         from .privat_balance_history import import_balance_history
 
+        params = json.loads(self.endpoint.config_params or '{}')
         # Используем start_date из самой модели endpoint, НЕ из config_params
         result = import_balance_history(
             self.endpoint,
-            startDate=self.endpoint.start_date  # Берем из поля модели
+            startDate=self.endpoint.start_date,  # Берем из поля модели
+            prefetch=params.get('prefetch_pages', 2),
+            per_account=params.get('per_account', False),
+            rate_limit=params.get('rate_limit'),
+            checkpoint_every=self._checkpoint_every(params),
+            max_pages=params.get('max_pages_per_run', 0)
         )
 
         return self._standardize_result(result)
@@ -173,11 +207,14 @@ class PrivatBalanceHistoryHandler(BaseApiHandler):
 
 # Placeholder handlers for Mono and Partners
 class MonoClientInfoHandler(BaseApiHandler):
+    """Handler for Mono account discovery (client-info -> dino.bank.account)"""
     required_auth_fields = ['token']
 
     def execute(self):
-        # TODO: Implement Mono client info
-        return {'status': 'success', 'data': {'message': 'Not implemented yet'}}
+        from .mono_service import import_mono_accounts
+
+        result = import_mono_accounts(self.endpoint)
+        return self._standardize_result(result)
 
 
 class MonoRatesHandler(BaseApiHandler):
@@ -189,11 +226,23 @@ class MonoRatesHandler(BaseApiHandler):
 
 
 class MonoTransactionsHandler(BaseApiHandler):
+    """Handler for Mono statements: 31-day windows spread across cron ticks"""
     required_auth_fields = ['token']
 
     def execute(self):
-        # TODO: Implement Mono transactions
-        return {'status': 'success', 'data': {'message': 'Not implemented yet'}}
+        from .mono_service import sync_mono_transactions
+        from .mono_schedule import MIN_INTERVAL
+
+        params = json.loads(self.endpoint.config_params or '{}')
+        result = sync_mono_transactions(
+            self.endpoint,
+            max_calls=params.get('max_calls_per_run', 1),
+            min_interval=params.get('min_interval', MIN_INTERVAL),
+            window_days=params.get('window_days'),
+            commit=self.trigger_type == 'cron',
+        )
+        self.log_step(f"Mono statements: {result.get('pending_windows', 0)} windows pending")
+        return self._standardize_result(result)
 
 
 class PartnersUpdateHandler(BaseApiHandler):
@@ -207,5 +256,8 @@ class PartnersUpdateHandler(BaseApiHandler):
         params = json.loads(self.endpoint.config_params or '{}')
         partner_ids = params.get('partner_ids')  # Optional: specific partners
         
-        result = update_partners_from_registry(self.env, partner_ids)
+        # Optional tuning: workers, rate (req/s), ttl_days, force
+        options = {key: params[key] for key in ('workers', 'rate', 'ttl_days', 'force') if key in params}
+
+        result = update_partners_from_registry(self.env, partner_ids, **options)
         return self._standardize_result(result)# End of file api_integration/services/handlers.py
@@ -0,0 +1,197 @@
+#
+#  -*- File: api_integration/services/http_replay.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Запись и воспроизведение HTTP сессий банковых API (без Odoo).
+
+Все клиенты (PrivatClient, NBUClient, MonoClient) ходят в сеть через сессии
+http_sessions, поэтому подмена делается на уровне транспорта сессии, а не
+каждого клиента:
+
+    with recording('fixtures/privat_2024.json.gz'):      # живой API -> файл
+        import_transactions(endpoint)
+
+    with replaying('fixtures/privat_2024.json.gz'):      # файл -> без сети
+        import_transactions(endpoint)
+
+Запрос ищется по методу и URL с отсортированными параметрами; одинаковые
+запросы воспроизводятся в порядке записи. Запрос, которого нет в записи,
+падает с ReplayMiss (подкласс requests.ConnectionError - клиенты
+обрабатывают его как сетевую ошибку). Заголовки запросов не пишутся:
+токены Привата и Моно остаются только в памяти.
+
+Клиенты нужно создавать внутри контекста: сессии, взятые раньше,
+продолжают ходить через старый транспорт.
+"""
+import base64
+import gzip
+import json
+import logging
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import http_sessions
+
+_logger = logging.getLogger(__name__)
+
+# Заголовки ответа, которые нужны клиентам (кодировка, лимиты)
+_KEPT_HEADERS = ('Content-Type', 'Retry-After')
+
+
+class ReplayMiss(requests.ConnectionError):
+    """Запроса нет в записи."""
+
+
+def request_key(method, url):
+    """Ключ запроса: метод + URL с отсортированными параметрами."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}?{query}"
+
+
+def build_response(request, status, body, headers=None, reason=''):
+    """requests.Response из сохраненных (или сгенерированных) данных."""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(0)
+    return response
+
+
+class Cassette:
+    """Записанные взаимодействия: список {key, status, headers, body | body_b64}."""
+
+    def __init__(self, interactions=None):
+        self.interactions = list(interactions or [])
+        self._lock = threading.Lock()
+        self._queues = None
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as fh:
+            return cls(json.load(fh))
+
+    def save(self, path):
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as fh:
+            json.dump(self.interactions, fh, ensure_ascii=False)
+        _logger.info(f"HTTP replay: saved {len(self.interactions)} interactions to {path}")
+
+    def __len__(self):
+        return len(self.interactions)
+
+    def record(self, request, response):
+        entry = {
+            'key': request_key(request.method, request.url),
+            'status': response.status_code,
+            'reason': response.reason or '',
+            'headers': {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers},
+        }
+        body = response.content or b''
+        try:
+            entry['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            # Приват иногда отвечает в cp1251 - храним байты как есть
+            entry['body_b64'] = base64.b64encode(body).decode('ascii')
+        with self._lock:
+            self.interactions.append(entry)
+            self._queues = None
+
+    def play(self, request):
+        key = request_key(request.method, request.url)
+        with self._lock:
+            if self._queues is None:
+                self._queues = defaultdict(deque)
+                for entry in self.interactions:
+                    self._queues[entry['key']].append(entry)
+            queue = self._queues.get(key)
+            if not queue:
+                raise ReplayMiss(f"No recorded response for {key}", request=request)
+            entry = queue.popleft()
+        body = base64.b64decode(entry['body_b64']) if 'body_b64' in entry else entry.get('body', '').encode('utf-8')
+        return build_response(request, entry['status'], body, entry.get('headers'), entry.get('reason', ''))
+
+    def rewind(self):
+        with self._lock:
+            self._queues = None
+
+
+class RecordingAdapter(BaseAdapter):
+    """Настоящий запрос через обычный адаптер + запись ответа в кассету."""
+
+    def __init__(self, cassette, adapter):
+        super().__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        self.cassette.record(request, response)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Ответы только из кассеты, без сети."""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        return self.cassette.play(request)
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def use_transport(transport):
+    """
+    Подменяет транспорт всех сессий http_sessions на время контекста.
+    Вложенные контексты складываются: recording() внутри синтетического
+    транспорта пишет ответы синтетики, а не сети.
+    """
+    registry = http_sessions.registry
+    previous = registry.transport
+    registry.set_transport(transport if previous is None else lambda adapter: transport(previous(adapter)))
+    try:
+        yield
+    finally:
+        registry.set_transport(previous)
+
+
+@contextmanager
+def recording(path=None, cassette=None):
+    """Записывает все HTTP запросы контекста; при path кассета сохраняется на выходе."""
+    cassette = cassette if cassette is not None else Cassette()
+    with use_transport(lambda adapter: RecordingAdapter(cassette, adapter)):
+        yield cassette
+    if path:
+        cassette.save(path)
+
+
+@contextmanager
+def replaying(path=None, cassette=None):
+    """Отвечает на HTTP запросы контекста из кассеты (файл path или объект cassette)."""
+    cassette = cassette if cassette is not None else Cassette.load(path)
+    cassette.rewind()
+    with use_transport(lambda adapter: ReplayAdapter(cassette)):
+        yield cassette
+# End of file api_integration/services/http_replay.py
@@ -0,0 +1,223 @@
+#
+#  -*- File: api_integration/services/http_sessions.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Процессный реестр HTTP сессий (connection pool) для всех API клиентов.
+
+Клиенты (PrivatClient, NBUClient, MonoClient, ApiClient, Nextcloud, реестр
+ЕДРПОУ) берут requests.Session отсюда, а не создают новую на каждый вызов:
+повторные запуски крона и клики в UI переиспользуют keep-alive / TLS
+соединения вместо нового handshake на каждый запрос.
+
+Сессия ищется по ключу (origin базового URL, отпечаток учетных данных и
+заголовков, политика повторов). Общие для всех:
+  - размер пула (pool_connections / pool_maxsize);
+  - политика повторов (Retry с backoff, 429/5xx) - только для идемпотентных
+    методов (GET/HEAD/OPTIONS); клиент может задать свое число повторов
+    или отключить их (retries=0);
+  - вытеснение сессий, которые не использовались дольше idle_timeout;
+  - подменный транспорт для записи/воспроизведения и синтетических
+    данных (set_transport, см. http_replay).
+
+Заголовки и auth задаются один раз при создании сессии - клиенты не должны
+менять session.headers после получения (сессия общая для потоков).
+Настройки из ir.config_parameter: см. configure_from_env().
+"""
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import run_metrics
+
+_logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'pool_connections': 4,      # пулов хостов на адаптер
+    'pool_maxsize': 10,         # соединений на хост (>= потоков префетча)
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'idle_timeout': 300,        # сек без запросов до закрытия сессии
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# PUT/DELETE (WebDAV Nextcloud) и POST не повторяем: повтор после таймаута может задвоить операцию
+RETRY_METHODS = frozenset({'HEAD', 'GET', 'OPTIONS'})
+
+
+def _origin(base_url):
+    parts = urlsplit(base_url or '')
+    return f"{parts.scheme or 'https'}://{parts.netloc or parts.path}".lower()
+
+
+def _fingerprint(credentials, headers, auth):
+    """Отпечаток учетных данных: в ключе реестра не храним токены в открытом виде."""
+    raw = repr((credentials, sorted((headers or {}).items()), auth))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class SessionRegistry:
+    """Потокобезопасный реестр сессий с вытеснением по простою."""
+
+    def __init__(self, clock=time.monotonic, **config):
+        self.config = dict(DEFAULTS, **config)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [session, last_used]
+        # Выведенные из реестра сессии, которыми еще могут пользоваться другие потоки
+        self._retired = []  # [session, last_used]
+        self.transport = None  # фабрика адаптера: transport(HTTPAdapter) -> adapter
+
+    def configure(self, **config):
+        """
+        Меняет настройки для новых сессий. При изменении пула/повторов уже
+        созданные сессии выводятся из реестра (новые вызовы получат новые),
+        но закрываются только после простоя - их может держать идущий импорт.
+        """
+        config = {k: v for k, v in config.items() if v is not None}
+        with self._lock:
+            changed = any(self.config.get(k) != v for k, v in config.items() if k != 'idle_timeout')
+            self.config.update(config)
+            if changed:
+                self._retire_entries()
+
+    def retry_policy(self, retry_statuses=None, retries=None):
+        return Retry(
+            total=self.config['retries'] if retries is None else retries,
+            backoff_factor=self.config['backoff_factor'],
+            status_forcelist=RETRY_STATUSES if retry_statuses is None else retry_statuses,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            # Последний ответ 5xx отдаем вызывающему коду, как без пула
+            raise_on_status=False,
+        )
+
+    def get(self, base_url, credentials=None, headers=None, auth=None, retry_statuses=None, retries=None):
+        """
+        Общая сессия для (base_url, учетные данные); создается при первом обращении.
+        retry_statuses - свои статусы для повторов (например, без 429 для API с жестким лимитом).
+        retries - свое число повторов (0 - без повторов), None - общая настройка.
+        """
+        retry_statuses = tuple(retry_statuses) if retry_statuses is not None else None
+        key = (_origin(base_url), _fingerprint(credentials, headers, auth), retry_statuses, retries)
+        now = self._clock()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [None, now]
+                entry[0] = self._new_session(entry, headers, auth, retry_statuses, retries)
+                _logger.debug(f"HTTP pool: new session for {key[0]} ({len(self._entries)} in registry)")
+            entry[1] = now
+            return entry[0]
+
+    def set_transport(self, transport):
+        """
+        Подменяет транспорт всех новых сессий: transport(adapter) получает обычный
+        HTTPAdapter и возвращает адаптер для mount (None - обычная работа).
+        Уже созданные сессии выводятся из реестра, чтобы клиенты получили новые.
+        """
+        with self._lock:
+            self.transport = transport
+            self._retire_entries()
+
+    def close_all(self):
+        with self._lock:
+            self._close_entries(list(self._entries))
+            self._close_sessions(self._retired)
+            self._retired = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _new_session(self, entry, headers, auth, retry_statuses=None, retries=None):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config['pool_connections'],
+            pool_maxsize=self.config['pool_maxsize'],
+            max_retries=self.retry_policy(retry_statuses, retries),
+        )
+        if self.transport is not None:
+            adapter = self.transport(adapter)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if headers:
+            session.headers.update(headers)
+        if auth:
+            session.auth = auth
+
+        # Долгий импорт держит ссылку на сессию - продлеваем ее жизнь на каждом ответе.
+        # Пишем в собственную запись сессии (и после вывода из реестра), без чтения _entries
+        def _touch(response, *args, **kwargs):
+            entry[1] = self._clock()
+            return response
+
+        session.hooks['response'].append(_touch)
+        return run_metrics.instrument_session(session)
+
+    def _evict_idle(self, now):
+        idle_timeout = self.config['idle_timeout']
+        if not idle_timeout:
+            return
+        stale = [key for key, (_, last_used) in self._entries.items() if now - last_used > idle_timeout]
+        if stale:
+            _logger.debug(f"HTTP pool: closing {len(stale)} idle session(s)")
+            self._close_entries(stale)
+        idle_retired = [entry for entry in self._retired if now - entry[1] > idle_timeout]
+        if idle_retired:
+            self._retired = [entry for entry in self._retired if now - entry[1] <= idle_timeout]
+            self._close_sessions(idle_retired)
+
+    def _retire_entries(self):
+        """Выводит все сессии из реестра без закрытия (закроет _evict_idle после простоя)."""
+        self._retired.extend(self._entries.values())
+        self._entries = {}
+
+    def _close_entries(self, keys):
+        self._close_sessions([self._entries.pop(key) for key in keys])
+
+    def _close_sessions(self, entries):
+        for session, _ in entries:
+            try:
+                session.close()
+            except Exception:
+                _logger.exception("HTTP pool: cannot close session")
+
+
+registry = SessionRegistry()
+
+
+def get_session(base_url, credentials=None, headers=None, auth=None, retry_statuses=None, retries=None):
+    """Общая сессия процесса для base_url и учетных данных (см. SessionRegistry.get)."""
+    return registry.get(base_url, credentials=credentials, headers=headers, auth=auth,
+                        retry_statuses=retry_statuses, retries=retries)
+
+
+def configure_from_env(env):
+    """
+    Настройки пула из системных параметров:
+        dino_api.http_pool_size, dino_api.http_retries,
+        dino_api.http_backoff, dino_api.http_idle_timeout
+    """
+    params = env['ir.config_parameter'].sudo()
+
+    def _param(name, cast):
+        value = params.get_param(name)
+        try:
+            return cast(value) if value not in (None, False, '') else None
+        except ValueError:
+            _logger.warning(f"Invalid value for {name}: {value!r}")
+            return None
+
+    registry.configure(
+        pool_maxsize=_param('dino_api.http_pool_size', int),
+        retries=_param('dino_api.http_retries', int),
+        backoff_factor=_param('dino_api.http_backoff', float),
+        idle_timeout=_param('dino_api.http_idle_timeout', int),
+    )
+# End of file api_integration/services/http_sessions.py
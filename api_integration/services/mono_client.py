@@ -2,48 +2,74 @@
 #  -*- File: api_integration/services/mono_client.py -*-
 #
 # -*- coding: utf-8 -*-
-"""Skeleton Mono client.
-"""
+"""Клиент Monobank Personal API (см. mono_api.md)."""
 import logging
 
+import requests
+
+from . import http_sessions
+
 _logger = logging.getLogger(__name__)
 
+# 429 не повторяем на уровне сессии: лимит 1 запрос / 60 с, повтор через
+# секунды только расходует его. Окно остается в очереди до следующего тика.
+MONO_RETRY_STATUSES = (500, 502, 503, 504)
 
-import requests
-import logging
 
-_logger = logging.getLogger(__name__)
+class MonoRateLimited(Exception):
+    """API ответило 429 Too Many Requests."""
 
 
 class MonoClient:
     def __init__(self, api_url=None, api_key=None, timeout=20):
-        self.api_url = api_url or "https://api.monobank.ua"
+        self.api_url = (api_url or "https://api.monobank.ua").rstrip('/')
         self.api_key = api_key
         self.timeout = timeout
-        self.session = requests.Session()
-        if api_key:
-            self.session.headers.update({'X-Token': api_key})
+        self.session = http_sessions.get_session(
+            self.api_url, credentials=api_key, headers={'X-Token': api_key} if api_key else None,
+            retry_statuses=MONO_RETRY_STATUSES,
+        )
+
+    def _get(self, path):
+        response = self.session.get(f"{self.api_url}{path}", timeout=self.timeout)
+        if response.status_code == 429:
+            raise MonoRateLimited(f"MonoBank rate limit: {path}")
+        response.raise_for_status()
+        return response.json()
 
     def fetch_exchange(self):
         """
         Получает курсы валют Монобанка.
         Возвращает список словарей с ключами: currencyCodeA, currencyCodeB, date, rateBuy, rateSell
         """
-        url = f"{self.api_url}/bank/currency"
-
         try:
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get("/bank/currency")
             _logger.info(f"Mono exchange rates received: {len(data) if data else 0} currency pairs")
             return data if data else []
         except requests.RequestException as e:
             _logger.error(f"MonoBank exchange API error: {e}")
             raise
 
-    def fetch_accounts(self, *args, **kwargs):
-        raise NotImplementedError('fetch_accounts not implemented yet')
+    def fetch_client_info(self):
+        """Информация о клиенте: clientId, name, accounts, jars (не чаще 1 раза в 60 с)."""
+        return self._get("/personal/client-info") or {}
+
+    def fetch_accounts(self):
+        """Счета клиента из client-info."""
+        accounts = self.fetch_client_info().get('accounts') or []
+        _logger.info(f"Mono accounts received: {len(accounts)}")
+        return accounts
+
+    def fetch_statement(self, account_id, date_from, date_to):
+        """
+        Одна страница выписки за окно [date_from, date_to] (unix time): до 500 операций,
+        от новых к старым. Окна и страницы планирует mono_schedule.StatementQueue.
+        """
+        data = self._get(f"/personal/statement/{account_id}/{int(date_from)}/{int(date_to)}") or []
+        _logger.info(f"Mono statement {account_id} {date_from}..{date_to}: {len(data)} transactions")
+        return data
 
-    def fetch_transactions(self, *args, **kwargs):
-        raise NotImplementedError('fetch_transactions not implemented yet')
+    def fetch_transactions(self, account_id, date_from, date_to):
+        """Синоним fetch_statement (одна страница выписки)."""
+        return self.fetch_statement(account_id, date_from, date_to)
 # End of file api_integration/services/mono_client.py
@@ -0,0 +1,105 @@
+#
+#  -*- File: api_integration/services/mono_schedule.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Планирование загрузки выписок Монобанка (чистый Python, без Odoo).
+
+Ограничения API выписки (/personal/statement/{account}/{from}/{to}):
+  - окно не больше 31 суток + 1 час;
+  - до 500 операций на ответ, следующая страница - тот же from
+    и to = time самой старой полученной операции;
+  - не чаще 1 запроса в 60 секунд на токен.
+
+plan_windows() режет период счета на окна по 31 сутки. StatementQueue -
+очередь окон, которая переживает тики крона (JSON в dino.api.checkpoint):
+выдает следующее окно только когда с прошлого запроса прошел интервал,
+а после запроса сужает окно до следующей страницы или снимает его.
+"""
+import json
+
+WINDOW_SECONDS = 31 * 86400     # окно выписки (API допускает 31 сутки + 1 час)
+PAGE_SIZE = 500                 # операций в полном ответе
+MIN_INTERVAL = 60               # секунд между запросами выписки на токен
+
+
+def plan_windows(account_id, start_ts, end_ts, window=WINDOW_SECONDS):
+    """
+    Окна выписки [from, to] (unix time, обе границы включительно) от start_ts до end_ts.
+    Окна идут подряд без перекрытия: следующее начинается через секунду после предыдущего.
+    """
+    windows = []
+    window_start = int(start_ts)
+    end_ts = int(end_ts)
+    while window_start <= end_ts:
+        window_end = min(window_start + window, end_ts)
+        windows.append({'account': account_id, 'from': window_start, 'to': window_end})
+        window_start = window_end + 1
+    return windows
+
+
+class StatementQueue:
+    """
+    Очередь окон выписки с учетом лимита запросов.
+
+        queue = StatementQueue.from_json(checkpoint.pending_windows, last_request)
+        while queue and not queue.wait_time(now):
+            window = queue.peek()
+            rows = client.fetch_statement(window['account'], window['from'], window['to'])
+            queue.record(window, rows, now)
+    """
+
+    def __init__(self, windows=None, last_request=None, min_interval=MIN_INTERVAL):
+        # Сначала самые старые окна: данные появляются в хронологическом порядке
+        self.windows = sorted(windows or [], key=lambda w: (w['from'], w['account']))
+        self.last_request = last_request
+        self.min_interval = min_interval
+
+    @classmethod
+    def from_json(cls, data, last_request=None, min_interval=MIN_INTERVAL):
+        try:
+            windows = json.loads(data or '[]')
+        except ValueError:
+            windows = []
+        return cls(windows, last_request=last_request, min_interval=min_interval)
+
+    def to_json(self):
+        return json.dumps(self.windows)
+
+    def __len__(self):
+        return len(self.windows)
+
+    def extend(self, windows):
+        self.windows = sorted(self.windows + list(windows), key=lambda w: (w['from'], w['account']))
+
+    def peek(self):
+        return self.windows[0] if self.windows else None
+
+    def drop(self):
+        """Снимает текущее окно без запроса (например, счет больше не активен)."""
+        return self.windows.pop(0) if self.windows else None
+
+    def wait_time(self, now):
+        """Секунд до разрешенного следующего запроса (0 - можно сейчас)."""
+        if self.last_request is None:
+            return 0
+        return max(0.0, self.last_request + self.min_interval - now)
+
+    def mark_request(self, now):
+        """Отмечает запрос к API (в т.ч. неудачный - лимит все равно израсходован)."""
+        self.last_request = now
+
+    def record(self, window, rows, now):
+        """
+        Результат запроса окна: полный ответ (PAGE_SIZE операций) сужает окно до
+        самой старой полученной операции, неполный - снимает окно из очереди.
+        """
+        self.mark_request(now)
+        if len(rows) >= PAGE_SIZE:
+            oldest = min(int(row['time']) for row in rows)
+            # Все операции ответа в одну секунду - сдвигаемся на секунду, иначе окно не сузится
+            window['to'] = oldest if oldest < window['to'] else window['to'] - 1
+            if window['to'] >= window['from']:
+                return
+        self.windows.remove(window)
+# End of file api_integration/services/mono_schedule.py
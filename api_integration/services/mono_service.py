@@ -1,6 +1,33 @@
 #
 #  -*- File: api_integration/services/mono_service.py -*-
 #
+# -*- coding: utf-8 -*-
+"""
+Сервис Монобанка: курсы, счета (client-info) и выписки.
+
+Выписки грузятся по окнам из mono_schedule: весь период делится на окна
+по 31 сутки, очередь окон хранится в dino.api.checkpoint и разбирается
+по тикам крона не быстрее лимита API (1 запрос выписки в 60 секунд).
+"""
+import logging
+import time
+from datetime import datetime, timezone
+
+from odoo import _, fields
+from odoo.exceptions import UserError
+
+from . import run_metrics
+from .mono_client import MonoClient, MonoRateLimited
+from .mono_schedule import MIN_INTERVAL, WINDOW_SECONDS, StatementQueue, plan_windows
+from .nbu_service import import_rates_to_dino
+
+_logger = logging.getLogger(__name__)
+
+# ISO 4217 numeric -> буквенный код (если у res.currency не заполнен iso_numeric)
+CURRENCY_CODES = {980: 'UAH', 840: 'USD', 978: 'EUR', 826: 'GBP', 985: 'PLN'}
+
+_EMPTY_STATS = {'created': 0, 'updated': 0, 'skipped': 0, 'inactive_accounts': 0}
+
 
 def import_mono_rates(bank, overwrite=True):
     """
@@ -84,4 +111,245 @@ def import_mono_rates(bank, overwrite=True):
 
     _logger.info(f"import_mono_rates: Import completed - Buy: {buy_result['stats']}, Sell: {sell_result['stats']}")
 
-    return {'stats': total_stats}# End of file api_integration/services/mono_service.py
+    return {'stats': total_stats}
+
+
+def get_client(endpoint):
+    """Фабрика для создания клиента"""
+    if not endpoint.auth_token:
+        raise UserError(_("Not specified API token for endpoint %s") % endpoint.name)
+    return MonoClient(api_key=endpoint.auth_token)
+
+
+def _to_ts(value):
+    """Naive UTC datetime Odoo -> unix time."""
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _from_ts(value):
+    """unix time -> naive UTC datetime Odoo."""
+    return datetime.fromtimestamp(int(value), tz=timezone.utc).replace(tzinfo=None)
+
+
+def _currency_map(env):
+    """{ISO numeric: currency_id} по активным валютам."""
+    currencies = env['res.currency'].search([('active', '=', True)])
+    by_name = {c.name: c.id for c in currencies}
+    result = {code: by_name[name] for code, name in CURRENCY_CODES.items() if name in by_name}
+    if 'iso_numeric' in env['res.currency']._fields:
+        result.update({c.iso_numeric: c.id for c in currencies if c.iso_numeric})
+    return result
+
+
+def import_mono_accounts(endpoint, client=None, accounts_data=None):
+    """
+    Обнаружение счетов: client-info -> dino.bank.account (upsert по IBAN).
+    Один search на все счета, новые создаются одним create.
+    accounts_data - уже полученный список счетов (без запроса к API).
+    """
+    bank = endpoint.bank_id
+    if not bank:
+        raise UserError(_("Bank not specified for endpoint %s") % endpoint.name)
+    if accounts_data is None:
+        client = client or get_client(endpoint)
+        try:
+            accounts_data = client.fetch_accounts()
+        except MonoRateLimited:
+            raise UserError(_("Монобанк: превышен лимит запросов client-info, повторите через минуту"))
+
+    env = bank.env
+    BankAccount = env['dino.bank.account']
+    currency_map = _currency_map(env)
+    stats = {'created': 0, 'updated': 0, 'skipped': 0}
+
+    ibans = [a['iban'] for a in accounts_data if a.get('iban')]
+    existing = {acc.account_number: acc for acc in BankAccount.with_context(active_test=False).search([
+        ('account_number', 'in', ibans),
+    ])}
+
+    now = fields.Datetime.now()
+    create_list = []
+    processed = BankAccount.browse()
+    for data in accounts_data:
+        iban = data.get('iban')
+        currency_id = currency_map.get(data.get('currencyCode'))
+        if not iban or not currency_id:
+            stats['skipped'] += 1
+            continue
+
+        masked = (data.get('maskedPan') or [''])[0]
+        vals = {
+            'bank_id': bank.id,
+            'currency_id': currency_id,
+            'external_id': data.get('id'),
+            'account_type': data.get('type'),
+            'balance': (data.get('balance') or 0) / 100.0,
+            'balance_end_date': fields.Date.context_today(endpoint),
+            'last_import_date': now,
+        }
+        account = existing.get(iban)
+        if account:
+            account.write(vals)
+            processed |= account
+            stats['updated'] += 1
+        else:
+            create_list.append(dict(
+                vals,
+                name=f"Mono {data.get('type') or ''} {masked}".strip() if masked else iban,
+                account_number=iban,
+                active=True,
+            ))
+            stats['created'] += 1
+
+    if create_list:
+        processed |= BankAccount.create(create_list)
+
+    _logger.info(f"import_mono_accounts: {stats}")
+    return {'stats': stats, 'accounts': processed}
+
+
+def _statement_vals(account, row):
+    """Операция выписки Mono -> vals для dino.bank.transaction._bulk_upsert_from_api."""
+    description = row.get('description') or ''
+    if row.get('comment'):
+        description = f"{description}\n{row['comment']}" if description else row['comment']
+    return {
+        'bank_account_id': account.id,
+        'currency_id': account.currency_id.id,  # related stored, в SQL заполняем сами
+        'external_id': str(row['id']),
+        'document_number': row.get('receiptId') or row.get('invoiceId'),
+        'datetime': _from_ts(row['time']),
+        'amount': (row.get('amount') or 0) / 100.0,
+        'balance_after': (row.get('balance') or 0) / 100.0,
+        'mcc': row.get('mcc') or 0,
+        'counterparty_name': row.get('counterName'),
+        'counterparty_edrpou': row.get('counterEdrpou'),
+        'counterparty_iban': row.get('counterIban'),
+        'description': description,
+        'raw_data': row,
+    }
+
+
+def _plan_statement_windows(endpoint, accounts, window_days=None):
+    """
+    Окна выписки для нового прохода: от последней загруженной операции счета
+    (или start_date эндпоинта при первой загрузке / Force Full Sync) до текущего момента.
+    """
+    if not endpoint.start_date:
+        raise UserError(_("Start Date not specified for endpoint '%s'.") % endpoint.name)
+
+    TransModel = endpoint.env['dino.bank.transaction']
+    last_dates = {}
+    if not endpoint.force_full_sync and accounts:
+        for account, last in TransModel._read_group(
+                [('bank_account_id', 'in', accounts.ids)], ['bank_account_id'], ['datetime:max']):
+            last_dates[account.id] = last
+
+    start_default = _to_ts(datetime.combine(endpoint.start_date, datetime.min.time()))
+    end_ts = int(time.time())
+    window = int(window_days * 86400) if window_days else WINDOW_SECONDS
+    windows = []
+    for account in accounts:
+        last = last_dates.get(account.id)
+        start_ts = _to_ts(last) if last else start_default
+        windows.extend(plan_windows(account.external_id, start_ts, end_ts, window))
+    return windows
+
+
+def sync_mono_transactions(endpoint, max_calls=1, min_interval=MIN_INTERVAL, window_days=None, commit=True):
+    """
+    Инкрементальная загрузка выписок Монобанка с учетом лимита API.
+
+    Проход: обнаружение счетов (client-info) -> план окон по 31 сутки на счет ->
+    очередь окон в dino.api.checkpoint. Каждый тик крона выполняет до max_calls
+    запросов выписки, не чаще одного в min_interval секунд (между тиками
+    интервал считается по last_request_at чекпоинта), и коммитит прогресс
+    после каждого окна. Строки пишутся пакетно через _bulk_upsert_from_api.
+    commit=False - ручной запуск из UI: прогресс сохраняется без промежуточных
+    коммитов, транзакция запроса остается откатываемой.
+
+    Возвращает: {'stats': {...}, 'pending_windows': N}
+    """
+    bank = endpoint.bank_id
+    if not bank:
+        raise UserError(_("Bank not specified for endpoint %s") % endpoint.name)
+
+    client = get_client(endpoint)
+    env = endpoint.env
+    Checkpoint = env['dino.api.checkpoint']
+    TransModel = env['dino.bank.transaction']
+
+    checkpoint = Checkpoint.get_for(endpoint)
+    last_request = _to_ts(checkpoint.last_request_at) if checkpoint and checkpoint.last_request_at else None
+    calls = 0
+
+    if checkpoint and checkpoint.state == 'running' and checkpoint.pending_windows:
+        queue = StatementQueue.from_json(checkpoint.pending_windows, last_request, min_interval)
+        stats = dict(_EMPTY_STATS, **checkpoint.get_stats())
+        _logger.info(f"Mono {endpoint.name}: resume, {len(queue)} windows pending")
+    else:
+        # Новый проход: обнаружение счетов и план окон
+        queue = StatementQueue([], last_request, min_interval)
+        if queue.wait_time(time.time()):
+            _logger.info(f"Mono {endpoint.name}: rate limit, next pass on a later tick")
+            return {'stats': dict(_EMPTY_STATS), 'pending_windows': 0}
+        accounts = import_mono_accounts(endpoint, client)['accounts'].filtered('active')
+        queue.mark_request(time.time())
+        calls += 1
+        queue.extend(_plan_statement_windows(endpoint, accounts, window_days))
+        checkpoint = Checkpoint.start(endpoint, endpoint.start_date, fields.Date.context_today(endpoint))
+        stats = dict(_EMPTY_STATS)
+        checkpoint.save_windows(queue.to_json(), stats, last_request_at=_from_ts(queue.last_request), commit=commit)
+        _logger.info(f"Mono {endpoint.name}: planned {len(queue)} statement windows for {len(accounts)} accounts")
+
+    acc_map = {acc.external_id: acc for acc in env['dino.bank.account'].search([
+        ('bank_id', '=', bank.id), ('active', '=', True), ('external_id', '!=', False),
+    ])}
+
+    try:
+        while queue and calls < max_calls:
+            wait = queue.wait_time(time.time())
+            if wait:
+                if calls == 0:
+                    # Прошлый запрос был в предыдущем тике - ждать не будем
+                    break
+                time.sleep(wait)
+
+            window = queue.peek()
+            account = acc_map.get(window['account'])
+            if not account:
+                _logger.info(f"Mono {endpoint.name}: account {window['account']} is not active, window dropped")
+                queue.drop()
+                stats['inactive_accounts'] += 1
+                continue
+
+            try:
+                rows = client.fetch_statement(window['account'], window['from'], window['to'])
+            except MonoRateLimited:
+                queue.mark_request(time.time())
+                checkpoint.save_windows(queue.to_json(), stats, last_request_at=_from_ts(queue.last_request),
+                                        commit=commit)
+                _logger.warning(f"Mono {endpoint.name}: 429, window kept for the next tick")
+                break
+            calls += 1
+            run_metrics.count('pages')
+
+            vals_list = [_statement_vals(account, row) for row in rows if row.get('id')]
+            page_stats = TransModel._bulk_upsert_from_api(vals_list, update_existing=endpoint.force_full_sync)
+            for key, value in page_stats.items():
+                stats[key] += value
+
+            queue.record(window, rows, time.time())
+            checkpoint.save_windows(queue.to_json(), stats, last_request_at=_from_ts(queue.last_request), pages=1,
+                                    commit=commit)
+    except Exception as e:
+        checkpoint.record_error(e)
+        raise
+
+    if not queue:
+        checkpoint.finish(stats)
+
+    _logger.info(f"Mono {endpoint.name}: {calls} API calls, {len(queue)} windows pending, stats {stats}")
+    return {'stats': stats, 'pending_windows': len(queue)}
+# End of file api_integration/services/mono_service.py
+
@@ -4,24 +4,46 @@
 # -*- coding: utf-8 -*-
 import requests
 import logging
-from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from . import http_sessions, run_metrics
 
 _logger = logging.getLogger(__name__)
 
 # Глобальный кэш (в рамках процесса Odoo)
 _BANKS_CACHE = {'data': [], 'expires': datetime.min}
 
+
+def split_period(start_date, end_date, months=1):
+    """
+    Делит период [start_date, end_date] на календарные куски по months месяцев
+    (1 - месяц, 3 - квартал). Первый и последний кусок обрезаются по границам периода.
+    Возвращает список (chunk_start, chunk_end).
+    """
+    months = max(1, int(months or 1))
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        # Первое число месяца, следующего за куском
+        month_index = chunk_start.year * 12 + chunk_start.month - 1 + months
+        next_start = date(month_index // 12, month_index % 12 + 1, 1)
+        chunk_end = min(next_start - timedelta(days=1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = next_start
+    return chunks
+
 class NBUClient:
     """
     Клиент для API НБУ. 
-    Использует requests.Session для ускорения серии запросов.
+    Использует общую сессию пула (http_sessions) для ускорения серии запросов.
     """
     
     BASE_URL = 'https://bank.gov.ua'
 
     def __init__(self, user_agent='DinoERP/1.0', timeout=20):
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = http_sessions.get_session(self.BASE_URL, headers={
             'User-Agent': user_agent,
             'Accept': 'application/json'
         })
@@ -85,6 +107,41 @@ class NBUClient:
             _logger.error("Ошибка получения курсов НБУ: %s", e)
             raise
 
+    def iter_exchange_chunks(self, chunks, workers=4):
+        """
+        Курсы по кускам периода (см. split_period), до workers запросов одновременно.
+
+        Куски отдаются в исходном порядке как (chunk_start, chunk_end, data);
+        в памяти одновременно не больше workers + 1 ответов, поэтому потребитель
+        может писать кусок в БД, пока следующие скачиваются.
+        В потоках только HTTP - env/cursor не трогать.
+        """
+        chunks = iter(chunks)
+        workers = max(1, workers)
+        # HTTP время фоновых потоков идет в метрики запуска потребителя
+        metrics = run_metrics.current()
+
+        def _fetch(chunk):
+            with run_metrics.bind(metrics):
+                return self.fetch_exchange(*chunk)
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='nbu-chunk')
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append((chunk, pool.submit(_fetch, chunk)))
+                if len(pending) >= workers:
+                    break
+            while pending:
+                chunk, future = pending.popleft()
+                data = future.result()
+                next_chunk = next(chunks, None)
+                if next_chunk is not None:
+                    pending.append((next_chunk, pool.submit(_fetch, next_chunk)))
+                yield chunk[0], chunk[1], data
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
     def get_bank_info(self, mfo):
         """Получает инфо по конкретному МФО."""
         url = f"{self.BASE_URL}/NBU_BankInfo/get_data_branch"
@@ -8,15 +8,25 @@
 Оптимизирован для пакетной обработки данных (Batch Processing) для исключения проблемы N+1.
 """
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
 from odoo import fields, _
 from odoo.exceptions import UserError
 import requests
 
-from .nbu_client import NBUClient
+from odoo.addons.dino_erp.finance.services import currency_converter
+from . import run_metrics
+from .nbu_client import NBUClient, split_period
 
 _logger = logging.getLogger(__name__)
 
+# Строк dino.currency.rate на один INSERT ... SELECT в res_currency_rate
+_SYNC_BATCH = 5000
+
+# Загрузка истории НБУ: месяцев в одном запросе exchange_site и параллельных запросов
+NBU_CHUNK_MONTHS = 1
+NBU_WORKERS = 4
+
 
 def import_nbu_rates(env, bank=None, start_date=None, end_date=None, overwrite=False):
     """
@@ -134,6 +144,66 @@ def import_nbu_rates(env, bank=None, start_date=None, end_date=None, overwrite=F
     return {'stats': stats, 'processed_ids': processed_ids}
 
 
+def _upsert_system_rates(env, rate_ids, overwrite=False):
+    """
+    Переносит курсы dino.currency.rate (по id) в res.currency.rate set-based SQL:
+    один INSERT ... SELECT ... ON CONFLICT на пачку из _SYNC_BATCH строк.
+
+    Инверсия для базовой валюты UAH (1 / rate) считается в том же запросе.
+    Существующий системный курс обновляется только при overwrite и реальном
+    изменении значения. Курсы <= 0 пропускаются (CHECK rate > 0 в res_currency_rate).
+
+    Возвращает: {'created': N, 'updated': N, 'skipped': N}
+    """
+    stats = {'created': 0, 'updated': 0, 'skipped': 0}
+    if not rate_ids:
+        return stats
+
+    company = env.company
+    invert = company.currency_id.name == 'UAH'
+    env['dino.currency.rate'].flush_model(['currency_id', 'date', 'rate'])
+    env['res.currency.rate'].flush_model()
+
+    for i in range(0, len(rate_ids), _SYNC_BATCH):
+        batch = rate_ids[i:i + _SYNC_BATCH]
+        # DISTINCT ON: несколько строк на (дата, валюта) в одной пачке - берем последнюю измененную
+        env.cr.execute("""
+            INSERT INTO res_currency_rate (name, currency_id, company_id, rate,
+                                           create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT ON (d.date, d.currency_id)
+                   d.date, d.currency_id, %(company_id)s,
+                   CASE WHEN %(invert)s THEN 1.0 / d.rate ELSE d.rate END,
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM dino_currency_rate d
+             WHERE d.id = ANY(%(ids)s) AND d.rate > 0
+             ORDER BY d.date, d.currency_id, d.write_date DESC, d.id DESC
+            ON CONFLICT (name, currency_id, company_id) DO UPDATE
+               SET rate = EXCLUDED.rate, write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+             WHERE %(overwrite)s AND abs(res_currency_rate.rate - EXCLUDED.rate) > 0.00001
+            RETURNING (xmax = 0) AS inserted
+        """, {
+            'company_id': company.id,
+            'invert': invert,
+            'uid': env.uid,
+            'ids': list(batch),
+            'overwrite': bool(overwrite),
+        })
+        inserted = [row[0] for row in env.cr.fetchall()]
+        created = sum(1 for flag in inserted if flag)
+        stats['created'] += created
+        stats['updated'] += len(inserted) - created
+        stats['skipped'] += len(batch) - len(inserted)
+
+    # Курсы менялись в обход ORM - сбрасываем кэш курсов и вычисляемых rate валют
+    env['res.currency.rate'].invalidate_model()
+    env['res.currency'].invalidate_model()
+    # res_currency_rate пишется SQL в обход ORM - кэш конвертеров (source='system') сбрасываем сами;
+    # изменения dino.currency.rate сбрасывают его в create/write/unlink модели
+    if stats['created'] or stats['updated']:
+        currency_converter.invalidate(env)
+    return stats
+
+
 def sync_rates_to_system(env, domain=None, overwrite=False):
     """
     Универсальная синхронизация курсов из dino.currency.rate в res.currency.rate
@@ -146,65 +216,51 @@ def sync_rates_to_system(env, domain=None, overwrite=False):
     if not domain:
         return {'created': 0, 'updated': 0, 'skipped': 0}
 
-    dino_rate_model = env['dino.currency.rate']
-    sys_rate_model = env['res.currency.rate']
-
-    # Находим курсы для синхронизации
-    rates_to_sync = dino_rate_model.search(domain)
-    if not rates_to_sync:
+    # Только id - сами значения читает SQL синхронизации
+    rate_ids = env['dino.currency.rate'].search(domain).ids
+    if not rate_ids:
         return {'created': 0, 'updated': 0, 'skipped': 0}
 
-    _logger.info(f"sync_rates_to_system: Syncing {len(rates_to_sync)} rates from dino to system")
-
-    # Собираем даты и валюты для поиска существующих системных записей
-    dates = rates_to_sync.mapped('date')
-    currency_ids = rates_to_sync.mapped('currency_id').ids
-
-    # Загружаем существующие системные курсы
-    existing_sys_rates = sys_rate_model.search([
-        ('currency_id', 'in', currency_ids),
-        ('name', 'in', [str(d) for d in dates]),
-        ('company_id', '=', env.company.id)
-    ])
-
-    # Карта существующих системных курсов: {(currency_id, date_str): sys_record}
-    sys_map = {(r.currency_id.id, str(r.name)): r for r in existing_sys_rates}
-
-    create_vals = []
-    stats = {'created': 0, 'updated': 0, 'skipped': 0}
+    _logger.info(f"sync_rates_to_system: Syncing {len(rate_ids)} rates from dino to system")
+    stats = _upsert_system_rates(env, rate_ids, overwrite)
+    _logger.info(f"sync_rates_to_system: Final stats - Created: {stats['created']}, Updated: {stats['updated']}, Skipped: {stats['skipped']}")
+    return stats
 
-    for r in rates_to_sync:
-        key = (r.currency_id.id, str(r.date))
-        sys_rec = sys_map.get(key)
 
-        # Расчет курса для Odoo (обратный для базовой валюты UAH)
-        base_currency = env.company.currency_id
-        if base_currency.name == 'UAH':
-            final_rate = 1.0 / r.rate if r.rate != 0 else 0
-        else:
-            final_rate = r.rate
+def sync_rates_incremental(env, source='nbu', rate_type='official', overwrite=False):
+    """
+    Инкрементальная синхронизация в res.currency.rate: только строки dino.currency.rate,
+    измененные (write_date) с момента прошлой синхронизации.
 
-        if sys_rec:
-            if overwrite and abs(sys_rec.rate - final_rate) > 0.00001:
-                sys_rec.rate = final_rate
-                stats['updated'] += 1
-                _logger.info(f"sync_rates_to_system: Updated {r.currency_id.name} {r.date}: {final_rate}")
-            else:
-                stats['skipped'] += 1
-        else:
-            create_vals.append({
-                'currency_id': r.currency_id.id,
-                'rate': final_rate,
-                'name': r.date,
-                'company_id': env.company.id
-            })
-            stats['created'] += 1
+    Водяной знак хранится в ir.config_parameter отдельно для источника, типа курса
+    и компании. Сравнение >= : строки с write_date ровно на водяном знаке
+    синхронизируются повторно (upsert идемпотентен), зато не теряются строки,
+    записанные в ту же секунду после прошлого запуска.
 
-    if create_vals:
-        sys_rate_model.create(create_vals)
-        _logger.info(f"sync_rates_to_system: Created {len(create_vals)} system rates")
+    Возвращает: {'created': N, 'updated': N, 'skipped': N}
+    """
+    params = env['ir.config_parameter'].sudo()
+    key = f'dino_api.rate_sync_watermark.{source}.{rate_type}.{env.company.id}'
+    watermark = params.get_param(key) or None
+
+    env['dino.currency.rate'].flush_model(['source', 'rate_type', 'write_date'])
+    env.cr.execute("""
+        SELECT id, write_date
+          FROM dino_currency_rate
+         WHERE source = %s AND rate_type = %s
+           AND (%s::timestamp IS NULL OR write_date >= %s::timestamp)
+         ORDER BY write_date, id
+    """, (source, rate_type, watermark, watermark))
+    rows = env.cr.fetchall()
+    if not rows:
+        _logger.info(f"sync_rates_incremental: No {source}/{rate_type} rates changed since {watermark}")
+        return {'created': 0, 'updated': 0, 'skipped': 0}
 
-    _logger.info(f"sync_rates_to_system: Final stats - Created: {stats['created']}, Updated: {stats['updated']}, Skipped: {stats['skipped']}")
+    _logger.info(f"sync_rates_incremental: {len(rows)} {source}/{rate_type} rates changed since {watermark}")
+    stats = _upsert_system_rates(env, [row[0] for row in rows], overwrite)
+    # Секунды без микросекунд: при >= строки последней секунды просто повторятся
+    params.set_param(key, fields.Datetime.to_string(rows[-1][1]))
+    _logger.info(f"sync_rates_incremental: Final stats - Created: {stats['created']}, Updated: {stats['updated']}, Skipped: {stats['skipped']}")
     return stats
 
 
@@ -249,45 +305,47 @@ def import_rates_to_dino(env, rates_data, source, rate_type='official', overwrit
     active_currencies = cur_model.search([('active', '=', True)])
     currency_map = {c.name.upper(): c.id for c in active_currencies}
 
-    # Проверка существования (batch check)
-    # Собираем уникальные комбинации для поиска
-    search_domains = []
-    for item in rates_data:
-        curr_code = item['currency_code'].upper()
-        date_str = item['date']
-        if curr_code in currency_map:
-            search_domains.append(('currency_id', '=', currency_map[curr_code]))
-            search_domains.append(('date', '=', date_str))
-            search_domains.append(('source', '=', source))
-            search_domains.append(('rate_type', '=', rate_type))
-
-    existing_rates = rate_model.search(search_domains) if search_domains else rate_model.browse()
-    existing_map = {(r.currency_id.name.upper(), str(r.date), r.source, r.rate_type): r for r in existing_rates}
-
-    vals_list = []
     stats = {'created': 0, 'updated': 0, 'skipped': 0}
     processed_ids = []
 
+    # Входные курсы по ключу (currency_id, date): повтор ключа во входных данных
+    # не должен упираться в уникальный индекс - побеждает последний
+    incoming = {}
     for item in rates_data:
         curr_code = item['currency_code'].upper()
-        rate_val = item['rate']
-        date_str = item['date']
-
         if curr_code not in currency_map:
             stats['skipped'] += 1
             continue
+        key = (currency_map[curr_code], str(item['date']))
+        if key in incoming:
+            stats['skipped'] += 1
+        incoming[key] = (curr_code, item['rate'])
+
+    # Проверка существования (batch check): один запрос на весь импорт
+    # по ключу (currency, date, source, rate_type) в диапазоне дат
+    existing_map = {}
+    if incoming:
+        dates = sorted(date_str for _, date_str in incoming)
+        existing_rates = rate_model.search_fetch([
+            ('source', '=', source),
+            ('rate_type', '=', rate_type),
+            ('currency_id', 'in', list({curr_id for curr_id, _ in incoming})),
+            ('date', '>=', dates[0]),
+            ('date', '<=', dates[-1]),
+        ], ['currency_id', 'date', 'rate'])
+        existing_map = {(r.currency_id.id, fields.Date.to_string(r.date)): r for r in existing_rates}
 
-        curr_id = currency_map[curr_code]
-        key = (curr_code, date_str, source, rate_type)
+    vals_list = []
+    write_groups = defaultdict(list)
 
-        existing_rec = existing_map.get(key)
+    for (curr_id, date_str), (curr_code, rate_val) in incoming.items():
+        existing_rec = existing_map.get((curr_id, date_str))
 
         if existing_rec:
             if overwrite and abs(existing_rec.rate - rate_val) > 0.00001:
-                existing_rec.rate = rate_val
+                write_groups[rate_val].append(existing_rec.id)
                 stats['updated'] += 1
                 processed_ids.append(existing_rec.id)
-                _logger.info(f"import_rates_to_dino: Updated {source} {rate_type} {curr_code} {date_str}: {rate_val}")
             else:
                 stats['skipped'] += 1
         else:
@@ -301,6 +359,12 @@ def import_rates_to_dino(env, rates_data, source, rate_type='official', overwrit
             })
             stats['created'] += 1
 
+    # Массовое обновление: один UPDATE на группу записей с одинаковым новым курсом
+    for rate_val, rec_ids in write_groups.items():
+        rate_model.browse(rec_ids).write({'rate': rate_val})
+    if write_groups:
+        _logger.info(f"import_rates_to_dino: Updated {stats['updated']} {source} {rate_type} rates in {len(write_groups)} write groups")
+
     # Массовое создание
     if vals_list:
         _logger.warning(f"import_rates_to_dino: Creating {len(vals_list)} new rate records")
@@ -312,10 +376,15 @@ def import_rates_to_dino(env, rates_data, source, rate_type='official', overwrit
     return {'stats': stats, 'processed_ids': processed_ids}
 
 
-def import_nbu_rates(env, bank=None, start_date=None, end_date=None, overwrite=False):
+def import_nbu_rates(env, bank=None, start_date=None, end_date=None, overwrite=False,
+                     chunk_months=NBU_CHUNK_MONTHS, workers=NBU_WORKERS):
     """
     Импортирует курсы из API НБУ в основную таблицу dino.currency.rate с rate_type='official'.
     Возвращает список ID созданных/обновленных записей для последующей синхронизации.
+
+    Период делится на куски по chunk_months месяцев, куски качаются параллельно
+    (до workers запросов) и по одному пишутся в БД - весь период не держится в памяти.
+    Без overwrite прошлые куски, уже полностью загруженные, не запрашиваются.
     """
     _logger.warning("import_nbu_rates: Starting import to dino.currency.rate")
 
@@ -341,23 +410,44 @@ def import_nbu_rates(env, bank=None, start_date=None, end_date=None, overwrite=F
     if start > end:
         return {'stats': {}, 'processed_ids': []}
 
-    # 2. Запрос к API
-    _logger.warning(f"import_nbu_rates: Fetching data from NBU API for period {start} to {end}")
+    # 2. Куски периода; полностью загруженные прошлые куски не запрашиваем
+    chunks = split_period(start, end, chunk_months)
+    if not overwrite:
+        complete = _complete_nbu_chunks(env, chunks, today)
+        if complete:
+            _logger.warning(f"import_nbu_rates: Skipping {len(complete)} chunks already present in dino.currency.rate")
+            chunks = [chunk for chunk in chunks if chunk not in complete]
+
+    stats = {'created': 0, 'updated': 0, 'skipped': 0}
+    processed_ids = []
+    if not chunks:
+        return {'stats': stats, 'processed_ids': processed_ids}
+
+    # 3. Параллельная загрузка кусков; каждый сразу уходит в пакетный импорт
+    _logger.warning(f"import_nbu_rates: Fetching {len(chunks)} chunks for period {start} to {end} ({workers} workers)")
+    rate_model = env['dino.currency.rate']
     client = NBUClient()
     try:
-        data = client.fetch_exchange(start, end)
-        _logger.warning(f"import_nbu_rates: Received {len(data) if data else 0} records from NBU API")
-        if data:
-            _logger.warning(f"import_nbu_rates: Sample data: {data[:2]}")
+        for chunk_start, chunk_end, data in client.iter_exchange_chunks(chunks, workers=workers):
+            _logger.info(f"import_nbu_rates: Chunk {chunk_start}..{chunk_end}: {len(data or [])} records")
+            result = import_rates_to_dino(env, _nbu_rates_data(data or []), 'nbu', 'official', overwrite)
+            for key, value in result['stats'].items():
+                stats[key] += value
+            processed_ids.extend(result['processed_ids'])
+            run_metrics.count('pages')
+            # Курсы куска уже в БД - не держим их в кэше ORM до конца импорта
+            rate_model.flush_model()
+            rate_model.invalidate_model()
     except requests.RequestException as e:
         _logger.error("Ошибка API НБУ: %s", e)
         return {'error': str(e)}
 
-    if not data:
-        _logger.warning("import_nbu_rates: No data received from NBU API")
-        return {'stats': {'skipped': 0}, 'processed_ids': []}
+    _logger.warning(f"import_nbu_rates: Final stats - Created: {stats['created']}, Updated: {stats['updated']}, Skipped: {stats['skipped']}")
+    return {'stats': stats, 'processed_ids': processed_ids}
+
 
-    # 3. Преобразование данных для универсальной функции
+def _nbu_rates_data(data):
+    """Ответ NBU exchange_site -> rates_data для import_rates_to_dino."""
     rates_data = []
     for item in data:
         code = item.get('cc')
@@ -378,9 +468,33 @@ def import_nbu_rates(env, bank=None, start_date=None, end_date=None, overwrite=F
             'rate': rate_val,
             'date': date_iso
         })
+    return rates_data
 
-    # 4. Импорт через универсальную функцию
-    return import_rates_to_dino(env, rates_data, 'nbu', 'official', overwrite)
+
+def _complete_nbu_chunks(env, chunks, today):
+    """
+    Куски, полностью присутствующие в dino.currency.rate: курс НБУ есть на каждый
+    календарный день куска. Кусок с сегодняшним днем никогда не считается полным.
+    Один запрос на весь период.
+    """
+    if not chunks:
+        return set()
+    env['dino.currency.rate'].flush_model(['date', 'source', 'rate_type'])
+    env.cr.execute("""
+        SELECT DISTINCT date
+          FROM dino_currency_rate
+         WHERE source = 'nbu' AND rate_type = 'official'
+           AND date BETWEEN %s AND %s
+    """, (chunks[0][0], chunks[-1][1]))
+    present = {row[0] for row in env.cr.fetchall()}
+    complete = set()
+    for chunk_start, chunk_end in chunks:
+        if chunk_end >= today:
+            continue
+        days = (chunk_end - chunk_start).days + 1
+        if all(chunk_start + timedelta(days=i) in present for i in range(days)):
+            complete.add((chunk_start, chunk_end))
+    return complete
 
 
 def run_sync(env, bank=None):
@@ -398,12 +512,10 @@ def run_sync(env, bank=None):
         _logger.error(f"run_sync: Import failed with error: {import_res['error']}")
         raise UserError(_('Ошибка НБУ: %s') % import_res['error'])
 
-    # 2. Синхронизация в систему всех NBU official курсов
-    _logger.warning("run_sync: Syncing NBU official rates to system")
-    sync_domain = [('source', '=', 'nbu'), ('rate_type', '=', 'official')]
-    sync_stats = sync_rates_to_system(
-        env,
-        domain=sync_domain,
+    # 2. Синхронизация в систему NBU official курсов, измененных с прошлого запуска
+    _logger.warning("run_sync: Syncing changed NBU official rates to system")
+    sync_stats = sync_rates_incremental(
+        env, 'nbu', 'official',
         overwrite=getattr(bank, 'cron_overwrite_existing_rates', False) if bank else False
     )
     _logger.warning(f"run_sync: Sync stats: {sync_stats}")
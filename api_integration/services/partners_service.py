@@ -4,13 +4,26 @@
 # -*- coding: utf-8 -*-
 import re
 import logging
+import threading
+import time
 import requests
-from datetime import datetime
-from odoo import _
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from odoo import _, fields
 from odoo.exceptions import UserError
+from . import run_metrics
+from .http_sessions import get_session
 
 _logger = logging.getLogger(__name__)
 
+REGISTRY_URL = 'https://adm.tools'
+REGISTRY_WORKERS = 8            # потоков запросов к реестру (<= размера пула сессии)
+REGISTRY_RATE = 5               # запросов в секунду к хосту реестра
+REGISTRY_CACHE_TTL_DAYS = 7     # не перезапрашивать код, если кэш моложе
+REGISTRY_STABLE_DAYS = 365      # last_update старше - компания считается стабильной
+
 
 def _parse_date_str(d):
     """Parse date string in various formats"""
@@ -54,11 +67,11 @@ def fetch_partner_registry_data(egrpou):
         _logger.warning("fetch_partner_registry_data: Empty EGRPOU provided")
         return {}
     
-    url = f'https://adm.tools/action/gov/api/?egrpou={okpo}'
+    url = f'{REGISTRY_URL}/action/gov/api/?egrpou={okpo}'
     
     try:
         _logger.info(f"Fetching registry data for EGRPOU: {okpo}")
-        resp = requests.get(url, timeout=10)
+        resp = get_session(REGISTRY_URL, retries=0).get(url, timeout=10)
         resp.raise_for_status()
     except requests.RequestException as ex:
         _logger.error(f'Failed to fetch registry for {okpo}: {ex}')
@@ -141,49 +154,169 @@ def fetch_partner_registry_data(egrpou):
     return result
 
 
-def update_partners_from_registry(env, partner_ids=None):
+class RateLimiter:
+    """Не больше rate запросов в секунду на хост; общий для всех потоков пула."""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_slot = {}  # host -> момент, с которого можно следующий запрос
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+def fetch_registry_batch(codes, workers=REGISTRY_WORKERS, rate=REGISTRY_RATE):
+    """
+    Параллельно запрашивает реестр по кодам ЕДРПОУ (пул потоков, общая сессия,
+    лимит запросов в секунду на хост реестра).
+
+    Потоки не трогают env: только HTTP и разбор XML.
+    Возвращает: ({egrpou: vals}, {egrpou: error})
+    """
+    limiter = RateLimiter(rate)
+    host = urlsplit(REGISTRY_URL).netloc
+    metrics = run_metrics.current()
+
+    def _fetch(code):
+        with run_metrics.bind(metrics):
+            limiter.wait(host)
+            return fetch_partner_registry_data(code)
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(_fetch, code): code for code in codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                results[code] = future.result()
+            except Exception as ex:
+                errors[code] = str(ex)
+    return results, errors
+
+
+def _cache_ttl(entry, ttl_days):
+    """TTL записи кэша: компании, не менявшиеся в реестре больше года (last_update), перепроверяются в 4 раза реже."""
+    if entry.last_update and (fields.Date.today() - entry.last_update).days > REGISTRY_STABLE_DAYS:
+        return timedelta(days=ttl_days * 4)
+    return timedelta(days=ttl_days)
+
+
+def _changed_vals(partner, vals):
+    """Только поля, которые реально отличаются от текущих значений партнера."""
+    return {k: v for k, v in vals.items() if k in partner._fields and partner[k] != v}
+
+
+def update_partners_from_registry(env, partner_ids=None, workers=REGISTRY_WORKERS, rate=REGISTRY_RATE,
+                                  ttl_days=REGISTRY_CACHE_TTL_DAYS, force=False):
     """
     Update multiple partners from registry by their EGRPOU.
-    
+
+    Коды с записью в dino.partner.registry.cache моложе ttl_days в реестр не
+    запрашиваются (force=True - запросить все). Остальные запрашиваются
+    параллельно (fetch_registry_batch), ответы сохраняются в кэш.
+    Партнерам пишутся только изменившиеся поля; партнеры с одинаковыми
+    изменениями (например, дубли одного кода) пишутся одним write.
+
     Args:
         env: Odoo environment
         partner_ids: List of partner IDs to update. If None, updates all partners with EGRPOU.
-    
+
     Returns:
-        dict with stats: {'updated': N, 'skipped': N, 'errors': N}
+        dict with stats: {'updated': N, 'skipped': N, 'errors': N, 'fetched': N, 'cached': N}
     """
     Partner = env['dino.partner']
-    
+    Cache = env['dino.partner.registry.cache']
+
     if partner_ids:
         partners = Partner.browse(partner_ids)
     else:
         # Get all partners with EGRPOU
         partners = Partner.search([('egrpou', '!=', False)])
-    
-    stats = {'updated': 0, 'skipped': 0, 'errors': 0}
-    
+
+    stats = {'updated': 0, 'skipped': 0, 'errors': 0, 'fetched': 0, 'cached': 0}
+
     _logger.info(f"Starting registry update for {len(partners)} partners")
-    
+
+    partners_by_code = defaultdict(list)
     for partner in partners:
         okpo = (partner.egrpou or '').strip()
         if not okpo:
             _logger.debug(f'No EGRPOU for partner {partner.id} ({partner.name}), skip')
             stats['skipped'] += 1
             continue
-        
-        try:
-            vals = fetch_partner_registry_data(okpo)
-            if vals:
-                partner.write(vals)
-                stats['updated'] += 1
-                _logger.info(f'Updated partner {partner.id} ({partner.name}) from registry')
+        partners_by_code[okpo].append(partner)
+
+    # 1. Кэш: свежие записи не запрашиваем
+    cache_map = Cache.get_map(partners_by_code)
+    now = fields.Datetime.now()
+    registry_vals = {}
+    to_fetch = []
+    for code in partners_by_code:
+        entry = cache_map.get(code)
+        if entry and not force and ttl_days and entry.fetched_at >= now - _cache_ttl(entry, ttl_days):
+            registry_vals[code] = entry.get_vals()
+            stats['cached'] += 1
+        else:
+            to_fetch.append(code)
+
+    # 2. Реестр: параллельно, с лимитом на хост
+    if to_fetch:
+        _logger.info(f"Fetching {len(to_fetch)} EGRPOU from registry ({stats['cached']} from cache, {workers} workers)")
+        results, errors = fetch_registry_batch(to_fetch, workers=workers, rate=rate)
+        for code, error in errors.items():
+            stats['errors'] += len(partners_by_code[code])
+            _logger.error(f'Failed to fetch registry for {code}: {error}')
+        Cache.store(results, cache_map)
+        registry_vals.update(results)
+        stats['fetched'] = len(results)
+
+    # 3. Изменившиеся поля, сгруппированные по одинаковым значениям
+    write_groups = defaultdict(list)
+    for code, vals in registry_vals.items():
+        for partner in partners_by_code[code]:
+            if not vals:
+                stats['skipped'] += 1
+                _logger.warning(f'No data returned for partner {partner.id} ({code})')
+                continue
+            changes = _changed_vals(partner, vals)
+            if changes:
+                write_groups[tuple(sorted(changes.items()))].append(partner.id)
             else:
                 stats['skipped'] += 1
-                _logger.warning(f'No data returned for partner {partner.id} ({okpo})')
+
+    # Группа - один write; flush внутри savepoint, иначе ошибка БД всплыла бы вне try
+    for changes, group_ids in write_groups.items():
+        changes = dict(changes)
+        try:
+            with env.cr.savepoint():
+                Partner.browse(group_ids).write(changes)
+                Partner.flush_model(list(changes))
+            stats['updated'] += len(group_ids)
+            _logger.info(f"Updated {len(group_ids)} partners from registry: {', '.join(changes)}")
+            continue
         except Exception as ex:
-            stats['errors'] += 1
-            _logger.exception(f'Failed to update partner {partner.id} ({partner.name}): {ex}')
-    
+            _logger.warning(f'Group write of {len(group_ids)} partners failed, retrying one by one: {ex}')
+        # Группа не прошла - по одному, чтобы ошибка одного партнера не теряла остальных
+        for partner in Partner.browse(group_ids):
+            try:
+                with env.cr.savepoint():
+                    partner.write(changes)
+                    Partner.flush_model(list(changes))
+                stats['updated'] += 1
+            except Exception as ex:
+                stats['errors'] += 1
+                _logger.exception(f'Failed to update partner {partner.id} ({partner.name}): {ex}')
+
     _logger.info(f"Registry update completed: {stats}")
     return {'stats': stats}
 # End of file api_integration/services/partners_service.py
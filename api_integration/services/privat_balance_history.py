@@ -3,10 +3,14 @@
 #
 # -*- coding: utf-8 -*-
 import logging
+from collections import defaultdict
 from datetime import datetime
 from odoo import _, fields
 from odoo.exceptions import UserError
+from odoo.tools import float_compare
+from . import run_metrics
 from .privat_client import PrivatClient
+from .privat_service import SyncCheckpoint, _page_source
 
 _logger = logging.getLogger(__name__)
 
@@ -34,10 +38,81 @@ def get_client(endpoint):
     return PrivatClient(api_key=endpoint.auth_token, client_id=endpoint.auth_api_key)
 
 
-def import_balance_history(endpoint, startDate=None, endDate=None):
+# Поля, по которым сравниваем существующую запись с данными API
+_COMPARE_FIELDS = (
+    'balance_start', 'balance_end', 'turnover_debit', 'turnover_credit',
+    'is_final', 'last_movement_date', 'external_id',
+)
+
+
+def _upsert_balance_page(BalanceHistory, page_vals):
+    """
+    Пакетный upsert одной страницы истории балансов.
+
+    Вместо search + write/create на каждую запись:
+    - один search по всем ключам (date, bank_account_id) страницы;
+    - один create(vals_list) для новых дат;
+    - write только изменившихся полей, сгруппированный по одинаковым vals.
+
+    page_vals: {(date, bank_account_id): vals}
+    Возвращает (created, updated).
+    """
+    if not page_vals:
+        return 0, 0
+
+    dates = [key[0] for key in page_vals]
+    account_ids = list({key[1] for key in page_vals})
+    existing = BalanceHistory.search([
+        ('bank_account_id', 'in', account_ids),
+        ('date', '>=', min(dates)),
+        ('date', '<=', max(dates)),
+    ])
+    existing_map = {(rec.date, rec.bank_account_id.id): rec for rec in existing}
+
+    create_list = []
+    write_groups = defaultdict(list)
+    updated = 0
+    for key, vals in page_vals.items():
+        rec = existing_map.get(key)
+        if not rec:
+            create_list.append(vals)
+            continue
+        updated += 1
+        changes = {
+            fname: vals[fname] for fname in _COMPARE_FIELDS
+            if _is_changed(rec[fname], vals[fname])
+        }
+        if changes:
+            changes['import_date'] = vals['import_date']
+            write_groups[tuple(sorted(changes.items()))].append(rec.id)
+
+    if create_list:
+        BalanceHistory.create(create_list)
+    for changes, rec_ids in write_groups.items():
+        BalanceHistory.browse(rec_ids).write(dict(changes))
+    if create_list or write_groups:
+        # Дневные остатки пересчитываем только за дни этой страницы
+        BalanceHistory.env['dino.bank.cash.position'].refresh_days(
+            (account_id, balance_date) for balance_date, account_id in page_vals
+        )
+
+    _logger.info(f"   Page upsert: created {len(create_list)}, updated {updated}, write groups {len(write_groups)}")
+    return len(create_list), updated
+
+
+def _is_changed(old, new):
+    if isinstance(new, float):
+        return float_compare(old or 0.0, new, precision_digits=2) != 0
+    return (old or False) != (new or False)
+
+
+def import_balance_history(endpoint, startDate=None, endDate=None, prefetch=2, per_account=False, rate_limit=None,
+                           checkpoint_every=0, max_pages=0):
     """
     Импорт истории ежедневных балансов из PrivatBank API.
     Работает только с активными счетами.
+    Параметры конвейера загрузки (prefetch/per_account/rate_limit) - см. privat_service._page_source.
+    checkpoint_every/max_pages - возобновляемая загрузка, см. privat_service.SyncCheckpoint.
     """
     bank = endpoint.bank_id
     if not bank:
@@ -91,14 +166,16 @@ def import_balance_history(endpoint, startDate=None, endDate=None):
     else:
         _logger.info(f"Full sync: starting from configured start_date {start_date_obj}")
     
+    # Незавершенный проход продолжаем с сохраненного followId
+    tracker = SyncCheckpoint(endpoint, every=0 if per_account else checkpoint_every, max_pages=max_pages)
+    start_date_obj, _date_to, follow_id, resume_stats = tracker.resume_or_start(start_date_obj)
+
     start_date_str = start_date_obj.strftime('%d-%m-%Y')
     
     _logger.info(f"Starting balance history import from {start_date_str} (no end date)")
     
-    total_created = 0
-    total_updated = 0
-    total_skipped = 0
-    inactive_acc_count = 0
+    stats = {'created': 0, 'updated': 0, 'skipped': 0, 'inactive_accounts': 0}
+    stats.update(resume_stats)
     page_count = 0
     
     # Кэш активных счетов по external_id
@@ -111,20 +188,26 @@ def import_balance_history(endpoint, startDate=None, endDate=None):
     try:
         # Получаем балансы БЕЗ указания конкретного счета - получим все активные счета
         # API вернет все балансы от startDate и далее через пагинацию (followId)
-        for page_balances in client.get_balance_history_generator(
-            account_num=None,  # НЕ указываем acc - получим все активные счета
+        for page_balances, next_page_id in _page_source(
+            client, 'get_balance_history_generator', active_accounts,
+            prefetch=prefetch, per_account=per_account, rate_limit=rate_limit,
             start_date=start_date_str,
             end_date=None,  # БЕЗ конечной даты - API вернет все с пагинацией
-            limit=100
+            limit=100,
+            follow_id=follow_id,
+            with_follow_id=True
         ):
             page_count += 1
+            run_metrics.count('pages')
             _logger.info(f"Processing page {page_count}, received {len(page_balances)} balance records")
-            
+
+            page_vals = {}
+            import_date = fields.Datetime.now()
             for balance_data in page_balances:
                 # Проверяем что это активный счет
                 acc_num = balance_data.get('acc')
                 if acc_num not in active_accounts_map:
-                    inactive_acc_count += 1
+                    stats['inactive_accounts'] += 1
                     continue
                 
                 current_account = active_accounts_map[acc_num]
@@ -135,15 +218,15 @@ def import_balance_history(endpoint, startDate=None, endDate=None):
                     balance_date = _parse_privat_date(dpd_str.split(' ')[0])
                 else:
                     _logger.debug(f"No valid dpd date in balance data, skipping")
-                    total_skipped += 1
+                    stats['skipped'] += 1
                     continue
                 
                 if not balance_date:
-                    total_skipped += 1
+                    stats['skipped'] += 1
                     continue
                 
-                # Подготовка данных
-                vals = {
+                # Подготовка данных (дубль ключа внутри страницы - побеждает последний)
+                page_vals[(balance_date, current_account.id)] = {
                     'date': balance_date,
                     'bank_account_id': current_account.id,
                     'balance_start': float(balance_data.get('balanceIn', 0)),
@@ -153,36 +236,27 @@ def import_balance_history(endpoint, startDate=None, endDate=None):
                     'is_final': balance_data.get('is_final_bal', False),
                     'last_movement_date': balance_date,
                     'external_id': balance_data.get('acc'),
-                    'import_date': fields.Datetime.now()
+                    'import_date': import_date
                 }
-                
-                # Upsert: проверяем существует ли запись
-                existing = BalanceHistory.search([
-                    ('date', '=', balance_date),
-                    ('bank_account_id', '=', current_account.id)
-                ], limit=1)
-                
-                if existing:
-                    existing.write(vals)
-                    total_updated += 1
-                else:
-                    BalanceHistory.create(vals)
-                    total_created += 1
+
+            created, updated = _upsert_balance_page(BalanceHistory, page_vals)
+            stats['created'] += created
+            stats['updated'] += updated
+
+            if tracker.page_done(next_page_id, stats):
+                break
+        else:
+            tracker.finish(stats)
     
     except Exception as e:
         _logger.error(f"Error importing balance history: {e}", exc_info=True)
+        tracker.fail(e)
         raise
     
     _logger.info(f"=== BALANCE HISTORY IMPORT COMPLETED ===")
-    _logger.info(f"Total pages: {page_count}, Created: {total_created}, Updated: {total_updated}, Skipped: {total_skipped}, Inactive: {inactive_acc_count}")
+    _logger.info(f"Total pages: {page_count}, Created: {stats['created']}, Updated: {stats['updated']}, Skipped: {stats['skipped']}, Inactive: {stats['inactive_accounts']}")
     
     return {
-        'stats': {
-            'created': total_created,
-            'updated': total_updated,
-            'skipped': total_skipped,
-            'inactive_accounts': inactive_acc_count,
-            'errors': 0
-        }
+        'stats': dict(stats, errors=0)
     }
 # End of file api_integration/services/privat_balance_history.py
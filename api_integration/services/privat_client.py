@@ -3,40 +3,159 @@
 #
 # -*- coding: utf-8 -*-
 import logging
+import queue
 import requests
 import json
+import threading
 import time
 from datetime import date
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from . import http_sessions, run_metrics
 
 _logger = logging.getLogger(__name__)
 
 BASE_URL = 'https://acp.privatbank.ua/api'
 
+# Маркер конца потока страниц в очереди prefetch
+_END = object()
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token-bucket лимитер запросов.
+    Один экземпляр делится между всеми пейджерами (fan-out по счетам),
+    вместо фиксированного time.sleep(request_delay) в каждом.
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)          # токенов в секунду
+        self.capacity = float(capacity)  # максимальный burst
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Блокирует поток, пока не появится свободный токен."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def iter_prefetched(sources, depth=2):
+    """
+    Producer/consumer конвейер для постраничных генераторов.
+
+    Каждый источник (итератор страниц) листается в своем фоновом потоке,
+    страницы складываются в ограниченную очередь (depth * кол-во источников).
+    Потребитель (поток с курсором Odoo) пишет текущую страницу в БД, пока
+    следующие уже скачиваются. В фоновых потоках нельзя трогать env/cursor -
+    только HTTP.
+
+    Исключение в любом источнике пробрасывается потребителю.
+    Если потребитель прекратил итерацию, фоновые потоки останавливаются.
+    """
+    sources = list(sources)
+    if not sources:
+        return
+    pages = queue.Queue(maxsize=max(1, depth) * len(sources))
+    stop = threading.Event()
+    # HTTP время фоновых потоков идет в метрики запуска потребителя
+    metrics = run_metrics.current()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(source):
+        with run_metrics.bind(metrics):
+            try:
+                for page in source:
+                    if not _put(page):
+                        return
+            except Exception as e:  # noqa: BLE001 - пробрасываем потребителю
+                _put(e)
+            finally:
+                _put(_END)
+
+    threads = [
+        threading.Thread(target=_produce, args=(src,), name=f'privat-prefetch-{i}', daemon=True)
+        for i, src in enumerate(sources)
+    ]
+    for t in threads:
+        t.start()
+
+    finished = 0
+    try:
+        while finished < len(threads):
+            item = pages.get()
+            if item is _END:
+                finished += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+
+
 class PrivatClient:
-    def __init__(self, api_key, client_id=None, timeout=30, request_delay=0.3):
+    def __init__(self, api_key, client_id=None, timeout=30, request_delay=0.3, rate_limiter=None, session=None):
         if not api_key:
             raise ValueError("API key (token) is required")
         
+        self.api_key = api_key
+        self.client_id = client_id
         self.timeout = timeout
         self.request_delay = request_delay
-        self.session = requests.Session()
-        
-        # Настраиваем заголовки один раз для всех запросов
-        self.session.headers.update({
+        self.rate_limiter = rate_limiter
+
+        # Заголовки задаются один раз при создании общей сессии пула
+        headers = {
             'User-Agent': 'DinoERP Integration',
             'token': api_key,
             'Content-Type': 'application/json;charset=cp1251' # На всякий случай, хотя для GET не критично
-        })
-        
+        }
         # Если это группа предприятий, добавляем ID
         if client_id:
-            self.session.headers['id'] = str(client_id)
+            headers['id'] = str(client_id)
+
+        # Сессия с keep-alive и общей политикой повторов - из реестра процесса
+        self.session = session or http_sessions.get_session(BASE_URL, credentials=(api_key, client_id), headers=headers)
+
+    def _clone(self):
+        """
+        Клиент с теми же настройками для фонового потока: своя пагинация,
+        но общая сессия - соединения берутся из общего пула (pool_maxsize).
+        """
+        return PrivatClient(
+            api_key=self.api_key,
+            client_id=self.client_id,
+            timeout=self.timeout,
+            request_delay=self.request_delay,
+            rate_limiter=self.rate_limiter,
+            session=self.session,
+        )
 
-        # Retry strategy
-        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
+    def _throttle(self):
+        """Пауза между страницами: общий token bucket или фиксированная задержка."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        elif self.request_delay:
+            time.sleep(self.request_delay)
 
     def _get(self, endpoint, params=None):
         """Выполняет GET запрос с автоматической обработкой кодировки CP1251."""
@@ -96,10 +215,14 @@ class PrivatClient:
             _logger.error(f"PrivatBank exchange API error: {e}")
             raise
 
-    def get_transactions_generator(self, account_num=None, start_date=None, end_date=None, limit=100):
+    def get_transactions_generator(self, account_num=None, start_date=None, end_date=None, limit=100,
+                                   follow_id=None, with_follow_id=False):
         """
         Генератор, который листает страницы транзакций.
         Автоматически обрабатывает followId.
+
+        follow_id - продолжить с сохраненной страницы (checkpoint).
+        with_follow_id=True - отдает пары (transactions, next_page_id), next_page_id=None на последней странице.
         """
         params = {
             'startDate': start_date,
@@ -112,8 +235,6 @@ class PrivatClient:
         if end_date:
             params['endDate'] = end_date
 
-        follow_id = None
-
         while True:
             if follow_id:
                 params['followId'] = follow_id
@@ -131,21 +252,28 @@ class PrivatClient:
                 break
 
             transactions = data.get('transactions', [])
-            if transactions:
+            has_next = bool(data.get('exist_next_page') and data.get('next_page_id'))
+            next_id = data['next_page_id'] if has_next else None
+            if with_follow_id:
+                yield transactions, next_id
+            elif transactions:
                 yield transactions
 
             # Проверка на наличие следующей страницы
-            if data.get('exist_next_page') and data.get('next_page_id'):
-                follow_id = data['next_page_id']
-                if self.request_delay:
-                    time.sleep(self.request_delay)
+            if has_next:
+                follow_id = next_id
+                self._throttle()
             else:
                 break
 
-    def get_balance_history_generator(self, account_num=None, start_date=None, end_date=None, limit=100):
+    def get_balance_history_generator(self, account_num=None, start_date=None, end_date=None, limit=100,
+                                      follow_id=None, with_follow_id=False):
         """
         Генератор, который листает страницы истории балансов.
         Автоматически обрабатывает followId.
+
+        follow_id - продолжить с сохраненной страницы (checkpoint).
+        with_follow_id=True - отдает пары (balances, next_page_id), next_page_id=None на последней странице.
         """
         params = {
             'startDate': start_date,
@@ -158,8 +286,6 @@ class PrivatClient:
         if end_date:
             params['endDate'] = end_date
 
-        follow_id = None
-
         while True:
             if follow_id:
                 params['followId'] = follow_id
@@ -177,14 +303,38 @@ class PrivatClient:
                 break
 
             balances = data.get('balances', [])
-            if balances:
+            has_next = bool(data.get('exist_next_page') and data.get('next_page_id'))
+            next_id = data['next_page_id'] if has_next else None
+            if with_follow_id:
+                yield balances, next_id
+            elif balances:
                 yield balances
 
             # Проверка на наличие следующей страницы
-            if data.get('exist_next_page') and data.get('next_page_id'):
-                follow_id = data['next_page_id']
-                if self.request_delay:
-                    time.sleep(self.request_delay)
+            if has_next:
+                follow_id = next_id
+                self._throttle()
             else:
                 break
+
+    def iter_pages(self, generator_name, account_nums=None, prefetch=2, **kwargs):
+        """
+        Листает страницы `generator_name` ('get_transactions_generator' или
+        'get_balance_history_generator') с prefetch в фоновом потоке.
+
+        account_nums=None - один пейджер по всем счетам (без acc).
+        account_nums=[...] - fan-out: свой пейджер на каждый счет, все параллельно,
+        под общим rate_limiter (если не задан - создается из request_delay).
+        """
+        if not account_nums:
+            source = getattr(self._clone(), generator_name)(account_num=None, **kwargs)
+            return iter_prefetched([source], depth=prefetch)
+
+        if not self.rate_limiter:
+            self.rate_limiter = TokenBucket(rate=1.0 / self.request_delay if self.request_delay else 5)
+        sources = [
+            getattr(self._clone(), generator_name)(account_num=acc, **kwargs)
+            for acc in account_nums
+        ]
+        return iter_prefetched(sources, depth=prefetch)
 # End of file api_integration/services/privat_client.py
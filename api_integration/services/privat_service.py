@@ -6,7 +6,8 @@ import logging
 from datetime import datetime
 from odoo import _, fields
 from odoo.exceptions import UserError
-from .privat_client import PrivatClient
+from . import run_metrics
+from .privat_client import PrivatClient, TokenBucket
 from .nbu_service import import_rates_to_dino
 
 _logger = logging.getLogger(__name__)
@@ -112,9 +113,183 @@ def import_accounts(endpoint, startDate=None, endDate=None):
     return {'stats': stats, 'accounts': BankAccount.browse(processed_ids)}
 
 
-def import_transactions(endpoint, startDate=None, endDate=None):
+_EMPTY_STATS = {'created': 0, 'updated': 0, 'skipped': 0, 'inactive_accounts': 0}
+
+
+class SyncCheckpoint:
+    """
+    Возобновляемая загрузка поверх `dino.api.checkpoint`.
+
+    every=K - коммит и сохранение followId каждые K страниц (0 - выключено).
+    max_pages=N - бюджет страниц на один запуск: после N страниц импорт
+    останавливается, а следующий тик крона продолжает с сохраненного followId.
+    Так многолетний backfill разбивается на короткие запуски без таймаутов воркера.
+    """
+
+    def __init__(self, endpoint, every=0, max_pages=0):
+        self.endpoint = endpoint
+        self.every = every or 0
+        self.max_pages = max_pages or 0
+        self.checkpoint = None
+        self._pending = 0
+        self._pages = 0
+
+    def resume_or_start(self, date_from, date_to=None):
+        """Возвращает (date_from, date_to, follow_id, stats) для текущего запуска."""
+        if not self.every:
+            return date_from, date_to, None, {}
+        Checkpoint = self.endpoint.env['dino.api.checkpoint']
+        checkpoint = Checkpoint.get_for(self.endpoint)
+        if checkpoint and checkpoint.is_resumable():
+            self.checkpoint = checkpoint
+            _logger.info(f"Resume {self.endpoint.name} from checkpoint: window {checkpoint.date_from}..{checkpoint.date_to}, "
+                         f"pages done {checkpoint.pages_done}, followId {checkpoint.next_page_id}")
+            return checkpoint.date_from, checkpoint.date_to, checkpoint.next_page_id, checkpoint.get_stats()
+        self.checkpoint = Checkpoint.start(self.endpoint, date_from, date_to)
+        return date_from, date_to, None, {}
+
+    def page_done(self, next_page_id, stats):
+        """Отмечает обработанную страницу. True - бюджет страниц исчерпан, пора остановиться."""
+        self._pages += 1
+        if not self.checkpoint:
+            return False
+        self._pending += 1
+        budget_exhausted = bool(self.max_pages and self._pages >= self.max_pages and next_page_id)
+        if next_page_id and (self._pending >= self.every or budget_exhausted):
+            self.checkpoint.save_progress(next_page_id, stats, pages=self._pending)
+            self._pending = 0
+        if budget_exhausted:
+            _logger.info(f"{self.endpoint.name}: page budget {self.max_pages} reached, will resume on next run")
+        return budget_exhausted
+
+    def finish(self, stats):
+        if self.checkpoint:
+            self.checkpoint.finish(stats)
+
+    def fail(self, error):
+        if self.checkpoint:
+            self.checkpoint.record_error(error)
+
+
+def _page_source(client, generator_name, accounts, prefetch=2, per_account=False, rate_limit=None, **kwargs):
+    """
+    Источник страниц для импорта.
+
+    prefetch > 0 - следующие страницы скачиваются в фоновом потоке, пока текущая пишется в БД.
+    per_account - по пейджеру на каждый активный счет, параллельно, под общим token bucket.
+    rate_limit - запросов в секунду для token bucket (по умолчанию 1 / request_delay).
+    """
+    if rate_limit:
+        client.rate_limiter = TokenBucket(rate=float(rate_limit))
+    if per_account:
+        account_nums = [acc.external_id or acc.account_number for acc in accounts]
+        _logger.info(f"Fan-out: {len(account_nums)} параллельных пейджеров, prefetch={prefetch}")
+        return client.iter_pages(generator_name, account_nums=account_nums, prefetch=prefetch or 1, **kwargs)
+    if prefetch:
+        return client.iter_pages(generator_name, prefetch=prefetch, **kwargs)
+    return getattr(client, generator_name)(account_num=None, **kwargs)
+
+
+def _import_transactions_page(TransModel, trans_batch, acc_map, local_accounts, force_full_sync, created_ids=None):
+    """
+    Обрабатывает одну страницу транзакций API.
+    Возвращает статистику страницы: {'created', 'updated', 'skipped', 'inactive_accounts'}.
+    created_ids (list) дополняется ID вставленных транзакций.
+    """
+    stats = dict(_EMPTY_STATS)
+
+    # --- BATCH OPTIMIZATION ---
+    # Одна страница = один INSERT ... ON CONFLICT (bank_account_id, external_id)
+
+    # Сбор ID для проверки дублей
+    batch_ext_ids = [str(t.get('ID')) for t in trans_batch if t.get('ID')]
+    if not batch_ext_ids:
+        _logger.warning("В пачке нет транзакций с ID, пропускаем")
+        return stats
+
+    # Без Force Full Sync дубли отсекаем заранее, чтобы не резолвить по ним контрагентов
+    existing_ext_ids = set()
+    if not force_full_sync:
+        existing_ext_ids = set(TransModel.search([
+            ('bank_account_id', 'in', local_accounts.ids),  # Проверяем по всем счетам банка
+            ('external_id', 'in', batch_ext_ids)
+        ]).mapped('external_id'))
+        _logger.info(f"Найдено {len(existing_ext_ids)} дубликатов в базе из {len(batch_ext_ids)} ID")
+
+    vals_list = []
+
+    for t in trans_batch:
+        # Проверка на дубликат
+        ext_id = str(t.get('ID'))
+        if ext_id in existing_ext_ids:
+            # Если дубль и флаг выключен - пропускаем
+            stats['skipped'] += 1
+            continue
+
+        # Определение счета Odoo
+        # Приват возвращает AUT_MY_ACC - номер нашего счета в этой транзакции
+        my_acc_num = t.get('AUT_MY_ACC')
+        account = acc_map.get(my_acc_num)
+
+        if not account:
+            # Попробуем найти по IBAN из AUT_MY_IBAN (иногда бывает такое поле)
+            alt_acc_num = t.get('AUT_MY_IBAN')
+            if alt_acc_num:
+                account = acc_map.get(alt_acc_num)
+            if not account:
+                _logger.debug(f"Пропущена транзакция {ext_id} по неактивному/отсутствующему счету: AUT_MY_ACC={my_acc_num}")
+                stats['inactive_accounts'] += 1
+                continue
+
+        # Логика знака (D - расход, C - приход)
+        amount = float(t.get('SUM', 0))
+        if t.get('TRANTYPE') == 'D':
+            amount = -abs(amount)
+        else:
+            amount = abs(amount)
+
+        # Парсинг даты
+        date_val = _parse_privat_date(t.get('DAT_OD'), t.get('TIM_P'))
+        if not date_val:
+            date_val = _parse_privat_date(t.get('DAT_KL'))
+
+        vals_list.append({
+            'bank_account_id': account.id,
+            'currency_id': account.currency_id.id,  # related stored, в SQL заполняем сами
+            'external_id': ext_id,
+            'document_number': t.get('NUM_DOC'),
+            'datetime': fields.Datetime.to_datetime(date_val) if date_val else False,
+            'amount': amount,
+            'counterparty_name': t.get('AUT_CNTR_NAM'),
+            'counterparty_edrpou': t.get('AUT_CNTR_CRF'),
+            'counterparty_iban': t.get('AUT_CNTR_ACC'),
+            'counterparty_bank_name': t.get('AUT_CNTR_MFO_NAME'),
+            'counterparty_bank_city': t.get('AUT_CNTR_MFO_CITY'),
+            'counterparty_bank_mfo': t.get('AUT_CNTR_MFO'),
+            'description': t.get('OSND') or t.get('REF'),  # Объединяем описание и реф
+            'raw_data': t,  # Сырой ответ: сжатый канонический JSON в dino.bank.transaction.raw
+        })
+
+    if vals_list:
+        upsert_stats = TransModel._bulk_upsert_from_api(vals_list, update_existing=force_full_sync,
+                                                        created_ids=created_ids)
+        stats['created'] = upsert_stats['created']
+        stats['updated'] = upsert_stats['updated']
+        stats['skipped'] += upsert_stats['skipped']
+        _logger.info(f"   + Импортировано {stats['created']} новых, обновлено {stats['updated']} транзакций из пачки")
+    else:
+        _logger.info("   Нет новых транзакций для импорта в этой пачке")
+
+    _logger.info(f"   Статистика пачки: создано {stats['created']}, обновлено {stats['updated']}, дубли {stats['skipped']}, неактивные счета {stats['inactive_accounts']}")
+    return stats
+
+
+def import_transactions(endpoint, startDate=None, endDate=None, prefetch=2, per_account=False, rate_limit=None,
+                        checkpoint_every=0, max_pages=0):
     """
     Массовый импорт транзакций по всем счетам сразу (без параметра acc).
+    Параметры конвейера загрузки (prefetch/per_account/rate_limit) - см. `_page_source`.
+    checkpoint_every/max_pages - возобновляемая загрузка, см. `SyncCheckpoint`.
     """
     bank = endpoint.bank_id
     if not bank:
@@ -156,8 +331,13 @@ def import_transactions(endpoint, startDate=None, endDate=None):
     else:
         _logger.info(f"Full sync: starting from configured start_date {s_date_val}")
 
+    # Незавершенный проход (упал или исчерпал max_pages) продолжаем с сохраненного followId
+    tracker = SyncCheckpoint(endpoint, every=0 if per_account else checkpoint_every, max_pages=max_pages)
+    e_date_val = fields.Date.to_date(endDate) if endDate else None
+    s_date_val, e_date_val, follow_id, resume_stats = tracker.resume_or_start(s_date_val, e_date_val)
+
     s_date_api = s_date_val.strftime('%d-%m-%Y')
-    e_date_api = fields.Date.to_date(endDate).strftime('%d-%m-%Y') if endDate else None
+    e_date_api = e_date_val.strftime('%d-%m-%Y') if e_date_val else None
 
     # 2. Подготовка карты счетов (Mapping)
     # Нам нужно быстро находить ID счета в Odoo по номеру из JSON (AUT_MY_ACC)
@@ -177,138 +357,58 @@ def import_transactions(endpoint, startDate=None, endDate=None):
 
     _logger.info(f"Запуск импорта транзакций с {s_date_api} для {len(local_accounts)} активных счетов")
 
-    # 3. Запрос к API без указания конкретного счета (account_num=None)
+    # 3. Запрос к API без указания конкретного счета (account_num=None) или fan-out по счетам
     # Клиент будет листать страницы, пока они не закончатся
-    pages_iter = client.get_transactions_generator(
-        account_num=None, 
+    pages_iter = _page_source(
+        client, 'get_transactions_generator', local_accounts,
+        prefetch=prefetch, per_account=per_account, rate_limit=rate_limit,
         start_date=s_date_api,
-        end_date=e_date_api
+        end_date=e_date_api,
+        follow_id=follow_id,
+        with_follow_id=True
     )
 
-    total_created = 0
-    total_updated = 0
-    total_skipped = 0
-    inactive_acc_count = 0
+    stats = dict(_EMPTY_STATS, **resume_stats)
     total_processed = 0
+    matching = {'transactions': 0, 'auto': 0, 'proposed': 0}
+    PaymentMatch = bank.env['dino.payment.match']
 
     page_count = 0
-    for trans_batch in pages_iter:
-        page_count += 1
-        batch_size = len(trans_batch) if trans_batch else 0
-        _logger.info(f"Обработка страницы {page_count}: получено {batch_size} транзакций из API")
-        total_processed += batch_size
-
-        if not trans_batch:
-            _logger.debug("Пустая страница, пропускаем")
-            continue
-
-        # --- BATCH OPTIMIZATION ---
-        
-        # Сбор ID для проверки дублей
-        batch_ext_ids = [str(t.get('ID')) for t in trans_batch if t.get('ID')]
-        if not batch_ext_ids:
-            _logger.warning("В пачке нет транзакций с ID, пропускаем")
-            continue
-
-        existing_recs = TransModel.search([
-            ('bank_account_id', 'in', [a.id for a in local_accounts]), # Проверяем по всем счетам банка
-            ('external_id', 'in', batch_ext_ids)
-        ])
-        existing_map = {r.external_id: r for r in existing_recs}
-        _logger.info(f"Найдено {len(existing_map)} дубликатов в базе из {len(batch_ext_ids)} ID")
-
-        vals_list = []
-        update_list = []
-        batch_created = 0
-        batch_updated = 0
-        batch_skipped = 0
-        batch_unknown = 0
-
-        for t in trans_batch:
-            # Проверка на дубликат
-            ext_id = str(t.get('ID'))
-            existing_rec = existing_map.get(ext_id)
-            
-            if existing_rec and not endpoint.force_full_sync:
-                # Если дубль и флаг выключен - пропускаем
-                batch_skipped += 1
-                continue
-
-            # Определение счета Odoo
-            # Приват возвращает AUT_MY_ACC - номер нашего счета в этой транзакции
-            my_acc_num = t.get('AUT_MY_ACC')
-            account = acc_map.get(my_acc_num)
-
-            if not account:
-                # Попробуем найти по IBAN из AUT_MY_IBAN (иногда бывает такое поле)
-                alt_acc_num = t.get('AUT_MY_IBAN')
-                if alt_acc_num:
-                    account = acc_map.get(alt_acc_num)
-                if not account:
-                    _logger.debug(f"Пропущена транзакция {ext_id} по неактивному/отсутствующему счету: AUT_MY_ACC={my_acc_num}")
-                    batch_unknown += 1
-                    inactive_acc_count += 1
-                    continue
-
-            # Логика знака (D - расход, C - приход)
-            amount = float(t.get('SUM', 0))
-            if t.get('TRANTYPE') == 'D':
-                amount = -abs(amount)
-            else:
-                amount = abs(amount)
-
-            # Парсинг даты
-            date_val = _parse_privat_date(t.get('DAT_OD'), t.get('TIM_P'))
-            if not date_val:
-                date_val = _parse_privat_date(t.get('DAT_KL'))
-
-            transaction_vals = {
-                'bank_account_id': account.id,
-                'external_id': ext_id,
-                'document_number': t.get('NUM_DOC'),
-                'datetime': date_val,
-                'amount': amount,
-                'counterparty_name': t.get('AUT_CNTR_NAM'),
-                'counterparty_edrpou': t.get('AUT_CNTR_CRF'),
-                'counterparty_iban': t.get('AUT_CNTR_ACC'),
-                'counterparty_bank_name': t.get('AUT_CNTR_MFO_NAME'),
-                'counterparty_bank_city': t.get('AUT_CNTR_MFO_CITY'),
-                'counterparty_bank_mfo': t.get('AUT_CNTR_MFO'),
-                'description': t.get('OSND') or t.get('REF'),  # Объединяем описание и реф
-                'raw_data': str(t),  # Сохраняем сырой JSON для отладки
-            }
-            
-            if existing_rec:
-                # Если запись существует и включен Force Full Sync - обновляем
-                update_list.append((existing_rec, transaction_vals))
-                batch_updated += 1
+    try:
+        for trans_batch, next_page_id in pages_iter:
+            page_count += 1
+            run_metrics.count('pages')
+            batch_size = len(trans_batch) if trans_batch else 0
+            _logger.info(f"Обработка страницы {page_count}: получено {batch_size} транзакций из API")
+            total_processed += batch_size
+
+            if trans_batch:
+                created_ids = []
+                page_stats = _import_transactions_page(
+                    TransModel, trans_batch, acc_map, local_accounts, endpoint.force_full_sync, created_ids
+                )
+                for key, value in page_stats.items():
+                    stats[key] += value
+                # Сопоставление с платежами проектов - только вставленные на этой странице,
+                # в той же транзакции, что и checkpoint страницы
+                if created_ids:
+                    page_matching = PaymentMatch.match_transactions([('id', 'in', created_ids)])
+                    for key, value in page_matching.items():
+                        matching[key] += value
             else:
-                # Новая запись
-                vals_list.append(transaction_vals)
-                batch_created += 1
-
-        if vals_list:
-            TransModel.create(vals_list)
-            total_created += batch_created
-            _logger.info(f"   + Импортировано {batch_created} новых транзакций из пачки")
-        
-        if update_list:
-            for rec, vals in update_list:
-                rec.write(vals)
-            total_updated += batch_updated
-            _logger.info(f"   ↻ Обновлено {batch_updated} транзакций из пачки")
-        
-        if not vals_list and not update_list:
-            _logger.info("   Нет новых транзакций для импорта в этой пачке")
+                _logger.debug("Пустая страница, пропускаем")
 
-        total_skipped += batch_skipped
-        _logger.info(f"   Статистика пачки: создано {batch_created}, обновлено {batch_updated}, дубли {batch_skipped}, неактивные счета {batch_unknown}")
+            if tracker.page_done(next_page_id, stats):
+                break
+        else:
+            tracker.finish(stats)
+    except Exception as e:
+        tracker.fail(e)
+        raise
 
-    _logger.info(f"Итог импорта: обработано страниц {page_count}, транзакций из API {total_processed}, создано {total_created}, обновлено {total_updated}, дубли {total_skipped}, неактивные счета {inactive_acc_count}")
+    _logger.info(f"Итог импорта: обработано страниц {page_count}, транзакций из API {total_processed}, создано {stats['created']}, обновлено {stats['updated']}, дубли {stats['skipped']}, неактивные счета {stats['inactive_accounts']}")
 
-    return {
-        'stats': {'created': total_created, 'updated': total_updated, 'skipped': total_skipped, 'inactive_accounts': inactive_acc_count}
-    }
+    return {'stats': stats, 'matching': matching}
 
 
 def import_privat_rates(bank, overwrite=True):
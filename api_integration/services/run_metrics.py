@@ -0,0 +1,144 @@
+#
+#  -*- File: api_integration/services/run_metrics.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Метрики одного запуска эндпоинта (run_endpoint): wall / HTTP / DB время,
+страницы, строки и число SQL запросов.
+
+Сбор привязан к потоку: run_endpoint активирует RunMetrics, HTTP клиенты
+отмечают запросы через response hook сессии (instrument_session), сервисы
+считают страницы через count(). Фоновые потоки префетча наследуют метрики
+потока-потребителя через bind().
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def current():
+    """Активные метрики текущего потока (или None)."""
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def bind(metrics):
+    """Привязывает метрики к текущему (например, фоновому) потоку."""
+    previous = current()
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+
+
+def count(name, value=1):
+    """Увеличивает счетчик активных метрик; без активного запуска - no-op."""
+    metrics = current()
+    if metrics is not None:
+        metrics.add(name, value)
+
+
+def _response_hook(response, *args, **kwargs):
+    metrics = current()
+    if metrics is not None:
+        metrics.add_http(response.elapsed.total_seconds())
+    return response
+
+
+def instrument_session(session):
+    """Подключает учет HTTP времени к requests.Session (повторный вызов не дублирует hook)."""
+    hooks = session.hooks.setdefault('response', [])
+    if _response_hook not in hooks:
+        hooks.append(_response_hook)
+    return session
+
+
+class RunMetrics:
+    """
+    Контекст замера одного запуска:
+
+        metrics = RunMetrics(env.cr)
+        with metrics:
+            result = handler.execute()
+        metrics.set_rows(result)
+        log_vals = metrics.as_log_vals()
+    """
+
+    def __init__(self, cr=None):
+        self.cr = cr
+        self.wall_time = 0.0
+        self.http_time = 0.0
+        self.http_requests = 0
+        self.db_time = None
+        self.query_count = None
+        self.rows = 0
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._started = None
+        self._binding = None
+
+    # ------------------------------------------------------------------
+    # Замер
+    # ------------------------------------------------------------------
+
+    def __enter__(self):
+        thread = threading.current_thread()
+        # Odoo накапливает query_count/query_time на потоке, если атрибуты заведены
+        # (HTTP воркер заводит их сам, поток крона - нет)
+        if not hasattr(thread, 'query_time'):
+            thread.query_count = 0
+            thread.query_time = 0.0
+        self._db_time_start = thread.query_time
+        self._queries_start = self.cr.sql_log_count if self.cr is not None else None
+        self._started = time.perf_counter()
+        self._binding = bind(self)
+        self._binding.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._binding.__exit__(exc_type, exc, tb)
+        self.wall_time = time.perf_counter() - self._started
+        self.db_time = threading.current_thread().query_time - self._db_time_start
+        if self._queries_start is not None:
+            self.query_count = self.cr.sql_log_count - self._queries_start
+        return False
+
+    def elapsed(self):
+        """Секунд с начала запуска (для отметок шагов)."""
+        return time.perf_counter() - self._started if self._started else 0.0
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_http(self, seconds):
+        with self._lock:
+            self.http_time += seconds
+            self.http_requests += 1
+
+    def set_rows(self, result):
+        """Строки из стандартного результата обработчика: created + updated + skipped."""
+        if isinstance(result, dict):
+            result = result.get('final', result)
+            data = result.get('data') if isinstance(result.get('data'), dict) else {}
+            self.rows = sum(int(data.get(key) or 0) for key in ('created', 'updated', 'skipped'))
+
+    # ------------------------------------------------------------------
+    # Выгрузка в dino.api.log
+    # ------------------------------------------------------------------
+
+    def as_log_vals(self):
+        return {
+            'execution_time': round(self.wall_time, 3),
+            'http_time': round(self.http_time, 3),
+            'http_requests': self.http_requests,
+            'db_time': round(self.db_time or 0.0, 3),
+            'query_count': self.query_count or 0,
+            'pages': self.counters.get('pages', 0),
+            'rows': self.rows,
+            'rows_per_sec': round(self.rows / self.wall_time, 1) if self.wall_time else 0.0,
+        }
+# End of file api_integration/services/run_metrics.py
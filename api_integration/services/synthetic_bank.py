@@ -0,0 +1,265 @@
+#
+#  -*- File: api_integration/services/synthetic_bank.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Синтетические банковые API для нагрузочных прогонов (без Odoo и сети).
+
+SyntheticBank - транспорт requests (см. http_replay.use_transport), который
+отвечает как настоящие API на N счетов x M дней x K операций в день:
+
+  - Приват  /api/statements/transactions и /api/statements/balance
+    (фильтр startDate/endDate/acc, пагинация limit + followId);
+  - НБУ     /NBU_Exchange/exchange_site (start/end/valcode);
+  - Моно    /personal/client-info и /personal/statement/{acc}/{from}/{to}
+    (до 500 операций, от новых к старым).
+
+Данные детерминированы (зависят только от параметров), страницы строятся
+по смещению без хранения всего набора в памяти - 1M операций не требуют
+1M словарей одновременно. Балансы согласованы с операциями:
+balanceOut = balanceIn + приход - расход.
+
+    bank = SyntheticBank(accounts=10, days=365, per_day=50)
+    with http_replay.use_transport(lambda adapter: bank):
+        import_transactions(endpoint, rate_limit=1e6)
+"""
+import json
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+from requests.adapters import BaseAdapter
+
+from .http_replay import build_response
+
+MONO_PAGE_SIZE = 500
+NBU_CURRENCIES = (('USD', 840, 38.0), ('EUR', 978, 41.0), ('PLN', 985, 9.5), ('GBP', 826, 48.0))
+COUNTERPARTIES = 50   # разных контрагентов (ЕДРПОУ) на весь набор
+
+
+def _parse_date(value, fmt):
+    return datetime.strptime(value, fmt).date() if value else None
+
+
+class SyntheticBank(BaseAdapter):
+    """
+    accounts - число счетов (или список номеров), days - дней истории до end,
+    per_day - операций на счет в день, currencies - для НБУ: (код, r030, базовый курс).
+    """
+
+    def __init__(self, accounts=3, days=30, per_day=10, end=None, currencies=NBU_CURRENCIES,
+                 opening_balance=100000.0):
+        super().__init__()
+        if isinstance(accounts, int):
+            accounts = [f"UA{index + 1:027d}" for index in range(accounts)]
+        self.accounts = list(accounts)
+        self.per_day = per_day
+        self.end = end or date.today()
+        self.start = self.end - timedelta(days=days - 1)
+        self.days = days
+        self.currencies = currencies
+        self.requests = 0
+        # Нарастающий итог оборотов по дням: balanceIn дня = opening + сумма net предыдущих дней
+        self._opening = []
+        for acc_index in range(len(self.accounts)):
+            balance = opening_balance
+            openings = []
+            for day_index in range(days):
+                openings.append(balance)
+                debit, credit = self._turnover(acc_index, day_index)
+                balance += credit - debit
+            self._opening.append(openings)
+
+    # ------------------------------------------------------------------
+    # Данные
+    # ------------------------------------------------------------------
+
+    def _amount(self, acc_index, day_index, k):
+        """Сумма операции (со знаком): детерминированно, около четверти - расходы."""
+        cents = (acc_index * 7919 + day_index * 104729 + k * 1299709) % 500000 + 100
+        return -cents / 100.0 if (acc_index + day_index + k) % 4 == 0 else cents / 100.0
+
+    def _turnover(self, acc_index, day_index):
+        debit = credit = 0.0
+        for k in range(self.per_day):
+            amount = self._amount(acc_index, day_index, k)
+            if amount < 0:
+                debit -= amount
+            else:
+                credit += amount
+        return round(debit, 2), round(credit, 2)
+
+    def total_transactions(self):
+        return len(self.accounts) * self.days * self.per_day
+
+    def _day_range(self, start, end):
+        start = max(start or self.start, self.start)
+        end = min(end or self.end, self.end)
+        return (start - self.start).days, (end - self.start).days
+
+    def _privat_transaction(self, acc_index, day_index, k):
+        day = self.start + timedelta(days=day_index)
+        amount = self._amount(acc_index, day_index, k)
+        partner = (acc_index * 31 + day_index + k) % COUNTERPARTIES
+        minutes = (k * 1440) // max(self.per_day, 1)
+        return {
+            'ID': f"S{acc_index}-{day.toordinal()}-{k}",
+            'AUT_MY_ACC': self.accounts[acc_index],
+            'SUM': f"{abs(amount):.2f}",
+            'TRANTYPE': 'D' if amount < 0 else 'C',
+            'DAT_OD': day.strftime('%d.%m.%Y'),
+            'TIM_P': f"{minutes // 60:02d}:{minutes % 60:02d}",
+            'NUM_DOC': str(k + 1),
+            'OSND': f"Synthetic payment {k + 1} for {day.isoformat()}",
+            'AUT_CNTR_NAM': f"Synthetic Partner {partner}",
+            'AUT_CNTR_CRF': f"{40000000 + partner:08d}",
+            'AUT_CNTR_ACC': f"UA{900000000 + partner:027d}",
+            'AUT_CNTR_MFO': '305299',
+            'AUT_CNTR_MFO_NAME': 'АТ КБ "ПРИВАТБАНК"',
+            'AUT_CNTR_MFO_CITY': 'Київ',
+        }
+
+    def _accounts_filter(self, acc):
+        if not acc:
+            return list(range(len(self.accounts)))
+        return [i for i, number in enumerate(self.accounts) if number == acc]
+
+    # ------------------------------------------------------------------
+    # Эндпоинты
+    # ------------------------------------------------------------------
+
+    def _privat_page(self, params, kind):
+        acc_indexes = self._accounts_filter(params.get('acc'))
+        first, last = self._day_range(_parse_date(params.get('startDate'), '%d-%m-%Y'),
+                                      _parse_date(params.get('endDate'), '%d-%m-%Y'))
+        per_day = self.per_day if kind == 'transactions' else 1
+        total = max(last - first + 1, 0) * len(acc_indexes) * per_day
+        limit = int(params.get('limit') or 100)
+        offset = int(params.get('followId') or 0)
+
+        rows = []
+        for position in range(offset, min(offset + limit, total)):
+            day_index = first + position // (len(acc_indexes) * per_day)
+            acc_index = acc_indexes[(position // per_day) % len(acc_indexes)]
+            if kind == 'transactions':
+                rows.append(self._privat_transaction(acc_index, day_index, position % per_day))
+            else:
+                rows.append(self._privat_balance(acc_index, day_index))
+        has_next = offset + limit < total
+        return {
+            'status': 'SUCCESS',
+            'type': kind,
+            'exist_next_page': has_next,
+            'next_page_id': str(offset + limit) if has_next else '',
+            kind: rows,
+        }
+
+    def _privat_balance(self, acc_index, day_index):
+        day = self.start + timedelta(days=day_index)
+        opening = self._opening[acc_index][day_index]
+        debit, credit = self._turnover(acc_index, day_index)
+        return {
+            'acc': self.accounts[acc_index],
+            'currency': 'UAH',
+            'dpd': day.strftime('%d.%m.%Y') + ' 00:00:00',
+            'balanceIn': f"{opening:.2f}",
+            'balanceOut': f"{opening + credit - debit:.2f}",
+            'turnoverDebt': f"{debit:.2f}",
+            'turnoverCred': f"{credit:.2f}",
+            'is_final_bal': day < self.end,
+        }
+
+    def _nbu_exchange(self, params):
+        first, last = self._day_range(_parse_date(params.get('start'), '%Y%m%d'),
+                                      _parse_date(params.get('end'), '%Y%m%d'))
+        valcode = (params.get('valcode') or '').upper()
+        rows = []
+        for day_index in range(first, last + 1):
+            day = self.start + timedelta(days=day_index)
+            for code, r030, base in self.currencies:
+                if valcode and code != valcode:
+                    continue
+                rows.append({
+                    'r030': r030,
+                    'cc': code,
+                    'txt': code,
+                    'rate': round(base + (day.toordinal() % 97) / 100.0, 4),
+                    'exchangedate': day.strftime('%d.%m.%Y'),
+                })
+        return rows
+
+    def _mono_client_info(self):
+        return {
+            'clientId': 'synthetic',
+            'name': 'Synthetic Client',
+            'accounts': [
+                {'id': f"mono{index}", 'iban': number, 'currencyCode': 980, 'type': 'black',
+                 'balance': int(self._opening[index][-1] * 100), 'creditLimit': 0, 'maskedPan': []}
+                for index, number in enumerate(self.accounts)
+            ],
+        }
+
+    def _mono_statement(self, account_id, ts_from, ts_to):
+        acc_indexes = [i for i in range(len(self.accounts)) if f"mono{i}" == account_id]
+        if not acc_indexes:
+            return []
+        acc_index = acc_indexes[0]
+        day_from = datetime.fromtimestamp(ts_from, timezone.utc).date()
+        day_to = datetime.fromtimestamp(ts_to, timezone.utc).date()
+        first, last = self._day_range(day_from, day_to)
+        rows = []
+        # От новых к старым, не больше MONO_PAGE_SIZE
+        for day_index in range(last, first - 1, -1):
+            day = self.start + timedelta(days=day_index)
+            balance = self._opening[acc_index][day_index]
+            day_rows = []
+            for k in range(self.per_day):
+                amount = self._amount(acc_index, day_index, k)
+                balance += amount
+                minutes = (k * 1440) // max(self.per_day, 1)
+                ts = int(datetime.combine(day, dt_time(minutes // 60, minutes % 60), timezone.utc).timestamp())
+                if ts_from <= ts <= ts_to:
+                    day_rows.append({
+                        'id': f"M{acc_index}-{day.toordinal()}-{k}",
+                        'time': ts,
+                        'description': f"Synthetic card payment {k + 1}",
+                        'mcc': 5411,
+                        'amount': int(round(amount * 100)),
+                        'operationAmount': int(round(amount * 100)),
+                        'currencyCode': 980,
+                        'balance': int(round(balance * 100)),
+                        'hold': False,
+                    })
+            rows.extend(reversed(day_rows))
+            if len(rows) >= MONO_PAGE_SIZE:
+                break
+        return rows[:MONO_PAGE_SIZE]
+
+    # ------------------------------------------------------------------
+    # Транспорт requests
+    # ------------------------------------------------------------------
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        parts = urlsplit(request.url)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        path = parts.path.rstrip('/')
+
+        if path.endswith('/statements/transactions'):
+            payload = self._privat_page(params, 'transactions')
+        elif path.endswith('/statements/balance'):
+            payload = self._privat_page(params, 'balances')
+        elif path.endswith('/NBU_Exchange/exchange_site'):
+            payload = self._nbu_exchange(params)
+        elif path.endswith('/personal/client-info'):
+            payload = self._mono_client_info()
+        elif '/personal/statement/' in path:
+            account_id, ts_from, ts_to = path.split('/personal/statement/', 1)[1].split('/')[:3]
+            payload = self._mono_statement(account_id, int(ts_from), int(ts_to))
+        else:
+            return build_response(request, 404, b'{"error": "not found"}', {'Content-Type': 'application/json'}, 'Not Found')
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        return build_response(request, 200, body, {'Content-Type': 'application/json; charset=utf-8'}, 'OK')
+
+    def close(self):
+        pass
+# End of file api_integration/services/synthetic_bank.py
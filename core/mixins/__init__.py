@@ -1,5 +1,6 @@
 from . import find_or_create_mixin
-from . import auto_translate_mixin# End of file core/mixins/__init__.py
+from . import auto_translate_mixin
+from . import related_count_mixin# End of file core/mixins/__init__.py
 
 
 # -*- End of dino_erp/core\mixins\__init__.py -*-
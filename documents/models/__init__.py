@@ -4,6 +4,8 @@ from . import dino_document_specification
 from . import dino_document_type
 from . import dino_operation
 from . import dino_parser_agent
+from . import dino_parser_cache
+from . import dino_parse_job
 # End of file documents/models/__init__.py
 
 
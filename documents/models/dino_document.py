@@ -150,6 +150,15 @@ class DinoOperationDocument(models.Model):
         help='Upload document screenshot or photo for parsing'
     )
     import_image_filename = fields.Char('Image Filename')
+
+    # Фоновый парсинг (dino.parse.job)
+    parse_job_ids = fields.One2many('dino.parse.job', 'document_id', string='Parse Jobs')
+    parse_state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Parsing...'),
+        ('done', 'Parsed'),
+        ('error', 'Parse Error'),
+    ], string='Background Parse', readonly=True, copy=False, index=True)
     
 
     @api.depends('specification_ids.amount_untaxed', 'specification_ids.amount_tax')
@@ -256,7 +265,62 @@ class DinoOperationDocument(models.Model):
     def action_import_text(self):
         """Импорт номенклатуры из текста или изображения"""
         self.ensure_one()
+        text_content, image_data = self._get_parse_input()
+        result = self._parse_and_process(text_content, image_data)
+        
+        # Формирование сообщения результата
+        message = f'Документ: {result["document_number"] or "Н/Д"}\n'
+        message += f'Поставщик: {result["supplier_name"]}\n'
         
+        if result['partner_found']:
+            message += f'Контрагент найден: {self.partner_id.name}\n'
+        else:
+            message += f'⚠️ Контрагент НЕ найден (создайте вручную)\n'
+        
+        message += f'\n📝 Создано позиций: {result["created_lines"]}'
+        if result['updated_lines'] > 0:
+            message += f'\n🔄 Обновлено позиций: {result["updated_lines"]}'
+        
+        if result['errors']:
+            message += f'\n\n❌ Ошибки:\n' + '\n'.join(result['errors'][:5])
+            if len(result['errors']) > 5:
+                message += f'\n... и ещё {len(result["errors"]) - 5} ошибок'
+        
+        # Возврат уведомления
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Импорт завершён',
+                'message': message,
+                'type': 'success' if (result['created_lines'] + result['updated_lines']) > 0 else 'warning',
+                'sticky': True,
+                'next': {
+                    'type': 'ir.actions.act_window_close',
+                },
+            }
+        }
+
+    def action_enqueue_parse(self):
+        """Поставить документы в очередь фонового парсинга (dino.parse.job)"""
+        jobs = self.env['dino.parse.job'].enqueue_documents(self)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Парсинг в очереди',
+                'message': f'Поставлено в очередь документов: {len(jobs)}',
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+
+    def _get_parse_input(self):
+        """
+        Текст и/или изображение для агента парсинга из полей импорта документа.
+        :return: (text_content, image_data)
+        """
+        self.ensure_one()
         if not self.import_text_content and not self.import_image:
             raise UserError('Введите текст документа или загрузите изображение для импорта')
         
@@ -326,6 +390,16 @@ class DinoOperationDocument(models.Model):
         
         if not text_content.strip() and not image_data:
             raise UserError('Не удалось извлечь текст или изображение из документа')
+        return text_content, image_data
+
+    def _parse_and_process(self, text_content, image_data, agent=None):
+        """
+        Парсинг агентом (по умолчанию parser_agent_id документа) и запись
+        результата через DocumentJSONService.
+        :return: результат DocumentJSONService.process_parsed_json
+        """
+        self.ensure_one()
+        agent = agent or self.parser_agent_id
         
         # Логирование что именно будет парситься
         parsing_mode = ""
@@ -352,7 +426,7 @@ class DinoOperationDocument(models.Model):
         self.write({'notes': pre_notes})
         
         # Этап 1: Парсинг через агента (передаём изображение ИЛИ текст)
-        parse_result = self.parser_agent_id.parse_text(
+        parse_result = agent.parse_text(
             text=text_content if text_content else None,
             image_data=image_data,  # Передаём изображение напрямую в AI
             partner_name=partner_name
@@ -382,39 +456,7 @@ class DinoOperationDocument(models.Model):
         if not result['success']:
             error_msg = '\n'.join(result.get('errors', ['Ошибка обработки']))
             raise UserError(f'Ошибка обработки данных:\n{error_msg}')
-        
-        # Формирование сообщения результата
-        message = f'Документ: {result["document_number"] or "Н/Д"}\n'
-        message += f'Поставщик: {result["supplier_name"]}\n'
-        
-        if result['partner_found']:
-            message += f'Контрагент найден: {self.partner_id.name}\n'
-        else:
-            message += f'⚠️ Контрагент НЕ найден (создайте вручную)\n'
-        
-        message += f'\n📝 Создано позиций: {result["created_lines"]}'
-        if result['updated_lines'] > 0:
-            message += f'\n🔄 Обновлено позиций: {result["updated_lines"]}'
-        
-        if result['errors']:
-            message += f'\n\n❌ Ошибки:\n' + '\n'.join(result['errors'][:5])
-            if len(result['errors']) > 5:
-                message += f'\n... и ещё {len(result["errors"]) - 5} ошибок'
-        
-        # Возврат уведомления
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': 'Импорт завершён',
-                'message': message,
-                'type': 'success' if (result['created_lines'] + result['updated_lines']) > 0 else 'warning',
-                'sticky': True,
-                'next': {
-                    'type': 'ir.actions.act_window_close',
-                },
-            }
-        }
+        return result
     
     
 # End of file documents/models/dino_document.py
@@ -23,6 +23,9 @@ class DinoDocumentAttachment(models.Model):
     _rec_name = 'filename'
     _inherit = ['mail.thread', 'mail.activity.mixin']
 
+    # Табличные форматы импортируются без AI агента (action_import)
+    _TABLE_FILE_TYPES = ('excel', 'csv', 'xml', 'json')
+
     # === ОСНОВНЫЕ ПОЛЯ ===
     document_id = fields.Many2one(
         'dino.operation.document',
@@ -243,6 +246,46 @@ class DinoDocumentAttachment(models.Model):
             'error_log': False
         })
 
+    def action_enqueue_parse(self):
+        """Поставить файлы в очередь фонового импорта/парсинга (dino.parse.job)"""
+        jobs = self.env['dino.parse.job'].enqueue_attachments(self)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Queued'),
+                'message': _('%s files queued for background import') % len(jobs),
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+
+    def _run_parse(self, agent):
+        """
+        Импорт файла из фоновой очереди. Табличные форматы идут через
+        action_import, PDF и изображения - через AI агента документа.
+        :return: результат DocumentJSONService (dict) или None
+        """
+        self.ensure_one()
+        if self.file_type in self._TABLE_FILE_TYPES:
+            self.action_import()
+            return None
+        if not agent:
+            raise UserError(_('Select a parser agent for: %s') % self.document_id.display_name)
+
+        from ..services.image_utils import prepare_inline_data
+        inline = prepare_inline_data(self.file_data)
+        if not inline or not inline.get('data'):
+            raise UserError(_('Cannot read file %s as an image or PDF') % self.filename)
+        self.write({'import_status': 'importing', 'error_log': False})
+        result = self.document_id._parse_and_process(None, inline['data'], agent=agent)
+        self.write({
+            'import_status': 'imported',
+            'imported_lines_count': result['created_lines'] + result['updated_lines'],
+            'import_date': fields.Datetime.now(),
+        })
+        return result
+
     def action_view_document(self):
         """Открыть связанный документ"""
         self.ensure_one()
@@ -217,26 +217,39 @@ class DinoOperationDocumentSpecification(models.Model):
 
     def _update_nomenclature_cost(self):
         """Обновляет стоимость в связанной номенклатуре самой свежей ценой"""
-        for rec in self:
-            if rec.nomenclature_id:
-                # Ищем самую свежую цену для этой номенклатуры из всех документов
-                latest_spec = self.search([
-                    ('nomenclature_id', '=', rec.nomenclature_id.id),
-                    ('price_tax', '>', 0)
-                ], limit=1, order='document_date desc, id desc')
-                
-                if latest_spec and latest_spec.price_tax:
-                    # Обновляем cost номенклатуры самой свежей ценой с НДС
-                    # ВАЖНО: Этот write запустит _trigger_parents_recalc в Номенклатуре
-                    rec.nomenclature_id.sudo().write({
-                        'cost': latest_spec.price_tax
-                    })
+        nomenclatures = self.mapped('nomenclature_id')
+        if not nomenclatures:
+            return
+        
+        # Самая свежая цена каждой номенклатуры из всех документов - одним запросом
+        self.flush_model(['nomenclature_id', 'price_tax', 'document_date'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (nomenclature_id) nomenclature_id, price_tax
+              FROM dino_operation_document_specification
+             WHERE nomenclature_id = ANY(%s) AND price_tax > 0
+             ORDER BY nomenclature_id, document_date DESC, id DESC
+        """, (nomenclatures.ids,))
+        latest_prices = {nomenclature_id: float(price) for nomenclature_id, price in self.env.cr.fetchall()}
+        
+        # Обновляем cost номенклатуры самой свежей ценой с НДС, одинаковые цены - одним write
+        # ВАЖНО: Этот write ставит номенклатуры в очередь пересчета BOM (_trigger_parents_recalc),
+        # сам пересчет - один раз при коммите
+        by_cost = {}
+        for nomenclature in nomenclatures:
+            cost = latest_prices.get(nomenclature.id)
+            if cost and nomenclature.cost != cost:
+                by_cost.setdefault(cost, []).append(nomenclature.id)
+        for cost, nomenclature_ids in by_cost.items():
+            self.env['dino.nomenclature'].sudo().browse(nomenclature_ids).write({'cost': cost})
 
     def write(self, vals):
         """При изменении nomenclature_id или любой цены - обновляем стоимость в номенклатуре"""
         result = super().write(vals)
         
         # Если изменились nomenclature_id, price_tax или price_untaxed
+        # skip_nomenclature_cost: пакетный импорт вызывает _update_nomenclature_cost сам, один раз в конце
+        if self.env.context.get('skip_nomenclature_cost'):
+            return result
         if 'nomenclature_id' in vals or 'price_tax' in vals or 'price_untaxed' in vals:
             self._update_nomenclature_cost()
         
@@ -265,7 +278,8 @@ class DinoOperationDocumentSpecification(models.Model):
         records = super().create(vals_list)
         
         # После создания обновляем стоимость в номенклатуре
-        records._update_nomenclature_cost()
+        if not self.env.context.get('skip_nomenclature_cost'):
+            records._update_nomenclature_cost()
         
         # Обновляем связь в справочнике контрагента если она была создана
         for record in records:
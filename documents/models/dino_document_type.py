@@ -3,6 +3,7 @@
 #
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+from odoo.addons.dino_erp.core.mixins.related_count_mixin import related_count
 
 
 class DinoDocumentType(models.Model):
@@ -10,9 +11,12 @@ class DinoDocumentType(models.Model):
     Справочник типов документов
     """
     _name = 'dino.document.type'
-    _inherit = ['mixin.find.or.create']
+    _inherit = ['mixin.find.or.create', 'mixin.related.count']
     _description = 'Document Type'
     _order = 'sequence, name'
+    _related_counts = {
+        'document_count': ('dino.operation.document', 'document_type_id'),
+    }
 
     name = fields.Char('Document Type', required=True, translate=True)
     code = fields.Char('Type ID', required=True, help='Unique identifier for document type')
@@ -21,19 +25,12 @@ class DinoDocumentType(models.Model):
     active = fields.Boolean('Active', default=True)
     
     # Статистика
-    document_count = fields.Integer('Documents', compute='_compute_document_count')
+    document_count = fields.Integer('Documents', compute=related_count('document_count'))
     
     _sql_constraints = [
         ('code_unique', 'unique(code)', 'Type ID must be unique!'),
     ]
-    
-    def _compute_document_count(self):
-        """Подсчет количества документов этого типа"""
-        for record in self:
-            record.document_count = self.env['dino.operation.document'].search_count([
-                ('document_type_id', '=', record.id)
-            ])
-    
+
     def action_view_documents(self):
         """Открыть документы этого типа"""
         self.ensure_one()
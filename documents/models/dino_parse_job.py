@@ -0,0 +1,260 @@
+#
+#  -*- File: documents/models/dino_parse_job.py -*-
+#
+# -*- coding: utf-8 -*-
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Задание в running дольше этого - воркер умер, возвращаем в очередь
+_STALE_AFTER = timedelta(minutes=15)
+
+
+def _run_job_isolated(registry, uid, context, job_id):
+    """
+    Выполняет одно задание в собственном курсоре/транзакции.
+
+    Захват: SELECT ... FOR UPDATE SKIP LOCKED по строке в состоянии queued,
+    затем state=running фиксируется коммитом - прогресс виден в интерфейсе
+    сразу, а другой воркер крона задание уже не возьмет. Ошибка откатывает
+    только изменения этого задания.
+    """
+    with registry.cursor() as cr:
+        cr.execute(
+            "SELECT id FROM dino_parse_job WHERE id = %s AND state = 'queued' FOR UPDATE SKIP LOCKED",
+            (job_id,)
+        )
+        if not cr.fetchone():
+            _logger.info(f'Parse job {job_id} is claimed by another cron worker, skipping')
+            return False
+
+        env = api.Environment(cr, uid, context)
+        job = env['dino.parse.job'].browse(job_id)
+        job._mark_running()
+        cr.commit()
+
+        try:
+            job._execute()
+            cr.commit()
+            return True
+        except Exception as e:
+            _logger.exception(f'Parse job {job_id} failed')
+            cr.rollback()
+            # Изменения задания откатились вместе с транзакцией - пишем ошибку заново
+            env['dino.parse.job'].browse(job_id)._mark_failed(e)
+            cr.commit()
+            return False
+
+
+class DinoParseJob(models.Model):
+    """
+    Очередь фонового парсинга документов и файлов импорта.
+
+    Задания ставятся из списков документов/вложений (action_enqueue_parse) и
+    выполняются кроном cron_process_queue в пуле потоков: одновременно по
+    каждому агенту выполняется не больше parse_concurrency заданий, общий
+    размер пула - системный параметр dino_documents.parse_workers.
+    Результат пишется через DocumentJSONService.process_parsed_json
+    (dino.operation.document._parse_and_process).
+    """
+    _name = 'dino.parse.job'
+    _description = 'Background Parse Job'
+    _order = 'priority desc, id'
+
+    document_id = fields.Many2one('dino.operation.document', string='Document', required=True,
+                                  ondelete='cascade', index=True)
+    attachment_id = fields.Many2one('dino.document.attachment', string='File', ondelete='cascade', index=True)
+    agent_id = fields.Many2one('dino.parser.agent', string='Parser Agent', ondelete='set null', index=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('error', 'Error'),
+        ('cancelled', 'Cancelled'),
+    ], string='Status', default='queued', required=True, index=True)
+    priority = fields.Integer('Priority', default=0, help='Higher priority jobs are processed first')
+    attempts = fields.Integer('Attempts', default=0, readonly=True)
+    max_attempts = fields.Integer('Max Attempts', default=3)
+    date_started = fields.Datetime('Started', readonly=True)
+    date_done = fields.Datetime('Finished', readonly=True)
+    duration = fields.Float('Duration (s)', readonly=True, digits=(16, 1))
+    created_lines = fields.Integer('Created Lines', readonly=True)
+    updated_lines = fields.Integer('Updated Lines', readonly=True)
+    error_log = fields.Text('Error', readonly=True)
+
+    # ------------------------------------------------------------------
+    # Постановка в очередь
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _enqueue(self, vals_list):
+        """Пропускает документы/файлы, для которых задание уже ждет или выполняется."""
+        active = self.search([('state', 'in', ('queued', 'running')),
+                              ('document_id', 'in', [v['document_id'] for v in vals_list])])
+        busy = {(job.document_id.id, job.attachment_id.id or False) for job in active}
+        vals_list = [v for v in vals_list if (v['document_id'], v.get('attachment_id') or False) not in busy]
+        jobs = self.create(vals_list)
+        jobs._sync_record_state()
+        if jobs:
+            cron = self.env.ref('dino_erp.ir_cron_dino_parse_queue', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        return jobs
+
+    @api.model
+    def enqueue_documents(self, documents, agent=None):
+        documents = documents.filtered(lambda d: d.import_text_content or d.import_image)
+        missing_agent = documents.filtered(lambda d: not (agent or d.parser_agent_id))
+        if missing_agent:
+            raise UserError(_('Select a parser agent for: %s') % ', '.join(missing_agent.mapped('display_name')))
+        return self._enqueue([{
+            'document_id': doc.id,
+            'agent_id': (agent or doc.parser_agent_id).id,
+        } for doc in documents])
+
+    @api.model
+    def enqueue_attachments(self, attachments, agent=None):
+        attachments = attachments.filtered(lambda a: a.file_data and a.import_status != 'imported')
+        # PDF и изображения разбирает AI агент документа - без агента задание упадет
+        missing_agent = attachments.filtered(
+            lambda a: a.file_type not in a._TABLE_FILE_TYPES and not (agent or a.document_id.parser_agent_id))
+        if missing_agent:
+            raise UserError(_('Select a parser agent for: %s') % ', '.join(
+                missing_agent.mapped('document_id.display_name')))
+        return self._enqueue([{
+            'document_id': att.document_id.id,
+            'attachment_id': att.id,
+            'agent_id': (agent or att.document_id.parser_agent_id).id or False,
+        } for att in attachments])
+
+    def action_cancel(self):
+        self.filtered(lambda j: j.state == 'queued').write({'state': 'cancelled'})
+        self._sync_record_state()
+
+    def action_retry(self):
+        self.filtered(lambda j: j.state in ('error', 'cancelled')).write({
+            'state': 'queued', 'attempts': 0, 'error_log': False,
+        })
+        self._sync_record_state()
+
+    # ------------------------------------------------------------------
+    # Выполнение
+    # ------------------------------------------------------------------
+
+    def _sync_record_state(self):
+        """Статус последнего задания - в parse_state документа / import_status файла."""
+        state_map = {'queued': 'queued', 'running': 'running', 'done': 'done', 'error': 'error', 'cancelled': False}
+        for job in self:
+            if job.attachment_id:
+                if job.state in ('queued', 'running'):
+                    job.attachment_id.import_status = 'importing'
+                elif job.state == 'error':
+                    job.attachment_id.write({'import_status': 'error', 'error_log': job.error_log})
+                elif job.state == 'cancelled':
+                    job.attachment_id.import_status = 'draft'
+            else:
+                job.document_id.parse_state = state_map[job.state]
+
+    def _mark_running(self):
+        self.write({
+            'state': 'running',
+            'attempts': self.attempts + 1,
+            'date_started': fields.Datetime.now(),
+            'error_log': False,
+        })
+        self._sync_record_state()
+
+    def _mark_failed(self, error):
+        self.ensure_one()
+        # UserError - проблема данных (нет текста, неверный файл), повтор не поможет
+        retry = self.attempts < self.max_attempts and not isinstance(error, UserError)
+        self.write({
+            'state': 'queued' if retry else 'error',
+            'error_log': str(error),
+            'date_done': False if retry else fields.Datetime.now(),
+        })
+        self._sync_record_state()
+
+    def _execute(self):
+        self.ensure_one()
+        agent = self.agent_id or self.document_id.parser_agent_id
+        if self.attachment_id:
+            result = self.attachment_id._run_parse(agent)
+        else:
+            text_content, image_data = self.document_id._get_parse_input()
+            result = self.document_id._parse_and_process(text_content, image_data, agent=agent)
+
+        now = fields.Datetime.now()
+        self.write({
+            'state': 'done',
+            'date_done': now,
+            'duration': (now - self.date_started).total_seconds() if self.date_started else 0.0,
+            'created_lines': result['created_lines'] if result else self.attachment_id.imported_lines_count,
+            'updated_lines': result['updated_lines'] if result else 0,
+        })
+        self._sync_record_state()
+
+    @api.model
+    def _requeue_stale(self):
+        stale = self.search([('state', '=', 'running'), ('date_started', '<', fields.Datetime.now() - _STALE_AFTER)])
+        for job in stale:
+            _logger.warning(f'Parse job {job.id} was running since {job.date_started}, returning to queue')
+            job._mark_failed(_('Worker stopped while the job was running'))
+
+    @api.model
+    def _pick_job_ids(self, limit):
+        """Задания из очереди с учетом лимита параллельности каждого агента."""
+        running = {agent.id: count for agent, count in self._read_group(
+            [('state', '=', 'running')], ['agent_id'], ['__count'])}
+        taken = {}
+        picked = []
+        for job in self.search([('state', '=', 'queued')], limit=limit * 10):
+            agent = job.agent_id
+            capacity = max(agent.parse_concurrency, 1) if agent else 1
+            in_use = running.get(agent.id, 0) + taken.get(agent.id, 0)
+            if in_use >= capacity:
+                continue
+            taken[agent.id] = taken.get(agent.id, 0) + 1
+            picked.append(job.id)
+            if len(picked) >= limit:
+                break
+        return picked
+
+    @api.model
+    def cron_process_queue(self):
+        """
+        Cron entrypoint: выполнить пачку заданий очереди, каждое в своем
+        курсоре/транзакции. Несколько воркеров крона могут работать
+        одновременно - захват строки не дает выполнить задание дважды.
+        """
+        self._requeue_stale()
+        self.env.cr.commit()
+
+        workers = int(self.env['ir.config_parameter'].sudo().get_param('dino_documents.parse_workers', 4) or 1)
+        job_ids = self._pick_job_ids(max(workers, 1))
+        if not job_ids:
+            return
+        registry, uid, context = self.env.registry, self.env.uid, dict(self.env.context)
+        _logger.info(f'Dispatching {len(job_ids)} parse jobs with {workers} worker(s)')
+
+        if workers <= 1 or len(job_ids) == 1:
+            for job_id in job_ids:
+                try:
+                    _run_job_isolated(registry, uid, context, job_id)
+                except Exception:
+                    _logger.exception(f'Unexpected error in cron_process_queue for job ID {job_id}')
+            return
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dino-parse') as pool:
+            futures = [pool.submit(_run_job_isolated, registry, uid, context, job_id) for job_id in job_ids]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    _logger.exception('Unexpected error in cron_process_queue worker')
+# End of file documents/models/dino_parse_job.py
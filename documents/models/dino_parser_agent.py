@@ -3,7 +3,9 @@
 #
 # -*- coding: utf-8 -*-
 import logging
+import time
 from odoo import models, fields, api
+from odoo.addons.dino_erp.core.mixins.related_count_mixin import related_count
 
 _logger = logging.getLogger(__name__)
 
@@ -18,6 +20,10 @@ class DinoParserAgent(models.Model):
     _name = 'dino.parser.agent'
     _description = 'Parser Agent'
     _order = 'sequence, name'
+    _inherit = ['mixin.related.count']
+    _related_counts = {
+        'cache_entry_count': ('dino.parser.cache', 'agent_id'),
+    }
 
     name = fields.Char('Agent Name', required=True, translate=True)
     sequence = fields.Integer('Sequence', default=10)
@@ -56,6 +62,29 @@ class DinoParserAgent(models.Model):
     last_used_date = fields.Datetime('Last Used', readonly=True)
     total_tokens_used = fields.Integer('Total Tokens Used', readonly=True, default=0)
     total_cost = fields.Float('Total Cost ($)', readonly=True, default=0.0)
+
+    # Кэш результатов (dino.parser.cache)
+    cache_enabled = fields.Boolean('Cache Results', default=True,
+                                   help='Return the stored result for an identical request instead of calling the API')
+    cache_ttl_days = fields.Integer('Cache TTL (days)', default=30, help='Entries unused for this long are dropped (0 - keep)')
+    cache_max_entries = fields.Integer('Cache Size', default=500, help='Least recently used entries above this are dropped (0 - no limit)')
+    cache_hits = fields.Integer('Cache Hits', readonly=True, default=0)
+    cache_misses = fields.Integer('Cache Misses', readonly=True, default=0)
+    cache_entry_count = fields.Integer('Cached Results', compute=related_count('cache_entry_count'))
+
+    # Хеджирование: резервный агент параллельно, если основной не ответил за бюджет
+    hedge_enabled = fields.Boolean('Hedged Requests', default=False,
+                                   help='Start the fallback agent in parallel when this agent is slower than its latency budget')
+    hedge_delay = fields.Float('Hedge After (s)', default=0.0,
+                               help='Latency budget in seconds; 0 - p90 of this agent\'s latency history')
+    latency_histogram = fields.Text('Latency Histogram', readonly=True, copy=False)
+    latency_p50 = fields.Float('Latency p50 (s)', compute='_compute_latency_stats')
+    latency_p90 = fields.Float('Latency p90 (s)', compute='_compute_latency_stats')
+    latency_samples = fields.Integer('Latency Samples', compute='_compute_latency_stats')
+
+    # Фоновая очередь (dino.parse.job)
+    parse_concurrency = fields.Integer('Parallel Jobs', default=2,
+                                       help='How many background parse jobs of this agent may run at the same time')
     
     _sql_constraints = [
         ('name_unique', 'unique(name)', 'Agent name must be unique!'),
@@ -123,11 +152,132 @@ class DinoParserAgent(models.Model):
     def increment_usage(self):
         """Увеличить счетчик использования"""
         self.ensure_one()
-        self.write({
-            'usage_count': self.usage_count + 1,
-            'last_used_date': fields.Datetime.now(),
-        })
+        self._add_stats({'usage_count': 1}, last_used_date=fields.Datetime.now())
+
+    def _add_stats(self, increments=None, latencies=(), **values):
+        """
+        Обновить статистику агента в отдельной короткой транзакции.
+
+        Задания очереди (dino.parse.job) держат свою транзакцию на время
+        вызова API; запись строки агента в ней блокировала бы параллельные
+        задания того же агента до ошибки сериализации. Счетчики - через
+        UPDATE x = x + n, поэтому параллельные приращения не теряются.
+
+        :param increments: {поле: приращение} (usage_count, cache_hits, ...)
+        :param latencies: секунды ответов для гистограммы задержек
+        :param values: поля, записываемые как есть (last_used_date)
+        """
+        from ..services.parser_hedging import LatencyHistogram
+        self.ensure_one()
+        increments = {name: value for name, value in (increments or {}).items() if value}
+        if not (increments or latencies or values):
+            return
+
+        assignments, params = [], []
+        for name, value in increments.items():
+            assignments.append(f'{name} = COALESCE({name}, 0) + %s')
+            params.append(value)
+        for name, value in values.items():
+            assignments.append(f'{name} = %s')
+            params.append(value)
+        try:
+            with self.env.registry.cursor() as cr:
+                if latencies:
+                    cr.execute("SELECT latency_histogram FROM dino_parser_agent WHERE id = %s FOR UPDATE", (self.id,))
+                    row = cr.fetchone()
+                    histogram = LatencyHistogram.loads(row[0] if row else None)
+                    for seconds in latencies:
+                        histogram.record(seconds)
+                    assignments.append('latency_histogram = %s')
+                    params.append(histogram.dumps())
+                cr.execute(f"UPDATE dino_parser_agent SET {', '.join(assignments)} WHERE id = %s",
+                           params + [self.id])
+        except Exception as e:
+            _logger.warning(f"Failed to update stats of parser agent {self.name}: {e}")
+        # Значения изменены мимо ORM - сбросить кэш этих полей
+        self.invalidate_recordset(list(increments) + list(values) + (['latency_histogram'] if latencies else []))
     
+    @api.depends('latency_histogram')
+    def _compute_latency_stats(self):
+        from ..services.parser_hedging import LatencyHistogram
+        for agent in self:
+            histogram = LatencyHistogram.loads(agent.latency_histogram)
+            agent.latency_p50 = histogram.quantile(0.5) or 0.0
+            agent.latency_p90 = histogram.quantile(0.9) or 0.0
+            agent.latency_samples = histogram.total
+
+    def _record_latency(self, seconds):
+        """Добавить время ответа API в гистограмму агента"""
+        self._add_stats(latencies=[seconds])
+
+    def _hedge_budget(self):
+        """Секунд ждать основной ответ до запуска резервного агента"""
+        from ..services.parser_hedging import LatencyHistogram
+        self.ensure_one()
+        if self.hedge_delay > 0:
+            return self.hedge_delay
+        return LatencyHistogram.loads(self.latency_histogram).budget(q=0.9)
+
+    def _ai_parse_kwargs(self, units_list):
+        """Параметры AIParserService.parse - обычный dict, его можно отдать в поток"""
+        self.ensure_one()
+        return {
+            'agent_type': self.agent_type,
+            'api_key': self.api_key,
+            'api_base_url': self.api_endpoint,  # Передаємо як api_base_url
+            'model_name': self.model_name,
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+            'units_list': units_list,  # ← Передаємо список одиниць
+        }
+
+    def _parse_hedged(self, text, image_data, partner_name, units_list, _tried_agents):
+        """
+        Основной и резервный агенты с хеджированием (см. services/parser_hedging.py).
+        :return: (result, агент-победитель)
+        """
+        from ..services.ai_parser_service import AIParserService
+        from ..services.parser_hedging import hedged_call, is_valid_result
+
+        fallback = self.fallback_agent_id
+        # Резервный уже задействован - последовательный fallback его не повторяет
+        _tried_agents.append(fallback.id)
+        request = {'text': text, 'image_data': image_data, 'partner_name': partner_name}
+        primary_kwargs = dict(request, **self._ai_parse_kwargs(units_list))
+        fallback_kwargs = dict(request, **fallback._ai_parse_kwargs(units_list))
+        budget = self._hedge_budget()
+
+        result, winner, latencies = hedged_call(
+            lambda: AIParserService.parse(**primary_kwargs),
+            lambda: AIParserService.parse(**fallback_kwargs),
+            budget, is_valid_result,
+        )
+        agents = (self, fallback)
+        # Успешные ответы и брошенный незавершенным вызов (его время - нижняя граница)
+        for index, seconds in latencies.items():
+            agents[index]._record_latency(seconds)
+
+        if result is None:
+            return {
+                'success': False,
+                'document': {},
+                'supplier': {},
+                'lines': [],
+                'errors': [f'Агенты {self.name} и {fallback.name} не вернули результат'],
+            }, self
+        if winner == 1:
+            _logger.info(f"Hedging: fallback {fallback.name} won over {self.name} (budget {budget:.1f}s)")
+            result['fallback_used'] = True
+            result['hedged'] = True
+            result['original_agent'] = self.name
+            result['fallback_agent'] = fallback.name
+        return result, agents[winner]
+
+    def action_clear_cache(self):
+        """Удалить кэш результатов и сбросить счетчики"""
+        self.env['dino.parser.cache'].search([('agent_id', 'in', self.ids)]).unlink()
+        self.write({'cache_hits': 0, 'cache_misses': 0})
+
     def parse_text(self, text, partner_name=None, _tried_agents=None, image_data=None):
         """
         Парсинг текста документа с использованием этого агента.
@@ -159,6 +309,7 @@ class DinoParserAgent(models.Model):
         # Импортируем сервисы парсинга
         from ..services.ai_parser_service import AIParserService
         from ..services.regex_parser_service import RegexParserService
+        from ..services import parser_cache
         
         # Получить список единиц измерения из БД
         units_list = []
@@ -167,21 +318,45 @@ class DinoParserAgent(models.Model):
         except Exception as e:
             _logger.warning(f"Failed to load units: {e}")
         
+        # Агент, которому засчитывается результат (при хеджировании может победить резервный)
+        stats_agent = self
+
         # Вызываем парсер в зависимости от типа агента
         if self.agent_type in ['ai_openai_compatible', 'ai_google', 'ai_groq']:
+            # Тот же запрос уже разбирался - ответ из кэша без вызова API
+            cache_key = None
+            if self.cache_enabled:
+                cache_key = parser_cache.cache_key(
+                    text=text, image_data=image_data, agent_type=self.agent_type,
+                    model_name=self.model_name, temperature=self.temperature,
+                    units_list=units_list, partner_name=partner_name,
+                )
+                cached = self.env['dino.parser.cache'].lookup(self, cache_key)
+                if cached is not None:
+                    _logger.info(f"Parser cache hit: agent {self.name}, key {cache_key[:12]}")
+                    self._add_stats({'cache_hits': 1})
+                    cached['cached'] = True
+                    return cached
+                self._add_stats({'cache_misses': 1})
+
             # AI парсеры (OpenRouter, Gemini, Groq)
-            result = AIParserService.parse(
-                text=text,
-                image_data=image_data,
-                agent_type=self.agent_type,
-                partner_name=partner_name,
-                api_key=self.api_key,
-                api_base_url=self.api_endpoint,  # Передаємо як api_base_url
-                model_name=self.model_name,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                units_list=units_list,  # ← Передаємо список одиниць
-            )
+            fallback = self.fallback_agent_id
+            if (self.hedge_enabled and fallback.active and fallback.id not in _tried_agents
+                    and fallback.agent_type in ['ai_openai_compatible', 'ai_google', 'ai_groq']):
+                result, stats_agent = self._parse_hedged(text, image_data, partner_name, units_list, _tried_agents)
+            else:
+                started = time.monotonic()
+                result = AIParserService.parse(
+                    text=text,
+                    image_data=image_data,
+                    partner_name=partner_name,
+                    **self._ai_parse_kwargs(units_list)
+                )
+                # Как и при хеджировании: в гистограмму только успешные ответы
+                if result.get('success'):
+                    self._record_latency(time.monotonic() - started)
+            if cache_key and stats_agent == self and parser_cache.is_cacheable(result):
+                self.env['dino.parser.cache'].store(self, cache_key, result)
         elif self.agent_type == 'regex_universal':
             # Regex парсер (тільки текст)
             result = RegexParserService.parse(
@@ -199,23 +374,15 @@ class DinoParserAgent(models.Model):
         
         # Обновить статистику использования
         if result.get('success'):
-            update_vals = {
-                'usage_count': self.usage_count + 1,
-                'last_used_date': fields.Datetime.now(),
-            }
-            
-            # Обновить счетчик токенов если есть
-            if result.get('tokens_used'):
-                update_vals['total_tokens_used'] = self.total_tokens_used + result['tokens_used']
-            
-            # Обновить стоимость если есть
-            if result.get('cost'):
-                update_vals['total_cost'] = self.total_cost + result['cost']
-            
-            self.write(update_vals)
+            # Счетчик токенов и стоимость - если есть
+            stats_agent._add_stats({
+                'usage_count': 1,
+                'total_tokens_used': result.get('tokens_used') or 0,
+                'total_cost': result.get('cost') or 0.0,
+            }, last_used_date=fields.Datetime.now())
         else:
             # Если ошибка и есть fallback агент - попробовать его
-            if self.fallback_agent_id:
+            if self.fallback_agent_id and self.fallback_agent_id.id not in _tried_agents:
                 _logger.warning(f"Agent {self.name} failed. Trying fallback: {self.fallback_agent_id.name}")
                 
                 # Добавить информацию о fallback в результат
@@ -0,0 +1,87 @@
+#
+#  -*- File: documents/models/dino_parser_cache.py -*-
+#
+# -*- coding: utf-8 -*-
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2 import errors
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class DinoParserCache(models.Model):
+    """
+    Кэш результатов AI парсинга по ключу содержимого запроса
+    (см. documents/services/parser_cache.py).
+
+    Запись живет cache_ttl_days агента с последнего попадания; при
+    превышении cache_max_entries удаляются давно не использованные (LRU).
+    """
+    _name = 'dino.parser.cache'
+    _description = 'Parser Result Cache'
+    _order = 'last_hit_date desc, id desc'
+
+    key = fields.Char('Key', required=True, index=True, readonly=True)
+    agent_id = fields.Many2one('dino.parser.agent', string='Agent', required=True, ondelete='cascade',
+                               index=True, readonly=True)
+    result_json = fields.Text('Result', readonly=True)
+    hit_count = fields.Integer('Hits', default=0, readonly=True)
+    last_hit_date = fields.Datetime('Last Used', default=fields.Datetime.now, index=True, readonly=True)
+
+    _sql_constraints = [
+        ('agent_key_unique', 'unique(agent_id, key)', 'Parser cache key must be unique per agent!'),
+    ]
+
+    def _expiry_date(self, agent):
+        return fields.Datetime.now() - timedelta(days=agent.cache_ttl_days or 0)
+
+    @api.model
+    def lookup(self, agent, key):
+        """Результат из кэша (dict) или None; попадание продлевает жизнь записи."""
+        entry = self.search([('agent_id', '=', agent.id), ('key', '=', key)], limit=1)
+        if not entry:
+            return None
+        if agent.cache_ttl_days and entry.last_hit_date < self._expiry_date(agent):
+            entry.unlink()
+            return None
+        entry.write({'hit_count': entry.hit_count + 1, 'last_hit_date': fields.Datetime.now()})
+        return json.loads(entry.result_json)
+
+    @api.model
+    def store(self, agent, key, result):
+        """Сохранить результат и вытеснить лишние записи агента."""
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        entry = self.search([('agent_id', '=', agent.id), ('key', '=', key)], limit=1)
+        if entry:
+            entry.write({'result_json': payload, 'last_hit_date': fields.Datetime.now()})
+        else:
+            # Тот же файл могли разобрать параллельно (фоновая задача, второй пользователь):
+            # их запись уже в кэше - считаем попаданием, не роняя задачу на unique(agent_id, key)
+            try:
+                with self.env.cr.savepoint():
+                    self.create({'agent_id': agent.id, 'key': key, 'result_json': payload})
+            except errors.UniqueViolation:
+                _logger.info(f"Parser cache {agent.name}: ключ уже сохранен параллельным разбором")
+        self._evict(agent)
+
+    @api.model
+    def _evict(self, agent):
+        domain = [('agent_id', '=', agent.id)]
+        if agent.cache_ttl_days:
+            self.search(domain + [('last_hit_date', '<', self._expiry_date(agent))]).unlink()
+        if agent.cache_max_entries:
+            stale = self.search(domain, order='last_hit_date desc, id desc', offset=agent.cache_max_entries)
+            if stale:
+                _logger.info(f"Parser cache {agent.name}: вытеснено {len(stale)} записей (LRU)")
+                stale.unlink()
+
+    @api.model
+    def cron_evict(self):
+        """Ежедневная очистка просроченных записей всех агентов."""
+        for agent in self.env['dino.parser.agent'].with_context(active_test=False).search([]):
+            self._evict(agent)
+# End of file documents/models/dino_parser_cache.py
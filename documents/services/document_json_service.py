@@ -8,6 +8,7 @@ Document JSON Service - Обробка JSON даних від парсерів 
 Приймає стандартизований JSON від AI/Regex парсерів та розносить дані по моделям Odoo.
 """
 import logging
+from collections import defaultdict
 
 _logger = logging.getLogger(__name__)
 
@@ -300,10 +301,78 @@ class DocumentJSONService:
         
         return doc_type
     
+    @staticmethod
+    def _line_vals(line_data):
+        """
+        Значення рядка специфікації з даних парсера (без документа, одиниці та номенклатури).
+        
+        :param line_data: dict з даними про позицію
+        :return: dict для create/write dino.operation.document.specification
+        """
+        spec_vals = {
+            'name': line_data['name'],
+            'quantity': line_data.get('quantity', 1.0),
+            'price_untaxed': line_data.get('price_unit', 0.0),
+            'sequence': line_data.get('line_number', 0),
+        }
+        
+        # Додати description якщо є
+        if line_data.get('description'):
+            spec_vals['description'] = line_data['description']
+        
+        # Розрахунок price_tax (ціна за одиницю З ПДВ)
+        # Пріоритет: price_unit_with_tax з AI, потім розрахунок
+        if line_data.get('price_unit_with_tax'):
+            spec_vals['price_tax'] = line_data['price_unit_with_tax']
+        else:
+            # Розрахувати з price_unit та tax_percent
+            price_unit = line_data.get('price_unit', 0.0)
+            tax_percent = line_data.get('tax_percent', 0)
+            if tax_percent > 0:
+                spec_vals['price_tax'] = price_unit * (1 + tax_percent / 100)
+            else:
+                spec_vals['price_tax'] = price_unit
+        
+        return spec_vals
+    
+    @staticmethod
+    def _set_supplier_nomenclature(spec_vals, supplier_nomenclature):
+        """Прив'язка рядка до номенклатури контрагента (і її номенклатури, якщо є)."""
+        if supplier_nomenclature:
+            spec_vals['supplier_nomenclature_id'] = supplier_nomenclature.id
+            if supplier_nomenclature.nomenclature_id:
+                spec_vals['nomenclature_id'] = supplier_nomenclature.nomenclature_id.id
+    
+    @staticmethod
+    def _resolve_per_line(env, prepared, result, resolve):
+        """
+        Запасний шлях, коли пакетний пошук впав: resolve(line_data, spec_vals)
+        для кожного рядка у власному savepoint. Рядок з помилкою потрапляє
+        в result['errors'] і не імпортується, решта рядків - імпортуються.
+        
+        :return: list (line_data, spec_vals) рядків без помилок
+        """
+        kept = []
+        for line_data, spec_vals in prepared:
+            try:
+                with env.cr.savepoint():
+                    resolve(line_data, spec_vals)
+            except Exception as e:
+                _logger.error(f"Error processing line: {e}", exc_info=True)
+                result['errors'].append(f"Рядок {line_data.get('line_number', '?')}: {str(e)}")
+            else:
+                kept.append((line_data, spec_vals))
+        return kept
+    
     @staticmethod
     def _process_lines(document, lines_data):
         """
-        Обробка рядків специфікації з JSON.
+        Обробка рядків специфікації з JSON (пакетно).
+        
+        Одиниці виміру та номенклатура контрагента шукаються одним запитом
+        кожна, відсутні створюються разом. Існуючі рядки документа
+        зіставляються в пам'яті, далі один create(vals_list) і згруповані
+        write. Собівартість номенклатури оновлюється один раз у кінці.
         
         :param document: запис dino.operation.document
         :param lines_data: list з даними про позиції
@@ -315,103 +384,161 @@ class DocumentJSONService:
             'errors': []
         }
         
-        PartnerNomenclature = document.env['dino.partner.nomenclature']
-        Specification = document.env['dino.operation.document.specification']
-        DinoUom = document.env['dino.uom']
+        env = document.env
+        # Собівартість рахуємо один раз для всіх рядків, а не на кожен create/write
+        Specification = env['dino.operation.document.specification'].with_context(skip_nomenclature_cost=True)
         
+        # 1. Значення рядків
+        prepared = []
         for line_data in lines_data:
             try:
-                # Find or create unit of measure using dino.uom
-                unit_name = line_data.get('unit')
-                uom = None
-                
-                if unit_name:
-                    # Use find_or_create method from dino.uom model
-                    uom = DinoUom.find_or_create(unit_name)
-                    if uom:
-                        _logger.info(f"Using UOM: {uom.name} (id: {uom.id})")
+                prepared.append((line_data, DocumentJSONService._line_vals(line_data)))
+            except Exception as e:
+                _logger.error(f"Error processing line: {e}", exc_info=True)
+                result['errors'].append(f"Рядок {line_data.get('line_number', '?')}: {str(e)}")
+        if not prepared:
+            return result
+        
+        # 2. Одиниці виміру - один пошук, відсутні створюються разом
+        # Якщо пакет впав (наприклад, колізія унікальної назви) - по рядку, як раніше
+        DinoUom = env['dino.uom']
+        try:
+            with env.cr.savepoint():
+                uoms = DinoUom.find_or_create_multi(line_data.get('unit') for line_data, _vals in prepared)
+        except Exception as e:
+            _logger.warning(f"Bulk UOM lookup failed, falling back to per-line: {e}")
+            
+            def _resolve_uom(line_data, spec_vals):
+                uom = DinoUom.find_or_create(line_data.get('unit'))
+                if uom:
+                    spec_vals['dino_uom_id'] = uom.id
+            
+            prepared = DocumentJSONService._resolve_per_line(env, prepared, result, _resolve_uom)
+        else:
+            for line_data, spec_vals in prepared:
+                unit_name = (line_data.get('unit') or '').strip().lower()
+                if unit_name in uoms:
+                    spec_vals['dino_uom_id'] = uoms[unit_name].id
+        
+        # 3. Номенклатура контрагента - так само
+        if document.partner_id:
+            PartnerNomenclature = env['dino.partner.nomenclature']
+            uom_by_name = {}
+            for _line_data, spec_vals in prepared:
+                uom_by_name.setdefault(spec_vals['name'], spec_vals.get('dino_uom_id'))
+            try:
+                with env.cr.savepoint():
+                    supplier_nomenclatures = PartnerNomenclature.find_or_create_multi(
+                        document.partner_id.id, uom_by_name)
+            except Exception as e:
+                _logger.warning(f"Bulk supplier nomenclature lookup failed, falling back to per-line: {e}")
                 
-                # Find or create in partner nomenclature
-                supplier_nomenclature = None
-                if document.partner_id:
-                    supplier_nomenclature = PartnerNomenclature.find_or_create(
+                def _resolve_supplier_nomenclature(_line_data, spec_vals):
+                    DocumentJSONService._set_supplier_nomenclature(spec_vals, PartnerNomenclature.find_or_create(
                         partner_id=document.partner_id.id,
-                        supplier_name=line_data['name'],
+                        supplier_name=spec_vals['name'],
                         auto_create=True,
-                        uom_id=uom.id if uom else None
-                    )
-                
-                # Перевірити існуючий рядок
-                # ВАЖЛИВО: Шукаємо по sequence тільки якщо він НЕ дефолтний (10)
-                existing_spec = None
-                line_number = line_data.get('line_number', 0)
-                
-                if line_number > 0:
-                    # Шукаємо рядок з таким же sequence (якщо він був заданий раніше)
-                    existing_spec = Specification.search([
-                        ('document_id', '=', document.id),
-                        ('sequence', '=', line_number)
-                    ], limit=1)
-                    
-                    if existing_spec:
-                        _logger.info(f"✅ Found existing line by sequence={line_number}: {existing_spec.name}")
-                
-                if not existing_spec:
-                    # Якщо не знайшли по sequence - шукаємо по name + sequence=10 (дефолтний)
-                    # Це для оновлення старих рядків, які були створені без line_number
-                    existing_spec = Specification.search([
-                        ('document_id', '=', document.id),
-                        ('name', '=', line_data['name']),
-                        ('sequence', '=', 10)  # Тільки рядки з дефолтним sequence
-                    ], limit=1)
-                    
-                    if existing_spec:
-                        _logger.info(f"✅ Found existing line by name (default sequence): {existing_spec.name}")
-                
-                # Підготувати значення
-                spec_vals = {
-                    'name': line_data['name'],
-                    'quantity': line_data.get('quantity', 1.0),
-                    'price_untaxed': line_data.get('price_unit', 0.0),
-                    'sequence': line_data.get('line_number', 0),
-                }
-                
-                # Додати description якщо є
-                if line_data.get('description'):
-                    spec_vals['description'] = line_data['description']
-                
-                # Розрахунок price_tax (ціна за одиницю З ПДВ)
-                # Пріоритет: price_unit_with_tax з AI, потім розрахунок
-                if line_data.get('price_unit_with_tax'):
-                    spec_vals['price_tax'] = line_data['price_unit_with_tax']
-                else:
-                    # Розрахувати з price_unit та tax_percent
-                    price_unit = line_data.get('price_unit', 0.0)
-                    tax_percent = line_data.get('tax_percent', 0)
-                    if tax_percent > 0:
-                        spec_vals['price_tax'] = price_unit * (1 + tax_percent / 100)
-                    else:
-                        spec_vals['price_tax'] = price_unit
-                
-                if supplier_nomenclature:
-                    spec_vals['supplier_nomenclature_id'] = supplier_nomenclature.id
-                    if supplier_nomenclature.nomenclature_id:
-                        spec_vals['nomenclature_id'] = supplier_nomenclature.nomenclature_id.id
+                        uom_id=spec_vals.get('dino_uom_id'),
+                    ))
                 
-                if uom:
-                    spec_vals['dino_uom_id'] = uom.id
-                
-                if existing_spec:
-                    existing_spec.write(spec_vals)
-                    result['updated'] += 1
+                prepared = DocumentJSONService._resolve_per_line(env, prepared, result, _resolve_supplier_nomenclature)
+            else:
+                for _line_data, spec_vals in prepared:
+                    DocumentJSONService._set_supplier_nomenclature(
+                        spec_vals, supplier_nomenclatures.get(spec_vals['name']))
+        if not prepared:
+            return result
+        
+        # 4. Зіставлення з існуючими рядками в пам'яті
+        # ВАЖЛИВО: Шукаємо по sequence тільки якщо він НЕ дефолтний (10),
+        # інакше по name + sequence=10 (старі рядки, створені без line_number).
+        # Рядки в порядку id - як search(limit=1) з _order 'sequence, id';
+        # нові рядки цього ж імпорту теж беруть участь у зіставленні.
+        entries = [
+            {'record': spec, 'sequence': spec.sequence, 'name': spec.name, 'vals': {}, 'lines': []}
+            for spec in Specification.search([('document_id', '=', document.id)], order='id')
+        ]
+        by_sequence = defaultdict(list)
+        by_name = defaultdict(list)
+        
+        def _index(position, add=True):
+            entry = entries[position]
+            keys = [by_sequence[entry['sequence']]]
+            if entry['sequence'] == 10:
+                keys.append(by_name[entry['name']])
+            for positions in keys:
+                if add:
+                    positions.append(position)
                 else:
-                    spec_vals['document_id'] = document.id
-                    Specification.create(spec_vals)
-                    result['created'] += 1
-                
-            except Exception as e:
-                _logger.error(f"Error processing line: {e}", exc_info=True)
-                result['errors'].append(f"Рядок {line_data.get('line_number', '?')}: {str(e)}")
+                    positions.remove(position)
+        
+        for position in range(len(entries)):
+            _index(position)
+        
+        for line_data, spec_vals in prepared:
+            line_number = spec_vals['sequence']
+            position = None
+            if line_number and line_number > 0 and by_sequence.get(line_number):
+                position = min(by_sequence[line_number])
+            if position is None and by_name.get(spec_vals['name']):
+                position = min(by_name[spec_vals['name']])
+            
+            if position is None:
+                entries.append({'record': None, 'sequence': None, 'name': None,
+                                'vals': {'document_id': document.id}, 'lines': []})
+                position = len(entries) - 1
+            else:
+                _index(position, add=False)
+            
+            entry = entries[position]
+            entry['vals'].update(spec_vals)
+            entry['lines'].append(line_data)
+            entry['sequence'], entry['name'] = spec_vals['sequence'], spec_vals['name']
+            _index(position)
+        
+        to_create = [entry for entry in entries if not entry['record'] and entry['lines']]
+        to_write = [entry for entry in entries if entry['record'] and entry['lines']]
+        
+        def _count(entry):
+            # Перший рядок нового запису - створення, повтори того ж рядка - оновлення
+            new = 0 if entry['record'] else 1
+            result['created'] += new
+            result['updated'] += len(entry['lines']) - new
+        
+        # 5. Запис: один create + write, згруповані за однаковими значеннями
+        touched = Specification.browse()
+        try:
+            with env.cr.savepoint():
+                touched |= Specification.create([entry['vals'] for entry in to_create])
+                groups = defaultdict(list)
+                for entry in to_write:
+                    groups[tuple(sorted(entry['vals'].items()))].append(entry['record'].id)
+                for vals_items, spec_ids in groups.items():
+                    specs = Specification.browse(spec_ids)
+                    specs.write(dict(vals_items))
+                    touched |= specs
+            for entry in to_create + to_write:
+                _count(entry)
+        except Exception as e:
+            # Пакет не пройшов - по одному рядку, щоб помилка була прив'язана до рядка
+            _logger.warning(f"Bulk lines write failed ({e}), falling back to line by line")
+            touched = Specification.browse()
+            for entry in to_create + to_write:
+                try:
+                    with env.cr.savepoint():
+                        if entry['record']:
+                            entry['record'].write(entry['vals'])
+                            touched |= entry['record']
+                        else:
+                            touched |= Specification.create(entry['vals'])
+                    _count(entry)
+                except Exception as line_error:
+                    _logger.error(f"Error processing line: {line_error}", exc_info=True)
+                    line_number = entry['lines'][-1].get('line_number', '?')
+                    result['errors'].append(f"Рядок {line_number}: {str(line_error)}")
+        
+        # 6. Собівартість номенклатури - один раз для всіх рядків
+        touched._update_nomenclature_cost()
         
         return result
     
@@ -0,0 +1,81 @@
+#
+#  -*- File: documents/services/parser_cache.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Ключи кэша результатов AI парсинга (без Odoo).
+
+Результат зависит только от входа запроса: текста, изображения, типа агента,
+модели, температуры, шаблона парсинга и списка единиц измерения. Ключ -
+sha256 от всех этих частей, поэтому повторный импорт того же счета (или тот
+же PDF от поставщика) находится в dino.parser.cache, а изменение шаблона
+ai_parsing_template.md или модели агента дает новый ключ автоматически.
+
+Текст нормализуется: пробелы и переводы строк не меняют ключ.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), 'ai_parsing_template.md')
+_template_version = {}
+
+
+def normalize_text(text):
+    """NFC + схлопнутые пробелы: правки форматирования не сбрасывают кэш."""
+    if not text:
+        return ''
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def image_digest(image_data):
+    """sha256 байтов изображения (bytes или base64 строка из поля Binary)."""
+    if not image_data:
+        return ''
+    if isinstance(image_data, str):
+        try:
+            image_data = base64.b64decode(image_data, validate=True)
+        except ValueError:
+            image_data = image_data.encode('utf-8')
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def template_version(path=_TEMPLATE_PATH):
+    """sha256 шаблона парсинга; пересчитывается при изменении mtime файла."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return ''
+    cached = _template_version.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as fh:
+        version = hashlib.sha256(fh.read()).hexdigest()[:16]
+    _template_version[path] = (mtime, version)
+    return version
+
+
+def cache_key(text=None, image_data=None, agent_type=None, model_name=None, temperature=None,
+              units_list=None, template=None, partner_name=None):
+    """Ключ кэша (hex sha256) для одного запроса парсинга."""
+    parts = {
+        'text': normalize_text(text),
+        'image': image_digest(image_data),
+        'agent_type': agent_type or '',
+        'model': model_name or '',
+        'temperature': round(float(temperature or 0.0), 3),
+        'units': sorted(units_list or []),
+        'template': template if template is not None else template_version(),
+        'partner': partner_name or '',
+    }
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(result):
+    """В кэш идут только успешные ответы модели (не debug и не ошибки)."""
+    return bool(result and result.get('success') and not result.get('errors') and result.get('raw_json'))
+# End of file documents/services/parser_cache.py
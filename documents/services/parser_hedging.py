@@ -0,0 +1,181 @@
+#
+#  -*- File: documents/services/parser_hedging.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Хеджированные запросы к агентам парсинга (без Odoo).
+
+Основной агент запускается сразу; если он не ответил за бюджет задержки
+(обычно p90 его собственной истории), параллельно запускается резервный.
+Берется первый валидный результат. HTTP запрос проигравшего прервать
+нельзя - его поток дорабатывает в фоне, а результат отбрасывается.
+
+LatencyHistogram - гистограмма времени ответа с фиксированными корзинами,
+хранится в поле агента как JSON и дает квантиль для бюджета.
+"""
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_logger = logging.getLogger(__name__)
+
+# Верхние границы корзин, секунды (последняя - все, что дольше)
+BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90, 120)
+MIN_SAMPLES = 20
+DEFAULT_BUDGET = 30.0
+
+
+class LatencyHistogram:
+    """Счетчики по корзинам BUCKETS + одна корзина переполнения."""
+
+    def __init__(self, counts=None):
+        counts = list(counts or [])
+        self.counts = (counts + [0] * (len(BUCKETS) + 1))[:len(BUCKETS) + 1]
+
+    @classmethod
+    def loads(cls, data):
+        try:
+            return cls(json.loads(data) if data else None)
+        except (TypeError, ValueError):
+            return cls()
+
+    def dumps(self):
+        return json.dumps(self.counts)
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def record(self, seconds):
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Верхняя граница корзины, в которую попадает квантиль q; None без данных."""
+        total = self.total
+        if not total:
+            return None
+        threshold = q * total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return float(BUCKETS[min(index, len(BUCKETS) - 1)])
+        return float(BUCKETS[-1])
+
+    def budget(self, q=0.9, default=DEFAULT_BUDGET, min_samples=MIN_SAMPLES):
+        """Бюджет хеджирования: квантиль истории, пока данных мало - default."""
+        if self.total < min_samples:
+            return default
+        return self.quantile(q)
+
+
+def is_valid_result(result):
+    """Успешный ответ, прошедший проверку математики без ошибок (❌)."""
+    if not result or not result.get('success') or result.get('errors'):
+        return False
+    warnings = (result.get('metadata') or {}).get('math_warnings') or []
+    return not any('❌' in str(warning) for warning in warnings)
+
+
+def hedged_call(primary, fallback, budget, is_valid, timeout=None):
+    """
+    primary/fallback - функции без аргументов, возвращающие результат парсинга.
+
+    :param budget: секунд ждать основной до запуска резервного
+    :param is_valid: result -> bool; невалидный результат не выигрывает
+    :param timeout: общий предел ожидания (None - пока не закончат оба)
+    :return: (result, winner, latencies) - winner 0/1 (основной/резервный),
+             latencies {0|1: секунды} - выборки для гистограммы (см. latency_samples).
+             Если валидных нет - невалидный результат основного
+             (или резервного), None - если оба упали или не успели.
+    """
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='dino-hedge')
+    futures = {}
+    starts = {}
+    latencies = {}
+
+    def _timed(call, index):
+        call_started = time.monotonic()
+        result = call()
+        latencies[index] = time.monotonic() - call_started
+        return result
+
+    def _samples():
+        return latency_samples(futures, starts, latencies)
+
+    starts[0] = time.monotonic()
+    futures[pool.submit(_timed, primary, 0)] = 0
+    results = {}
+    try:
+        pending = set(futures)
+        hedged = False
+        while pending:
+            if not hedged:
+                wait_for = budget
+            elif timeout is None:
+                wait_for = None
+            else:
+                wait_for = max(timeout - (time.monotonic() - started), 0.0)
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    _logger.warning(f"Hedged call {index} failed: {e}")
+                    results[index] = None
+                if results[index] is not None and is_valid(results[index]):
+                    return results[index], index, _samples()
+
+            if not hedged and (pending or 0 in results):
+                # Основной не успел за бюджет (или ответил невалидно) - запускаем резервный
+                hedged = True
+                _logger.info(f"Hedging: primary not done after {time.monotonic() - started:.1f}s, starting fallback")
+                starts[1] = time.monotonic()
+                fallback_future = pool.submit(_timed, fallback, 1)
+                futures[fallback_future] = 1
+                pending.add(fallback_future)
+            elif not done:
+                break  # общий timeout
+    finally:
+        # Не ждем проигравшего: поток дорабатывает в фоне, результат отбрасывается
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    for index in (0, 1):
+        if results.get(index) is not None:
+            return results[index], index, _samples()
+    return None, None, _samples()
+
+
+def latency_samples(futures, starts, latencies):
+    """
+    Выборки времени ответа для гистограммы агента.
+
+    Как и без хеджирования, учитываются только успешные ответы. Вызов,
+    брошенный незавершенным (проигравший основной), дает выборку не меньше
+    прошедшего времени - иначе в гистограмму попадали бы только ответы
+    быстрее бюджета, и p90 со временем только уменьшался бы.
+
+    :param futures: {future: индекс вызова}
+    :param starts: {индекс: time.monotonic() запуска}
+    :param latencies: {индекс: секунды} завершившихся без исключения вызовов
+    :return: {индекс: секунды}
+    """
+    now = time.monotonic()
+    samples = {}
+    for future, index in futures.items():
+        if not future.done():
+            samples[index] = now - starts[index]
+        elif future.exception() is None and index in latencies:
+            result = future.result()
+            if result and result.get('success'):
+                samples[index] = latencies[index]
+    return samples
+# End of file documents/services/parser_hedging.py
@@ -0,0 +1,62 @@
+#
+#  -*- File: documents/tests/test_parser_cache.py -*-
+#
+import base64
+import os
+import importlib.util
+
+
+def load_module():
+    path = os.path.join(os.path.dirname(__file__), '..', 'services', 'parser_cache.py')
+    path = os.path.normpath(path)
+    spec = importlib.util.spec_from_file_location('parser_cache_mod', path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _key(mod, **overrides):
+    params = dict(text='Рахунок № 45\nТовар 1  шт 100.00', agent_type='ai_google', model_name='gemini-2.0-flash',
+                  temperature=0.0, units_list=['шт', 'кг'], template='v1')
+    params.update(overrides)
+    return mod.cache_key(**params)
+
+
+def test_key_ignores_whitespace_and_units_order():
+    mod = load_module()
+    assert _key(mod) == _key(mod, text='  Рахунок № 45 Товар 1 шт 100.00 ')
+    assert _key(mod) == _key(mod, units_list=['кг', 'шт'])
+
+
+def test_key_changes_with_request_inputs():
+    mod = load_module()
+    base = _key(mod)
+    assert base != _key(mod, text='Рахунок № 46')
+    assert base != _key(mod, model_name='gemini-2.5-flash')
+    assert base != _key(mod, temperature=0.2)
+    assert base != _key(mod, template='v2')
+    assert base != _key(mod, image_data=b'\x89PNG...')
+
+
+def test_image_bytes_and_base64_give_same_key():
+    mod = load_module()
+    image = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+    assert _key(mod, image_data=image) == _key(mod, image_data=base64.b64encode(image).decode('ascii'))
+
+
+def test_template_version_tracks_file(tmp_path):
+    mod = load_module()
+    template = tmp_path / 'template.md'
+    template.write_text('schema v1', encoding='utf-8')
+    first = mod.template_version(str(template))
+    template.write_text('schema v2', encoding='utf-8')
+    os.utime(template, (1, 1))
+    assert mod.template_version(str(template)) != first
+
+
+def test_only_successful_results_are_cached():
+    mod = load_module()
+    assert mod.is_cacheable({'success': True, 'errors': [], 'raw_json': '{}'})
+    assert not mod.is_cacheable({'success': True, 'errors': ['DEBUG MODE'], 'raw_json': ''})
+    assert not mod.is_cacheable({'success': False, 'errors': ['timeout']})
+# End of file documents/tests/test_parser_cache.py
@@ -0,0 +1,94 @@
+#
+#  -*- File: documents/tests/test_parser_hedging.py -*-
+#
+import os
+import time
+import importlib.util
+
+
+def load_module():
+    path = os.path.join(os.path.dirname(__file__), '..', 'services', 'parser_hedging.py')
+    path = os.path.normpath(path)
+    spec = importlib.util.spec_from_file_location('parser_hedging_mod', path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _ok(name):
+    return {'success': True, 'errors': [], 'agent': name, 'metadata': {}}
+
+
+def _slow(seconds, result):
+    def call():
+        time.sleep(seconds)
+        return result
+    return call
+
+
+def test_histogram_quantile_and_budget():
+    mod = load_module()
+    histogram = mod.LatencyHistogram()
+    for seconds in [1.5] * 18 + [25, 70]:
+        histogram.record(seconds)
+
+    assert histogram.total == 20
+    assert histogram.quantile(0.5) == 2.0
+    assert histogram.quantile(0.95) == 30.0
+    assert histogram.budget(q=0.9) == 2.0
+    assert mod.LatencyHistogram.loads(histogram.dumps()).counts == histogram.counts
+    assert mod.LatencyHistogram().budget() == mod.DEFAULT_BUDGET
+
+
+def test_fast_primary_does_not_start_fallback():
+    mod = load_module()
+    calls = []
+
+    def fallback():
+        calls.append('fallback')
+        return _ok('fallback')
+
+    result, winner, latencies = mod.hedged_call(lambda: _ok('primary'), fallback, 1.0, mod.is_valid_result)
+
+    assert (result['agent'], winner) == ('primary', 0)
+    assert calls == [] and set(latencies) == {0}
+
+
+def test_slow_primary_is_hedged():
+    mod = load_module()
+    started = time.monotonic()
+    result, winner, latencies = mod.hedged_call(
+        _slow(2.0, _ok('primary')), _slow(0.05, _ok('fallback')), 0.1, mod.is_valid_result)
+
+    assert (result['agent'], winner) == ('fallback', 1)
+    # Не ждем проигравшего
+    assert time.monotonic() - started < 1.0
+    # Брошенный основной учтен временем не меньше бюджета
+    assert set(latencies) == {0, 1}
+    assert latencies[0] >= 0.1
+
+
+def test_failed_calls_are_not_sampled():
+    mod = load_module()
+    failed = {'success': False, 'errors': ['401']}
+    _result, winner, latencies = mod.hedged_call(lambda: failed, lambda: _ok('fallback'), 5.0, mod.is_valid_result)
+
+    assert winner == 1 and set(latencies) == {1}
+
+
+def test_invalid_primary_falls_back_immediately():
+    mod = load_module()
+    bad_math = {'success': True, 'errors': [], 'metadata': {'math_warnings': ['❌ Помилка валідації математики']}}
+    result, winner, _latencies = mod.hedged_call(lambda: bad_math, lambda: _ok('fallback'), 5.0, mod.is_valid_result)
+
+    assert (result['agent'], winner) == ('fallback', 1)
+
+
+def test_both_invalid_returns_primary():
+    mod = load_module()
+    failed = {'success': False, 'errors': ['timeout']}
+    result, winner, _latencies = mod.hedged_call(lambda: failed, lambda: dict(failed, agent='fallback'), 0.1,
+                                                 mod.is_valid_result)
+
+    assert winner == 0 and result is failed
+# End of file documents/tests/test_parser_hedging.py
@@ -0,0 +1,19 @@
+-- Migration: Unique index on dino_currency_rate (currency, date, source, rate_type)
+-- Replaces the Python-level _check_unique_rate constraint.
+-- Run BEFORE module upgrade: Odoo cannot add the constraint while duplicates exist.
+
+-- Remove duplicates, keep the most recently written row per key
+DELETE FROM dino_currency_rate d
+USING dino_currency_rate k
+WHERE d.currency_id = k.currency_id
+  AND d.date = k.date
+  AND d.source IS NOT DISTINCT FROM k.source
+  AND d.rate_type IS NOT DISTINCT FROM k.rate_type
+  AND (COALESCE(d.write_date, '-infinity'), d.id) < (COALESCE(k.write_date, '-infinity'), k.id);
+
+ALTER TABLE dino_currency_rate
+DROP CONSTRAINT IF EXISTS dino_currency_rate_currency_date_source_type_uniq;
+
+ALTER TABLE dino_currency_rate
+ADD CONSTRAINT dino_currency_rate_currency_date_source_type_uniq
+UNIQUE (currency_id, date, source, rate_type);
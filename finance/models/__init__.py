@@ -1,7 +1,9 @@
 from . import dino_bank
 from . import dino_bank_cron
 from . import dino_bank_transaction
+from . import dino_bank_transaction_raw
 from . import dino_bank_balance_history
+from . import dino_bank_cash_position
 from . import dino_currency_rate
 from . import dino_cashbook
 from . import dino_bank_account
@@ -6,6 +6,7 @@ import logging
 from datetime import datetime, timedelta
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
+from odoo.addons.dino_erp.core.mixins.related_count_mixin import related_count
 
 _logger = logging.getLogger(__name__)
 
@@ -38,6 +39,10 @@ class DinoBank(models.Model):
     _name = 'dino.bank'
     _description = _('Bank Directory')
     _order = 'name'
+    _inherit = ['mixin.related.count']
+    _related_counts = {
+        'account_count': ('dino.bank.account', 'bank_id'),
+    }
 
     # ------------------------------------------------------------------
     # РАЗДЕЛ: Структура / Поля
@@ -51,12 +56,7 @@ class DinoBank(models.Model):
     active = fields.Boolean(string=_('Active'), default=True)
 
     # Smart button / indicators
-    account_count = fields.Integer(string=_('Accounts'), compute='_compute_account_count')
-
-    @api.depends()
-    def _compute_account_count(self):
-        for rec in self:
-            rec.account_count = self.env['dino.bank.account'].search_count([('bank_id', '=', rec.id)])
+    account_count = fields.Integer(string=_('Accounts'), compute=related_count('account_count'))
 
     def action_view_accounts(self):
         self.ensure_one()
@@ -0,0 +1,192 @@
+#
+#  -*- File: finance/models/dino_bank_cash_position.py -*-
+#
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+# Keys (account, day) per refresh statement
+_REFRESH_BATCH = 5000
+
+
+class DinoBankCashPosition(models.Model):
+    """
+    Daily cash position per bank account: one pre-aggregated row per
+    (account, day) built from `dino.bank.transaction` and
+    `dino.bank.balance.history`.
+
+    Turnover follows the transaction convention: debit = outflow,
+    credit = inflow (the balance history of PrivatBank uses the opposite).
+    Opening/closing come from the bank's balance history when it exists,
+    otherwise from `balance_after` of the day's first/last transaction,
+    otherwise the opening is the last known closing balance of the history
+    and closing = opening + credit - debit.
+
+    Rows are never edited by hand: the importers and the ORM create/write/
+    unlink of `dino.bank.transaction` call `refresh_days()` for the days
+    they touched. Manual edits of `dino.bank.balance.history` are not
+    tracked - run `rebuild()` for the range afterwards
+    (see `scripts/rebuild_cash_position.py`).
+    """
+    _name = 'dino.bank.cash.position'
+    _description = _('Bank Daily Cash Position')
+    _order = 'date desc, bank_account_id'
+    _log_access = False
+
+    date = fields.Date(string=_('Date'), required=True, index=True, readonly=True)
+    bank_account_id = fields.Many2one('dino.bank.account', string=_('Bank Account'), required=True,
+                                      ondelete='cascade', index=True, readonly=True)
+    bank_id = fields.Many2one('dino.bank', string=_('Bank'), readonly=True)
+    currency_id = fields.Many2one('res.currency', string=_('Currency'), readonly=True)
+
+    opening = fields.Monetary(string=_('Opening Balance'), currency_field='currency_id', readonly=True)
+    debit = fields.Monetary(string=_('Debit'), currency_field='currency_id', readonly=True,
+                            help=_("Total outgoing transactions of the day"))
+    credit = fields.Monetary(string=_('Credit'), currency_field='currency_id', readonly=True,
+                             help=_("Total incoming transactions of the day"))
+    closing = fields.Monetary(string=_('Closing Balance'), currency_field='currency_id', readonly=True)
+    transaction_count = fields.Integer(string=_('Transactions'), readonly=True)
+    from_history = fields.Boolean(string=_('Bank Balance'), readonly=True,
+                                  help=_("Opening and closing balances are taken from the bank's balance history"))
+
+    _sql_constraints = [
+        ('account_date_uniq', 'unique(bank_account_id, date)', 'Cash position for this date and account already exists!')
+    ]
+
+    @api.model
+    def refresh_days(self, keys):
+        """
+        Recompute the rows of the given days from the source tables.
+
+        One INSERT ... SELECT ... ON CONFLICT DO UPDATE per batch of keys, so
+        two imports refreshing the same day at the same time (transactions
+        and balance history run as parallel endpoints) do not collide on
+        `account_date_uniq`. Only the keys that no longer have any
+        transactions or balance history are deleted afterwards.
+
+        :param keys: iterable of (bank_account_id, date)
+        :return: number of rows written
+        """
+        keys = sorted({(account_id, day) for account_id, day in keys if account_id and day})
+        if not keys:
+            return 0
+
+        self.env['dino.bank.transaction'].flush_model(['bank_account_id', 'datetime', 'amount', 'balance_after'])
+        self.env['dino.bank.balance.history'].flush_model(['bank_account_id', 'date', 'balance_start', 'balance_end'])
+
+        written = 0
+        for start in range(0, len(keys), _REFRESH_BATCH):
+            batch = keys[start:start + _REFRESH_BATCH]
+            params = {
+                'accounts': [account_id for account_id, _day in batch],
+                'dates': [day for _account_id, day in batch],
+            }
+            self.env.cr.execute(f"""
+                INSERT INTO {self._table} (
+                    bank_account_id, date, bank_id, currency_id, opening, debit, credit, closing,
+                    transaction_count, from_history
+                )
+                SELECT d.account_id, d.day, d.bank_id, d.currency_id, d.opening, d.debit, d.credit,
+                       COALESCE(d.closing, d.opening + d.credit - d.debit), d.cnt, d.from_history
+                  FROM (
+                    SELECT k.account_id, k.day, a.bank_id, a.currency_id,
+                           COALESCE(t.debit, 0) AS debit, COALESCE(t.credit, 0) AS credit,
+                           COALESCE(t.cnt, 0) AS cnt, h.id IS NOT NULL AS from_history,
+                           COALESCE(h.balance_start, t.first_balance - t.first_amount, prev.balance_end, 0) AS opening,
+                           COALESCE(h.balance_end, t.last_balance) AS closing
+                      FROM unnest(%(accounts)s::int[], %(dates)s::date[]) AS k(account_id, day)
+                      JOIN dino_bank_account a ON a.id = k.account_id
+                      LEFT JOIN dino_bank_balance_history h
+                             ON h.bank_account_id = k.account_id AND h.date = k.day
+                      LEFT JOIN LATERAL (
+                            SELECT SUM(CASE WHEN tr.amount < 0 THEN -tr.amount ELSE 0 END) AS debit,
+                                   SUM(CASE WHEN tr.amount > 0 THEN tr.amount ELSE 0 END) AS credit,
+                                   COUNT(*) AS cnt,
+                                   (ARRAY_AGG(tr.balance_after ORDER BY tr.datetime, tr.id))[1] AS first_balance,
+                                   (ARRAY_AGG(tr.amount ORDER BY tr.datetime, tr.id))[1] AS first_amount,
+                                   (ARRAY_AGG(tr.balance_after ORDER BY tr.datetime DESC, tr.id DESC))[1] AS last_balance
+                              FROM dino_bank_transaction tr
+                             WHERE tr.bank_account_id = k.account_id
+                               AND tr.datetime >= k.day AND tr.datetime < k.day + 1
+                            HAVING COUNT(*) > 0
+                      ) t ON TRUE
+                      LEFT JOIN LATERAL (
+                            SELECT ph.balance_end
+                              FROM dino_bank_balance_history ph
+                             WHERE ph.bank_account_id = k.account_id AND ph.date < k.day
+                             ORDER BY ph.date DESC
+                             LIMIT 1
+                      ) prev ON h.id IS NULL
+                     WHERE h.id IS NOT NULL OR t.cnt IS NOT NULL
+                  ) d
+                ON CONFLICT (bank_account_id, date) DO UPDATE SET
+                    bank_id = EXCLUDED.bank_id,
+                    currency_id = EXCLUDED.currency_id,
+                    opening = EXCLUDED.opening,
+                    debit = EXCLUDED.debit,
+                    credit = EXCLUDED.credit,
+                    closing = EXCLUDED.closing,
+                    transaction_count = EXCLUDED.transaction_count,
+                    from_history = EXCLUDED.from_history
+            """, params)
+            written += self.env.cr.rowcount
+            # Days left without transactions and without balance history
+            self.env.cr.execute(f"""
+                DELETE FROM {self._table} p
+                 USING unnest(%(accounts)s::int[], %(dates)s::date[]) AS k(account_id, day)
+                 WHERE p.bank_account_id = k.account_id AND p.date = k.day
+                   AND NOT EXISTS (
+                        SELECT 1 FROM dino_bank_balance_history h
+                         WHERE h.bank_account_id = k.account_id AND h.date = k.day)
+                   AND NOT EXISTS (
+                        SELECT 1 FROM dino_bank_transaction tr
+                         WHERE tr.bank_account_id = k.account_id
+                           AND tr.datetime >= k.day AND tr.datetime < k.day + 1)
+            """, params)
+        self.invalidate_model()
+        _logger.info(f"Cash position: refreshed {len(keys)} days, rows {written}")
+        return written
+
+    @api.model
+    def rebuild(self, account_ids=None, date_from=None, date_to=None):
+        """
+        Recompute every day that has transactions or balance history.
+
+        :param account_ids: limit to these bank accounts (default: all)
+        :param date_from: first day to rebuild (default: from the beginning)
+        :param date_to: last day to rebuild (default: up to the end)
+        :return: number of rows written
+        """
+        self.env['dino.bank.transaction'].flush_model(['bank_account_id', 'datetime'])
+        self.env['dino.bank.balance.history'].flush_model(['bank_account_id', 'date'])
+
+        where_trx, where_hist, where_pos = ['TRUE'], ['TRUE'], ['TRUE']
+        params = {'accounts': list(account_ids or []), 'date_from': date_from, 'date_to': date_to}
+        if account_ids:
+            where_trx.append('bank_account_id = ANY(%(accounts)s)')
+            where_hist.append('bank_account_id = ANY(%(accounts)s)')
+            where_pos.append('bank_account_id = ANY(%(accounts)s)')
+        if date_from:
+            where_trx.append('datetime >= %(date_from)s::date')
+            where_hist.append('date >= %(date_from)s')
+            where_pos.append('date >= %(date_from)s')
+        if date_to:
+            where_trx.append('datetime < %(date_to)s::date + 1')
+            where_hist.append('date <= %(date_to)s')
+            where_pos.append('date <= %(date_to)s')
+
+        # Existing rows are included: refresh_days() drops those without source data
+        self.env.cr.execute(f"""
+            SELECT bank_account_id, datetime::date FROM dino_bank_transaction WHERE {' AND '.join(where_trx)}
+             UNION
+            SELECT bank_account_id, date FROM dino_bank_balance_history WHERE {' AND '.join(where_hist)}
+             UNION
+            SELECT bank_account_id, date FROM {self._table} WHERE {' AND '.join(where_pos)}
+        """, params)
+        keys = self.env.cr.fetchall()
+        _logger.info(f"Cash position rebuild: {len(keys)} days")
+        return self.refresh_days(keys)
+# End of file finance/models/dino_bank_cash_position.py
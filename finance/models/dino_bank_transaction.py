@@ -3,7 +3,11 @@
 #
 # -*- coding: utf-8 -*-
 from odoo import api, fields, models, _
+from psycopg2.extras import execute_values
 import json
+import logging
+
+_logger = logging.getLogger(__name__)
 
 
 class DinoBankTransaction(models.Model):
@@ -39,7 +43,11 @@ class DinoBankTransaction(models.Model):
     external_id = fields.Char(string=_('External ID'), index=True, required=True, help=_("Unique transaction ID from the bank's API."))
     document_number = fields.Char(string=_('Document Number'), help=_("Bank document number (NUM_DOC)"))
     mcc = fields.Integer(string="MCC", help="Merchant Category Code (ISO 18245)")
-    raw_data = fields.Text(string="Raw Data", help="Stores the original JSON data of the transaction.")
+    # Stored compressed in dino.bank.transaction.raw, read only when the field is displayed
+    raw_data = fields.Text(
+        string="Raw Data", compute='_compute_raw_data', inverse='_inverse_raw_data',
+        help="Original JSON data of the transaction from the bank API."
+    )
 
     # Computed fields for convenience
     debit = fields.Monetary(compute='_compute_debit_credit', string=_('Debit'), currency_field='currency_id')
@@ -49,6 +57,17 @@ class DinoBankTransaction(models.Model):
         ('external_id_uniq', 'unique(bank_account_id, external_id)', 'The external transaction ID must be unique per bank account!')
     ]
 
+    # Fields that change the daily aggregates of dino.bank.cash.position
+    _CASH_POSITION_FIELDS = ('bank_account_id', 'datetime', 'amount', 'balance_after')
+
+    def _compute_raw_data(self):
+        payloads = self.env['dino.bank.transaction.raw'].load([rid for rid in self.ids if isinstance(rid, int)])
+        for trx in self:
+            trx.raw_data = payloads.get(trx.id, False)
+
+    def _inverse_raw_data(self):
+        self.env['dino.bank.transaction.raw'].store({trx.id: trx.raw_data for trx in self if trx.raw_data})
+
     @api.depends('amount')
     def _compute_debit_credit(self):
         for trx in self:
@@ -115,11 +134,203 @@ class DinoBankTransaction(models.Model):
         
         return partner
 
+    @api.model
+    def _resolve_counterparties(self, vals_list):
+        """
+        Batch version of `_find_or_create_partner` for a whole import page.
+
+        Resolves all counterparty EDRPOUs with one `dino.partner` search and
+        one bulk create for the missing ones, then links IBANs the same way.
+        Fills `partner_id` in place for every vals dict that has an EDRPOU.
+
+        :param vals_list: list of transaction vals dicts
+        :return: dict {edrpou: partner_id}
+        """
+        pending = [v for v in vals_list if v.get('counterparty_edrpou') and not v.get('partner_id')]
+        if not pending:
+            return {}
+
+        Partner = self.env['dino.partner']
+        BankAccount = self.env['dino.partner.bank.account']
+
+        # 1. EDRPOU -> partner map (one search)
+        edrpous = {v['counterparty_edrpou'] for v in pending}
+        partner_map = {}
+        for partner in Partner.search([('egrpou', 'in', list(edrpous))]):
+            partner_map.setdefault(partner.egrpou, partner.id)
+
+        # 2. Bulk create missing partners (first name seen on the page wins)
+        missing = {}
+        for vals in pending:
+            edrpou = vals['counterparty_edrpou']
+            if edrpou not in partner_map and edrpou not in missing:
+                missing[edrpou] = {
+                    'name': vals.get('counterparty_name') or f'Partner {edrpou}',
+                    'egrpou': edrpou,
+                }
+        if missing:
+            new_partners = Partner.create(list(missing.values()))
+            for partner in new_partners:
+                partner_map[partner.egrpou] = partner.id
+
+        # 3. Bank accounts: (partner_id, iban) pairs, one search + bulk create
+        iban_vals = {}
+        for vals in pending:
+            partner_id = partner_map.get(vals['counterparty_edrpou'])
+            vals['partner_id'] = partner_id
+            iban = vals.get('counterparty_iban')
+            if partner_id and iban and (partner_id, iban) not in iban_vals:
+                iban_vals[(partner_id, iban)] = vals
+
+        if iban_vals:
+            existing_accounts = BankAccount.search([
+                ('partner_id', 'in', list({k[0] for k in iban_vals})),
+                ('iban', 'in', list({k[1] for k in iban_vals})),
+            ])
+            existing_keys = {}
+            for account in existing_accounts:
+                existing_keys[(account.partner_id.id, account.iban)] = account
+            account_vals = []
+            for (partner_id, iban), vals in iban_vals.items():
+                account = existing_keys.get((partner_id, iban))
+                if account:
+                    # Same as find_or_create: only fill empty bank details
+                    update_vals = {
+                        field: vals[key]
+                        for field, key in (('bank_name', 'counterparty_bank_name'),
+                                           ('bank_city', 'counterparty_bank_city'),
+                                           ('bank_mfo', 'counterparty_bank_mfo'))
+                        if vals.get(key) and not account[field]
+                    }
+                    if update_vals:
+                        account.write(update_vals)
+                    continue
+                acc_vals = {'partner_id': partner_id, 'iban': iban}
+                if vals.get('counterparty_bank_name'):
+                    acc_vals['bank_name'] = vals['counterparty_bank_name']
+                if vals.get('counterparty_bank_city'):
+                    acc_vals['bank_city'] = vals['counterparty_bank_city']
+                if vals.get('counterparty_bank_mfo'):
+                    acc_vals['bank_mfo'] = vals['counterparty_bank_mfo']
+                account_vals.append(acc_vals)
+            if account_vals:
+                BankAccount.create(account_vals)
+
+        return partner_map
+
+    @api.model
+    def _bulk_upsert_from_api(self, vals_list, update_existing=False, created_ids=None):
+        """
+        Set-based upsert of one import page.
+
+        One `INSERT ... ON CONFLICT (bank_account_id, external_id)` statement
+        keyed on the `external_id_uniq` constraint instead of create()/write()
+        per row. Counterparties are resolved up front for the whole page.
+
+        Every vals dict must contain `bank_account_id`, `external_id` and
+        `currency_id` (the related stored field is not computed by raw SQL).
+
+        :param vals_list: list of transaction vals dicts
+        :param update_existing: overwrite rows that already exist (force full sync)
+        :param created_ids: optional list, extended with the ids of the inserted rows
+        :return: dict {'created': N, 'updated': N, 'skipped': N}
+        """
+        stats = {'created': 0, 'updated': 0, 'skipped': 0}
+        if not vals_list:
+            return stats
+
+        # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement
+        unique_vals = {}
+        for vals in vals_list:
+            unique_vals[(vals['bank_account_id'], vals['external_id'])] = vals
+        stats['skipped'] = len(vals_list) - len(unique_vals)
+        vals_list = list(unique_vals.values())
+
+        self._resolve_counterparties(vals_list)
+        self.flush_model()
+
+        moved_from = set()
+        if update_existing:
+            # An updated row may move to another day - the old day needs a refresh too
+            self.env.cr.execute(f"""
+                SELECT t.bank_account_id, t.datetime::date
+                  FROM {self._table} t
+                  JOIN unnest(%s::int[], %s::text[]) AS k(account_id, external_id)
+                    ON t.bank_account_id = k.account_id AND t.external_id = k.external_id
+            """, ([account_id for account_id, _ext_id in unique_vals],
+                  [external_id for _account_id, external_id in unique_vals]))
+            moved_from = set(self.env.cr.fetchall())
+
+        columns = [
+            'bank_account_id', 'external_id', 'currency_id', 'document_number', 'datetime', 'amount',
+            'partner_id', 'counterparty_name', 'counterparty_edrpou', 'counterparty_iban',
+            'counterparty_bank_name', 'counterparty_bank_city', 'counterparty_bank_mfo',
+            'description', 'mcc', 'balance_after',
+        ]
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        # Odoo uses False for empty values, SQL needs NULL
+        rows = [
+            tuple(None if vals.get(col) is False else vals.get(col) for col in columns) + (uid, now, uid, now)
+            for vals in vals_list
+        ]
+        all_columns = columns + ['create_uid', 'create_date', 'write_uid', 'write_date']
+
+        if update_existing:
+            # partner_id: keep a manually linked partner, fill it only if empty
+            update_cols = [c for c in columns if c not in ('bank_account_id', 'external_id', 'partner_id')]
+            assignments = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in update_cols + ['write_uid', 'write_date'])
+            conflict = (
+                f'DO UPDATE SET {assignments}, '
+                f'"partner_id" = COALESCE({self._table}."partner_id", EXCLUDED."partner_id")'
+            )
+        else:
+            conflict = 'DO NOTHING'
+
+        column_sql = ', '.join('"%s"' % c for c in all_columns)
+        query = (
+            f'INSERT INTO {self._table} ({column_sql}) '
+            f'VALUES %s ON CONFLICT (bank_account_id, external_id) {conflict} '
+            f'RETURNING id, bank_account_id, external_id, (xmax = 0) AS inserted, "datetime"::date AS day'
+        )
+        result = execute_values(self.env.cr, query, rows, page_size=len(rows), fetch=True)
+        self.invalidate_model()
+
+        # Raw payloads of inserted/updated rows go to the compressed side table
+        self.env['dino.bank.transaction.raw'].store({
+            trx_id: unique_vals[(account_id, external_id)].get('raw_data')
+            for trx_id, account_id, external_id, _inserted, _day in result
+        })
+        # Daily aggregates of the days this page touched
+        self.env['dino.bank.cash.position'].refresh_days(
+            moved_from | {(account_id, day) for _trx_id, account_id, _ext_id, _inserted, day in result}
+        )
+
+        inserted_ids = [trx_id for trx_id, _account_id, _ext_id, inserted, _day in result if inserted]
+        if created_ids is not None:
+            created_ids.extend(inserted_ids)
+        stats['created'] = len(inserted_ids)
+        stats['updated'] = len(result) - stats['created']
+        stats['skipped'] += len(rows) - len(result)
+        return stats
+
     @api.model_create_multi
     def create(self, vals_list):
         """Override create to automatically link partner by EDRPOU"""
-        # Auto-link partner if EDRPOU is provided
-        for vals in vals_list:
+        pending = [v for v in vals_list if v.get('counterparty_edrpou') and not v.get('partner_id')]
+        # Auto-link partners for the whole batch: two IN searches + bulk creates
+        if pending:
+            try:
+                with self.env.cr.savepoint():
+                    self._resolve_counterparties(pending)
+                pending = []
+            except Exception as e:
+                _logger.warning(f"Batch counterparty resolution failed, falling back to per-row: {e}")
+                for vals in pending:
+                    vals.pop('partner_id', None)
+
+        # Fallback: one counterparty at a time
+        for vals in pending:
             if vals.get('counterparty_edrpou') and not vals.get('partner_id'):
                 partner = self._find_or_create_partner(
                     edrpou=vals.get('counterparty_edrpou'),
@@ -132,7 +343,28 @@ class DinoBankTransaction(models.Model):
                 if partner:
                     vals['partner_id'] = partner.id
         
-        return super(DinoBankTransaction, self).create(vals_list)
+        records = super(DinoBankTransaction, self).create(vals_list)
+        self.env['dino.bank.cash.position'].refresh_days(records._cash_position_keys())
+        return records
+
+    def write(self, vals):
+        """Refresh the daily cash position of the days the rows leave and enter"""
+        if not any(fname in vals for fname in self._CASH_POSITION_FIELDS):
+            return super().write(vals)
+        keys = self._cash_position_keys()
+        result = super().write(vals)
+        self.env['dino.bank.cash.position'].refresh_days(keys | self._cash_position_keys())
+        return result
+
+    def unlink(self):
+        keys = self._cash_position_keys()
+        result = super().unlink()
+        self.env['dino.bank.cash.position'].refresh_days(keys)
+        return result
+
+    def _cash_position_keys(self):
+        """(bank_account_id, day) keys of dino.bank.cash.position these transactions belong to"""
+        return {(trx.bank_account_id.id, trx.datetime.date()) for trx in self if trx.datetime}
 
     @api.model
     def create_from_api(self, bank_account, payload):
@@ -144,8 +376,8 @@ class DinoBankTransaction(models.Model):
         :param payload: A dictionary with standardized keys.
         :return: The newly created `dino.bank.transaction` record.
         """
-        # Ensure raw data is stored as a string
-        if 'raw_data' in payload and isinstance(payload['raw_data'], dict):
+        # Ensure raw data is stored as a string (compressed canonical JSON on write)
+        if 'raw_data' in payload and isinstance(payload['raw_data'], (dict, list)):
             payload['raw_data'] = json.dumps(payload['raw_data'], ensure_ascii=False)
 
         payload['bank_account_id'] = bank_account.id
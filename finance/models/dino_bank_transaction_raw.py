@@ -0,0 +1,66 @@
+#
+#  -*- File: finance/models/dino_bank_transaction_raw.py -*-
+#
+# -*- coding: utf-8 -*-
+import psycopg2
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, _
+
+from ..services import raw_payload
+
+
+class DinoBankTransactionRaw(models.Model):
+    """
+    Raw API payloads of bank transactions, kept out of `dino.bank.transaction`
+    so list/search scans of the main table stay narrow.
+
+    One row per transaction: zlib-compressed canonical JSON
+    (see `finance/services/raw_payload.py`). Read and written only through
+    `store()` / `load()`; the form shows it in the debug-mode Raw Data tab.
+    """
+    _name = 'dino.bank.transaction.raw'
+    _description = _('Bank Transaction Raw Payload')
+    _log_access = False
+
+    transaction_id = fields.Many2one('dino.bank.transaction', string=_('Transaction'), required=True,
+                                     ondelete='cascade', index=True)
+    # Raw zlib bytes in bytea (not base64): written by SQL in store(), never through the ORM
+    payload = fields.Binary(string=_('Payload'), attachment=False)
+
+    _sql_constraints = [
+        ('transaction_uniq', 'unique(transaction_id)', 'Only one raw payload per transaction!'),
+    ]
+
+    @api.model
+    def store(self, payloads):
+        """
+        Upsert payloads for many transactions with one statement.
+
+        :param payloads: dict {transaction_id: dict / JSON string / legacy repr string}
+        """
+        rows = [
+            (transaction_id, psycopg2.Binary(raw_payload.pack(data)))
+            for transaction_id, data in payloads.items() if data
+        ]
+        if not rows:
+            return
+        execute_values(
+            self.env.cr,
+            f'INSERT INTO {self._table} (transaction_id, payload) VALUES %s '
+            f'ON CONFLICT (transaction_id) DO UPDATE SET payload = EXCLUDED.payload',
+            rows, page_size=1000,
+        )
+        self.invalidate_model(['payload'])
+
+    @api.model
+    def load(self, transaction_ids):
+        """Readable JSON per transaction: dict {transaction_id: text}, one query."""
+        if not transaction_ids:
+            return {}
+        self.env.cr.execute(
+            f'SELECT transaction_id, payload FROM {self._table} WHERE transaction_id = ANY(%s)',
+            [list(transaction_ids)],
+        )
+        return {transaction_id: raw_payload.unpack(payload) for transaction_id, payload in self.env.cr.fetchall()}
+# End of file finance/models/dino_bank_transaction_raw.py
@@ -3,8 +3,17 @@
 #
 from odoo import api, fields, models, _
 
+from ..services import currency_converter
+
 
 class DinoCurrencyRate(models.Model):
+    """
+    Currency rates by source and type (UAH per unit).
+
+    Every change made through the ORM - imports and manual corrections from
+    the list/form views alike - drops the cached `CurrencyConverter` in all
+    workers (`currency_converter.invalidate`).
+    """
     _name = 'dino.currency.rate'
     _description = _('Currency Rate')
     _order = 'date desc'
@@ -16,15 +25,25 @@ class DinoCurrencyRate(models.Model):
     source = fields.Selection([('nbu', 'NBU'), ('privat', 'PrivatBank'), ('mono', 'MonoBank'), ('commercial', 'Commercial')], string=_('Source'), default='commercial', index=True)
     rate_type = fields.Selection([('official', 'Official'), ('buy', 'Buy'), ('sell', 'Sell')], string=_('Rate Type'), default='official', index=True)
 
-    @api.constrains('currency_id', 'date', 'source', 'rate_type')
-    def _check_unique_rate(self):
-        for record in self:
-            existing = self.search([
-                ('currency_id', '=', record.currency_id.id),
-                ('date', '=', record.date),
-                ('source', '=', record.source),
-                ('rate_type', '=', record.rate_type),
-                ('id', '!=', record.id)
-            ])
-            if existing:
-                raise models.ValidationError('Rate for this currency/date/source/type already exists')# End of file finance/models/dino_currency_rate.py
+    # Уникальность проверяет индекс в БД, а не search на каждую запись при create
+    _sql_constraints = [
+        ('currency_date_source_type_uniq', 'unique(currency_id, date, source, rate_type)',
+         'Rate for this currency/date/source/type already exists'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        currency_converter.invalidate(self.env)
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        currency_converter.invalidate(self.env)
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        currency_converter.invalidate(self.env)
+        return result
+# End of file finance/models/dino_currency_rate.py
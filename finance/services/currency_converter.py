@@ -0,0 +1,234 @@
+#
+#  -*- File: finance/services/currency_converter.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Пересчет сумм между валютами по курсам в памяти.
+
+Курсы одного источника (source, rate_type) загружаются одним запросом
+в отсортированные по дате векторы на валюту: "курс на дату D или ближайшую
+раньше" - бинарный поиск, пакет сумм пересчитывается одним вызовом
+convert_many() (через numpy.searchsorted, если numpy установлен).
+
+    converter = get_converter(env)                       # nbu / official
+    uah = converter.convert(100.0, usd_id, uah_id, day)
+    totals = converter.convert_many(amounts, currency_ids, uah_id, days)
+
+Курс в векторах - сколько базовой валюты стоит единица валюты:
+  - источники dino.currency.rate (nbu, privat, ...) - гривен за единицу;
+  - source='system' - res.currency.rate компании, база - валюта компании.
+
+Конвертер кэшируется на процесс; любое изменение dino.currency.rate
+(create/write/unlink модели) и синхронизация системных курсов (nbu_service)
+вызывают invalidate(), что меняет версию в ir.config_parameter и заставляет
+все воркеры перечитать курсы.
+"""
+import logging
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_logger = logging.getLogger(__name__)
+
+VERSION_PARAM = 'dino_finance.currency_rate_version'
+BASE_CURRENCY = 'UAH'   # база курсов dino.currency.rate
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class RateNotFound(LookupError):
+    """Нет курса валюты на дату или раньше."""
+
+
+def _ordinal(day):
+    if isinstance(day, datetime):
+        return day.date().toordinal()
+    if isinstance(day, date):
+        return day.toordinal()
+    return date.fromisoformat(str(day)[:10]).toordinal()
+
+
+class RateTable:
+    """Курсы одной валюты: отсортированные даты (ordinal) и курсы."""
+
+    __slots__ = ('dates', 'rates', '_np_dates', '_np_rates')
+
+    def __init__(self, dates=(), rates=()):
+        self.dates = array('l', dates)
+        self.rates = array('d', rates)
+        self._np_dates = self._np_rates = None
+
+    def append(self, day, rate):
+        """Добавление в порядке возрастания даты (повтор даты заменяет курс)."""
+        ordinal = _ordinal(day)
+        self._np_dates = self._np_rates = None
+        if self.dates and self.dates[-1] == ordinal:
+            self.rates[-1] = rate
+            return
+        if self.dates and self.dates[-1] > ordinal:
+            raise ValueError("RateTable.append: dates must be ascending")
+        self.dates.append(ordinal)
+        self.rates.append(rate)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rate_at(self, day):
+        """Курс на дату или ближайшую раньше, None - если дата раньше первого курса."""
+        index = bisect_right(self.dates, _ordinal(day)) - 1
+        return self.rates[index] if index >= 0 else None
+
+    def rates_at(self, ordinals):
+        """Курсы на много дат (ordinal); nan - если курса нет."""
+        if numpy is not None:
+            if self._np_dates is None:
+                self._np_dates = numpy.frombuffer(self.dates, dtype=numpy.dtype(self.dates.typecode))
+                self._np_rates = numpy.append(numpy.frombuffer(self.rates, dtype=numpy.float64), numpy.nan)
+            index = numpy.searchsorted(self._np_dates, numpy.asarray(ordinals), side='right') - 1
+            # -1 (раньше первого курса) указывает на добавленный в конец nan
+            return self._np_rates[index]
+        nan = float('nan')
+        return [self.rates[i] if i >= 0 else nan
+                for i in (bisect_right(self.dates, ordinal) - 1 for ordinal in ordinals)]
+
+
+class CurrencyConverter:
+    """
+    Пересчет по таблицам курсов {currency_id: RateTable}.
+    Курс базовой валюты всегда 1.
+    """
+
+    def __init__(self, tables, base_currency_id):
+        self.tables = tables
+        self.base_currency_id = base_currency_id
+
+    def rate(self, currency_id, day):
+        """Стоимость единицы валюты в базовой валюте на дату."""
+        if currency_id == self.base_currency_id:
+            return 1.0
+        table = self.tables.get(currency_id)
+        value = table.rate_at(day) if table else None
+        if value is None:
+            raise RateNotFound(f"No rate for currency {currency_id} on or before {day}")
+        return value
+
+    def convert(self, amount, from_currency_id, to_currency_id, day):
+        if from_currency_id == to_currency_id:
+            return amount
+        return amount * self.rate(from_currency_id, day) / self.rate(to_currency_id, day)
+
+    def _rates_many(self, currency_ids, ordinals):
+        """Курсы для пар (валюта, дата): один поиск по вектору дат на каждую валюту."""
+        positions = {}
+        for i, currency_id in enumerate(currency_ids):
+            positions.setdefault(currency_id, []).append(i)
+
+        result = [1.0] * len(ordinals)
+        for currency_id, indexes in positions.items():
+            if currency_id == self.base_currency_id:
+                continue
+            table = self.tables.get(currency_id)
+            if table is None:
+                raise RateNotFound(f"No rates for currency {currency_id}")
+            values = table.rates_at([ordinals[i] for i in indexes])
+            for i, value in zip(indexes, values):
+                if value != value:  # nan
+                    raise RateNotFound(f"No rate for currency {currency_id} on or before {date.fromordinal(ordinals[i])}")
+                result[i] = float(value)
+        return result
+
+    def convert_many(self, amounts, from_currency_ids, to_currency_id, days):
+        """
+        Пакетный пересчет: amounts[i] в валюте from_currency_ids[i] на дату days[i]
+        в валюту to_currency_id. from_currency_ids и days могут быть одним значением
+        для всех сумм. Возвращает список float.
+        """
+        amounts = list(amounts)
+        count = len(amounts)
+        if not isinstance(from_currency_ids, (list, tuple)):
+            from_currency_ids = [from_currency_ids] * count
+        if isinstance(days, (str, date)):
+            ordinals = [_ordinal(days)] * count
+        else:
+            ordinals = [_ordinal(day) for day in days]
+
+        from_rates = self._rates_many(from_currency_ids, ordinals)
+        to_rates = self._rates_many([to_currency_id] * count, ordinals)
+        return [
+            amount if currency_id == to_currency_id else amount * from_rate / to_rate
+            for amount, currency_id, from_rate, to_rate in zip(amounts, from_currency_ids, from_rates, to_rates)
+        ]
+
+    @classmethod
+    def from_rows(cls, rows, base_currency_id, invert=False):
+        """Строки (currency_id, date, rate), отсортированные по валюте и дате."""
+        tables = {}
+        for currency_id, day, rate in rows:
+            if not rate:
+                continue
+            table = tables.get(currency_id)
+            if table is None:
+                table = tables[currency_id] = RateTable()
+            table.append(day, 1.0 / rate if invert else rate)
+        return cls(tables, base_currency_id)
+
+
+def load_converter(env, source='nbu', rate_type='official'):
+    """Загружает курсы источника одним запросом."""
+    if source == 'system':
+        # res.currency.rate: единиц валюты за единицу валюты компании; курс компании
+        # перекрывает общий (company_id IS NULL) - он идет позже в сортировке
+        env['res.currency.rate'].flush_model(['currency_id', 'name', 'rate', 'company_id'])
+        env.cr.execute("""
+            SELECT currency_id, name, rate
+              FROM res_currency_rate
+             WHERE (company_id = %s OR company_id IS NULL) AND rate > 0
+             ORDER BY currency_id, name, company_id NULLS FIRST
+        """, (env.company.id,))
+        converter = CurrencyConverter.from_rows(env.cr.fetchall(), env.company.currency_id.id, invert=True)
+    else:
+        env['dino.currency.rate'].flush_model(['currency_id', 'date', 'rate', 'source', 'rate_type'])
+        env.cr.execute("""
+            SELECT currency_id, date, rate
+              FROM dino_currency_rate
+             WHERE source = %s AND rate_type = %s AND rate > 0
+             ORDER BY currency_id, date, id
+        """, (source, rate_type))
+        base = env['res.currency'].with_context(active_test=False).search([('name', '=', BASE_CURRENCY)], limit=1)
+        converter = CurrencyConverter.from_rows(env.cr.fetchall(), base.id)
+
+    _logger.info(f"CurrencyConverter: loaded {source}/{rate_type}: "
+                 f"{len(converter.tables)} currencies, {sum(len(t) for t in converter.tables.values())} rates")
+    return converter
+
+
+def get_converter(env, source='nbu', rate_type='official'):
+    """Конвертер из кэша процесса; перечитывается после invalidate()."""
+    version = env['ir.config_parameter'].sudo().get_param(VERSION_PARAM, '0')
+    company_id = env.company.id if source == 'system' else None
+    key = (env.cr.dbname, source, rate_type, company_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+    converter = load_converter(env, source, rate_type)
+    with _cache_lock:
+        _cache[key] = (version, converter)
+    return converter
+
+
+def invalidate(env):
+    """Сбрасывает кэш конвертеров во всех воркерах (новая версия в ir.config_parameter)."""
+    params = env['ir.config_parameter'].sudo()
+    params.set_param(VERSION_PARAM, str(int(params.get_param(VERSION_PARAM, '0') or 0) + 1))
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == env.cr.dbname]:
+            del _cache[key]
+# End of file finance/services/currency_converter.py
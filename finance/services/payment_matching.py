@@ -0,0 +1,211 @@
+#
+#  -*- File: finance/services/payment_matching.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Сопоставление банковских транзакций с открытыми платежами проектов и
+документами (без Odoo).
+
+MatchIndex строится один раз на прогон импорта по открытым кандидатам
+(платежи dino.project.payment без транзакции, документы
+dino.operation.document) и хранит хэш-индексы по парам признаков:
+
+  - (ЕДРПОУ/партнер, валюта и сумма в копейках со знаком);
+  - (ЕДРПОУ/партнер, номер документа);
+  - (валюта и сумма в копейках со знаком, номер документа).
+
+Суммы сравниваются со знаком транзакции: поступление (+) - с платежами
+проекта, списание (-) - с документами поставщиков (их сумма передается
+отрицательной). Кандидат с другим направлением или в другой валюте не
+сопоставляется вовсе.
+
+Номера документов ищутся в назначении платежа (токены с цифрами), поэтому
+транзакция проверяется несколькими поисками в словарях - без перебора всех
+кандидатов. Кандидат, найденный хотя бы по одному ключу, получает оценку:
+
+    партнер 0.35 + сумма 0.35 + номер 0.3 + близость даты до 0.1 (max 1.0)
+
+Кандидаты дальше DATE_WINDOW_DAYS от даты транзакции отбрасываются, если
+номер документа не совпал. Оценка >= AUTO_SCORE при отрыве от второго
+кандидата не меньше AUTO_MARGIN - автоматическая привязка, от REVIEW_SCORE -
+предложение в очередь проверки.
+"""
+import re
+from collections import defaultdict, namedtuple
+
+DATE_WINDOW_DAYS = 10
+AUTO_SCORE = 0.9
+AUTO_MARGIN = 0.1
+REVIEW_SCORE = 0.5
+MAX_PROPOSALS = 3
+
+WEIGHT_PARTNER = 0.35
+WEIGHT_AMOUNT = 0.35
+WEIGHT_NUMBER = 0.3
+WEIGHT_DATE = 0.1
+
+# kind - 'payment' | 'document'; edrpou, number и currency_id могут быть пустыми
+# amount - со знаком движения денег: + поступление, - списание
+Candidate = namedtuple('Candidate', 'kind id partner_id edrpou amount date number project_id currency_id',
+                       defaults=(None,))
+Transaction = namedtuple('Transaction', 'id partner_id edrpou amount date description currency_id',
+                         defaults=(None,))
+Match = namedtuple('Match', 'candidate score reasons')
+
+_TOKEN_RE = re.compile(r'[0-9A-Za-zА-Яа-яІіЇїЄєҐґ/\\-]*\d[0-9A-Za-zА-Яа-яІіЇїЄєҐґ/\\-]*')
+_NUMBER_PREFIX_RE = re.compile(r'^(?:№|N|#)+', re.IGNORECASE)
+
+
+def cents(amount):
+    """Сумма -> целые копейки со знаком."""
+    return int(round((amount or 0.0) * 100))
+
+
+def amount_key(amount, currency_id):
+    """Ключ суммы в индексе: валюта + копейки со знаком."""
+    return currency_id, cents(amount)
+
+
+def normalize_number(number):
+    """
+    Номер документа -> ключ: верхний регистр, без пробелов, префиксов №/N/#
+    и ведущих нулей. Номера без цифр не индексируются (None).
+    """
+    if not number:
+        return None
+    value = _NUMBER_PREFIX_RE.sub('', re.sub(r'\s+', '', str(number))).strip('-/\\.').upper()
+    if not any(ch.isdigit() for ch in value):
+        return None
+    return value.lstrip('0') or '0'
+
+
+def description_numbers(description):
+    """Множество нормализованных номеров, упомянутых в назначении платежа."""
+    if not description:
+        return set()
+    numbers = set()
+    for token in _TOKEN_RE.findall(description):
+        number = normalize_number(token)
+        if number:
+            numbers.add(number)
+    return numbers
+
+
+def _partner_keys(partner_id, edrpou):
+    keys = []
+    if edrpou:
+        keys.append(('edrpou', edrpou.strip()))
+    if partner_id:
+        keys.append(('partner', partner_id))
+    return keys
+
+
+class MatchIndex:
+    """Хэш-индексы открытых кандидатов; кандидат, привязанный авто, выбывает."""
+
+    def __init__(self, candidates=(), date_window=DATE_WINDOW_DAYS):
+        self.date_window = date_window
+        self._by_partner_amount = defaultdict(list)
+        self._by_partner_number = defaultdict(list)
+        self._by_amount_number = defaultdict(list)
+        self._consumed = set()
+        self._size = 0
+        for candidate in candidates:
+            self.add(candidate)
+
+    def __len__(self):
+        return self._size - len(self._consumed)
+
+    def add(self, candidate):
+        amount = amount_key(candidate.amount, candidate.currency_id)
+        number = normalize_number(candidate.number)
+        for key in _partner_keys(candidate.partner_id, candidate.edrpou):
+            self._by_partner_amount[key, amount].append(candidate)
+            if number:
+                self._by_partner_number[key, number].append(candidate)
+        if number:
+            self._by_amount_number[amount, number].append(candidate)
+        self._size += 1
+
+    def consume(self, candidate):
+        self._consumed.add((candidate.kind, candidate.id))
+
+    def _lookup(self, transaction, numbers):
+        amount = amount_key(transaction.amount, transaction.currency_id)
+        found = {}
+        for key in _partner_keys(transaction.partner_id, transaction.edrpou):
+            for candidate in self._by_partner_amount.get((key, amount), ()):
+                found[candidate.kind, candidate.id] = candidate
+            for number in numbers:
+                for candidate in self._by_partner_number.get((key, number), ()):
+                    found[candidate.kind, candidate.id] = candidate
+        for number in numbers:
+            for candidate in self._by_amount_number.get((amount, number), ()):
+                found[candidate.kind, candidate.id] = candidate
+        return [c for key, c in found.items() if key not in self._consumed]
+
+    def _score(self, transaction, candidate, numbers):
+        # Поступление не закрывает документ поставщика, USD - платеж в UAH
+        if (transaction.amount or 0.0) * (candidate.amount or 0.0) < 0:
+            return None
+        if transaction.currency_id and candidate.currency_id and transaction.currency_id != candidate.currency_id:
+            return None
+        score = 0.0
+        reasons = []
+        if (transaction.edrpou and candidate.edrpou and transaction.edrpou.strip() == candidate.edrpou.strip()) \
+                or (transaction.partner_id and transaction.partner_id == candidate.partner_id):
+            score += WEIGHT_PARTNER
+            reasons.append('partner')
+        if cents(transaction.amount) == cents(candidate.amount):
+            score += WEIGHT_AMOUNT
+            reasons.append('amount')
+        number = normalize_number(candidate.number)
+        number_hit = bool(number and number in numbers)
+        if number_hit:
+            score += WEIGHT_NUMBER
+            reasons.append('number')
+        if transaction.date and candidate.date:
+            days = abs((transaction.date - candidate.date).days)
+            if days > self.date_window and not number_hit:
+                return None
+            if days <= self.date_window:
+                score += WEIGHT_DATE * (1.0 - days / (self.date_window + 1.0))
+                reasons.append('date')
+        return Match(candidate, round(min(score, 1.0), 4), reasons)
+
+    def match(self, transaction, review_score=REVIEW_SCORE):
+        """Кандидаты транзакции с оценкой >= review_score, лучшие первыми."""
+        numbers = description_numbers(transaction.description)
+        matches = []
+        for candidate in self._lookup(transaction, numbers):
+            match = self._score(transaction, candidate, numbers)
+            if match and match.score >= review_score:
+                matches.append(match)
+        matches.sort(key=lambda m: (-m.score, m.candidate.kind, m.candidate.id))
+        return matches
+
+
+def match_transactions(index, transactions, auto_score=AUTO_SCORE, review_score=REVIEW_SCORE,
+                       max_proposals=MAX_PROPOSALS):
+    """
+    Сопоставляет пачку транзакций за один проход.
+    Возвращает [(transaction, matches, auto)]: auto=True - первый кандидат
+    привязывается автоматически (и выбывает из индекса для следующих
+    транзакций), иначе matches - предложения для проверки. Транзакции без
+    кандидатов в результат не попадают.
+    """
+    results = []
+    for transaction in transactions:
+        matches = index.match(transaction, review_score=review_score)
+        if not matches:
+            continue
+        best = matches[0]
+        runner_up = matches[1].score if len(matches) > 1 else 0.0
+        auto = best.score >= auto_score and best.score - runner_up >= AUTO_MARGIN
+        if auto:
+            index.consume(best.candidate)
+            results.append((transaction, [best], True))
+        else:
+            results.append((transaction, matches[:max_proposals], False))
+    return results
+# End of file finance/services/payment_matching.py
@@ -0,0 +1,51 @@
+#
+#  -*- File: finance/services/raw_payload.py -*-
+#
+# -*- coding: utf-8 -*-
+"""
+Компактное хранение сырых ответов банковых API (dino.bank.transaction.raw).
+
+Ответ приводится к каноническому JSON (ключи отсортированы, без пробелов)
+и сжимается zlib. Старые записи хранили repr() словаря Python
+(`str(t)` в импорте Привата) - to_canonical_json понимает и их.
+"""
+import ast
+import json
+import zlib
+
+COMPRESS_LEVEL = 9
+
+
+def to_canonical_json(data):
+    """
+    dict/list, JSON строка или repr() словаря Python -> канонический JSON.
+    Нераспознанная строка сохраняется как JSON строка (ничего не теряем).
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    if isinstance(data, str):
+        text = data.strip()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            try:
+                data = ast.literal_eval(text)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                data = text
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def pack(data):
+    """Данные -> сжатый канонический JSON (bytes для bytea)."""
+    return zlib.compress(to_canonical_json(data).encode('utf-8'), COMPRESS_LEVEL)
+
+
+def unpack(payload, indent=2):
+    """Сжатый JSON -> читаемый JSON для формы (пустая строка, если данных нет)."""
+    if not payload:
+        return ''
+    text = zlib.decompress(bytes(payload)).decode('utf-8')
+    if indent is None:
+        return text
+    return json.dumps(json.loads(text), indent=indent, ensure_ascii=False, sort_keys=True)
+# End of file finance/services/raw_payload.py
@@ -42,11 +42,12 @@ class NextcloudConnection(models.Model):
         else:
             url = path
 
+        from ..api_integration.services.http_sessions import get_session
         try:
-            response = requests.request(
+            # WebDAV PUT/DELETE/MKCOL не повторяем автоматически (retries=0)
+            response = get_session(self.url, auth=(self.username, self.password), retries=0).request(
                 method, 
                 url, 
-                auth=(self.username, self.password), 
                 data=data, 
                 headers=headers,
                 timeout=30
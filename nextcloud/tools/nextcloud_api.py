@@ -1,6 +1,5 @@
 # -*- File: nextcloud/tools/nextcloud_api.py -*-
 import logging
-import requests
 import os
 from lxml import etree
 from urllib.parse import unquote
@@ -53,12 +52,15 @@ class NextcloudConnector:
         if isinstance(data, str):
             data = data.encode('utf-8')
 
-        response = requests.request(
+        # Общая keep-alive сессия пула: без нового TLS handshake на каждый запрос
+        from ...api_integration.services.http_sessions import get_session
+        # Без автоповторов: PUT/DELETE WebDAV не идемпотентны при таймауте
+        session = get_session(self.url, auth=self.auth, retries=0)
+        response = session.request(
             method=method,
             url=url,
             headers=headers,
             data=data,
-            auth=self.auth,
             timeout=20
         )
         return response
@@ -91,6 +91,37 @@ class DinoPartnerNomenclature(models.Model):
         
         return nomenclature
 
+    @api.model
+    def find_or_create_multi(self, partner_id, uom_by_name):
+        """
+        Batch version of find_or_create for one partner: one search, missing items created together
+
+        :param partner_id: ID контрагента
+        :param uom_by_name: dict {supplier item name: uom ID or None}
+        :return: dict {supplier item name: dino.partner.nomenclature record}
+        """
+        names = [name for name in uom_by_name if name]
+        if not partner_id or not names:
+            return {}
+
+        nomenclatures = {}
+        for nomenclature in self.search([('partner_id', '=', partner_id), ('name', 'in', names)]):
+            nomenclatures.setdefault(nomenclature.name, nomenclature)
+
+        vals_list = []
+        for name in names:
+            if name in nomenclatures:
+                continue
+            vals = {'partner_id': partner_id, 'name': name}
+            if uom_by_name[name]:
+                vals['dino_uom_id'] = uom_by_name[name]
+                vals['warehouse_uom_id'] = uom_by_name[name]  # Default to same unit
+            vals_list.append(vals)
+        if vals_list:
+            for nomenclature in self.create(vals_list):
+                nomenclatures[nomenclature.name] = nomenclature
+        return nomenclatures
+
     def unlink(self):
         """Prevent deletion if there are linked documents"""
         for record in self:
@@ -9,6 +9,7 @@ import requests
 
 from odoo import models, fields, _, api
 from odoo.osv.expression import expression
+from odoo.addons.dino_erp.core.mixins.related_count_mixin import related_count
 
 _logger = logging.getLogger(__name__)
 
@@ -17,7 +18,14 @@ class DinoPartner(models.Model):
     _name = 'dino.partner'
     _description = 'Partner'
     _rec_name = 'name'
-    _inherit = ['mail.thread', 'mail.activity.mixin', 'mixin.auto.translate']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'mixin.auto.translate', 'mixin.related.count']
+    _related_counts = {
+        'project_count': ('dino.project', 'partner_id'),
+        'partner_nomenclature_count': ('dino.partner.nomenclature', 'partner_id'),
+        'document_count': ('dino.operation.document', 'partner_id'),
+        'transaction_count': ('dino.bank.transaction', 'partner_id'),
+        'bank_account_count': ('dino.partner.bank.account', 'partner_id'),
+    }
 
     name = fields.Char(string='Name', required=True, translate=True, tracking=True)
     full_name = fields.Char(string='Full Name', translate=True)
@@ -26,7 +34,7 @@ class DinoPartner(models.Model):
     
     # Банковские счета (через отдельную модель)
     bank_account_ids = fields.One2many('dino.partner.bank.account', 'partner_id', string='Bank Accounts')
-    bank_account_count = fields.Integer('Bank Accounts', compute='_compute_bank_account_count')
+    bank_account_count = fields.Integer('Bank Accounts', compute=related_count('bank_account_count'))
     default_bank_account_id = fields.Many2one('dino.partner.bank.account', string='Default Account', compute='_compute_default_bank_account', store=False)
     
     address = fields.Char(string='Address', translate=True)
@@ -48,26 +56,17 @@ class DinoPartner(models.Model):
     contact_ids = fields.One2many('dino.partner.contact', 'partner_id', string='Contacts')
 
     project_ids = fields.One2many('dino.project', 'partner_id', string='Projects')
-    project_count = fields.Integer(string='Number of Projects', compute='_compute_project_count')
+    project_count = fields.Integer(string='Number of Projects', compute=related_count('project_count'))
 
     partner_nomenclature_ids = fields.One2many('dino.partner.nomenclature', 'partner_id', string='Nomenclature Mapping')
-    partner_nomenclature_count = fields.Integer(string='Nomenclature', compute='_compute_partner_nomenclature_count')
+    partner_nomenclature_count = fields.Integer(string='Nomenclature', compute=related_count('partner_nomenclature_count'))
 
     document_ids = fields.One2many('dino.operation.document', 'partner_id', string='Documents')
-    document_count = fields.Integer(string='Number of Documents', compute='_compute_document_count')
+    document_count = fields.Integer(string='Number of Documents', compute=related_count('document_count'))
 
     transaction_ids = fields.One2many('dino.bank.transaction', 'partner_id', string='Bank Transactions')
-    transaction_count = fields.Integer(string='Number of Transactions', compute='_compute_transaction_count')
+    transaction_count = fields.Integer(string='Number of Transactions', compute=related_count('transaction_count'))
 
-    def _compute_partner_nomenclature_count(self):
-        for rec in self:
-            rec.partner_nomenclature_count = self.env['dino.partner.nomenclature'].search_count([('partner_id', '=', rec.id)])
-    
-    def _compute_bank_account_count(self):
-        """Подсчет количества банковских счетов"""
-        for rec in self:
-            rec.bank_account_count = len(rec.bank_account_ids)
-    
     def _compute_default_bank_account(self):
         """Получить основной банковский счет"""
         for rec in self:
@@ -87,10 +86,6 @@ class DinoPartner(models.Model):
     # Partner type toggles (legacy booleans kept for compatibility)
     partner_is_customer = fields.Boolean(string='Customer', default=False)
 
-    def _compute_project_count(self):
-        for rec in self:
-            rec.project_count = self.env['dino.project'].search_count([('partner_id', '=', rec.id)])
-
     def action_view_projects(self):
         self.ensure_one()
         return {
@@ -102,14 +97,6 @@ class DinoPartner(models.Model):
             'context': {'default_partner_id': self.id},
         }
 
-    def _compute_document_count(self):
-        for rec in self:
-            rec.document_count = self.env['dino.operation.document'].search_count([('partner_id', '=', rec.id)])
-
-    def _compute_transaction_count(self):
-        for rec in self:
-            rec.transaction_count = self.env['dino.bank.transaction'].search_count([('partner_id', '=', rec.id)])
-
     def action_view_transactions(self):
         self.ensure_one()
         return {
@@ -2,5 +2,6 @@ from . import dino_project_category
 from . import dino_project_type
 from . import dino_project
 from . import dino_project_payment
+from . import dino_payment_match
 
 # -*- End of projects/models/__init__.py -*-
@@ -0,0 +1,199 @@
+#
+#  -*- File: projects/models/dino_payment_match.py -*-
+#
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+from odoo.addons.dino_erp.finance.services import payment_matching
+
+_logger = logging.getLogger(__name__)
+
+# Transactions per matching pass (one search_fetch + one create)
+_MATCH_BATCH = 2000
+
+
+class DinoPaymentMatch(models.Model):
+    """
+    Transaction-to-payment matching results and the review queue.
+
+    `match_transactions()` runs after a bank import: it indexes the open
+    project payments and operation documents once (see
+    `finance/services/payment_matching.py`) and scores every unmatched
+    transaction against them. Confident unique matches are linked right
+    away (state 'auto'), the rest are left as proposals for the accountant.
+    """
+    _name = 'dino.payment.match'
+    _description = _('Payment Match')
+    _order = 'state, score desc, id desc'
+
+    transaction_id = fields.Many2one('dino.bank.transaction', string=_('Transaction'), required=True,
+                                     ondelete='cascade', index=True)
+    payment_id = fields.Many2one('dino.project.payment', string=_('Project Payment'), ondelete='cascade', index=True)
+    document_id = fields.Many2one('dino.operation.document', string=_('Document'), ondelete='cascade', index=True)
+    project_id = fields.Many2one('dino.project', string=_('Project'), index=True)
+    partner_id = fields.Many2one('dino.partner', string=_('Partner'))
+    score = fields.Float(string=_('Confidence'), digits=(3, 2), help=_("0..1, see payment_matching weights"))
+    reasons = fields.Char(string=_('Matched By'))
+    state = fields.Selection([
+        ('proposed', 'To Review'),
+        ('auto', 'Auto Matched'),
+        ('confirmed', 'Confirmed'),
+        ('rejected', 'Rejected'),
+    ], string=_('Status'), default='proposed', required=True, index=True)
+
+    transaction_date = fields.Datetime(related='transaction_id.datetime', string=_('Transaction Date'))
+    transaction_amount = fields.Monetary(related='transaction_id.amount', string=_('Transaction Amount'),
+                                         currency_field='currency_id')
+    transaction_description = fields.Text(related='transaction_id.description', string=_('Purpose'))
+    currency_id = fields.Many2one(related='transaction_id.currency_id')
+
+    _sql_constraints = [
+        ('payment_or_document', 'CHECK(payment_id IS NOT NULL OR document_id IS NOT NULL)',
+         'A match must point to a project payment or a document!'),
+    ]
+
+    # ------------------------------------------------------------------
+    # Review
+    # ------------------------------------------------------------------
+
+    def action_confirm(self):
+        """Link the transactions; other proposals of the same transaction are rejected."""
+        if len(self.transaction_id) != len(self):
+            raise UserError(_("Only one match per transaction can be confirmed."))
+        self._apply()
+        self.write({'state': 'confirmed'})
+        self.search([
+            ('transaction_id', 'in', self.transaction_id.ids),
+            ('id', 'not in', self.ids),
+            ('state', '=', 'proposed'),
+        ]).write({'state': 'rejected'})
+
+    def action_reject(self):
+        self._unlink_payments()
+        self.write({'state': 'rejected'})
+
+    def _apply(self):
+        for match in self:
+            if match.payment_id:
+                if match.payment_id.transaction_id and match.payment_id.transaction_id != match.transaction_id:
+                    raise UserError(_("Payment %s is already linked to another transaction.") % match.payment_id.name)
+                match.payment_id.transaction_id = match.transaction_id
+            if match.partner_id and not match.transaction_id.partner_id:
+                match.transaction_id.partner_id = match.partner_id
+
+    def _unlink_payments(self):
+        for match in self.filtered(lambda m: m.state == 'auto' and m.payment_id):
+            if match.payment_id.transaction_id == match.transaction_id:
+                match.payment_id.transaction_id = False
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def _unmatched_transaction_ids(self, domain):
+        """Transactions of the domain without any match row and not linked to a payment."""
+        transactions = self.env['dino.bank.transaction'].search(domain)
+        if not transactions:
+            return []
+        self.flush_model(['transaction_id'])
+        self.env['dino.project.payment'].flush_model(['transaction_id'])
+        self.env.cr.execute("""
+            SELECT t.id
+              FROM unnest(%s::int[]) AS t(id)
+             WHERE NOT EXISTS (SELECT 1 FROM dino_payment_match m WHERE m.transaction_id = t.id)
+               AND NOT EXISTS (SELECT 1 FROM dino_project_payment p WHERE p.transaction_id = t.id)
+             ORDER BY t.id
+        """, [transactions.ids])
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _load_candidates(self, date_from, date_to):
+        """Open payments and documents dated inside [date_from, date_to]."""
+        payments = self.env['dino.project.payment'].search_fetch([
+            ('transaction_id', '=', False),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+        ], ['date', 'number', 'amount', 'currency_id', 'project_id', 'partner_id'])
+        matched_documents = self.search([('document_id', '!=', False), ('state', 'in', ('auto', 'confirmed'))]).document_id
+        documents = self.env['dino.operation.document'].search_fetch([
+            ('state', 'in', ('ready', 'done')),
+            ('amount_total', '>', 0),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+            ('id', 'not in', matched_documents.ids),
+        ], ['date', 'number', 'amount_total', 'currency_id', 'project_id', 'partner_id'])
+        # EDRPOU of all partners in one read
+        (payments.partner_id | documents.partner_id).fetch(['egrpou'])
+
+        # Project payments are incoming (signed as entered), documents are supplier bills - outgoing
+        candidates = [
+            payment_matching.Candidate('payment', p.id, p.partner_id.id, p.partner_id.egrpou, p.amount,
+                                       p.date, p.number, p.project_id.id, p.currency_id.id)
+            for p in payments
+        ]
+        candidates += [
+            payment_matching.Candidate('document', d.id, d.partner_id.id, d.partner_id.egrpou, -d.amount_total,
+                                       d.date, d.number, d.project_id.id, d.currency_id.id)
+            for d in documents
+        ]
+        return candidates
+
+    @api.model
+    def match_transactions(self, domain):
+        """
+        Match the unmatched transactions of `domain`.
+        Returns {'transactions', 'auto', 'proposed'} counters.
+        """
+        stats = {'transactions': 0, 'auto': 0, 'proposed': 0}
+        transaction_ids = self._unmatched_transaction_ids(domain)
+        if not transaction_ids:
+            return stats
+
+        Transaction = self.env['dino.bank.transaction']
+        window = payment_matching.DATE_WINDOW_DAYS
+        self.env.cr.execute("SELECT min(datetime)::date, max(datetime)::date FROM dino_bank_transaction WHERE id = ANY(%s)",
+                            [transaction_ids])
+        date_min, date_max = self.env.cr.fetchone()
+        index = payment_matching.MatchIndex(
+            self._load_candidates(fields.Date.subtract(date_min, days=window), fields.Date.add(date_max, days=window)),
+            date_window=window,
+        )
+        _logger.info(f"Сопоставление платежей: {len(transaction_ids)} транзакций, {len(index)} открытых платежей/документов")
+        if not len(index):
+            return stats
+
+        for start in range(0, len(transaction_ids), _MATCH_BATCH):
+            batch = Transaction.browse(transaction_ids[start:start + _MATCH_BATCH])
+            batch.fetch(['partner_id', 'counterparty_edrpou', 'amount', 'currency_id', 'datetime', 'description'])
+            results = payment_matching.match_transactions(index, [
+                payment_matching.Transaction(t.id, t.partner_id.id, t.counterparty_edrpou, t.amount,
+                                             t.datetime.date() if t.datetime else None, t.description,
+                                             t.currency_id.id)
+                for t in batch
+            ])
+            vals_list = []
+            for transaction, matches, auto in results:
+                for match in matches:
+                    candidate = match.candidate
+                    vals_list.append({
+                        'transaction_id': transaction.id,
+                        'payment_id': candidate.id if candidate.kind == 'payment' else False,
+                        'document_id': candidate.id if candidate.kind == 'document' else False,
+                        'project_id': candidate.project_id or False,
+                        'partner_id': candidate.partner_id or False,
+                        'score': match.score,
+                        'reasons': ', '.join(match.reasons),
+                        'state': 'auto' if auto else 'proposed',
+                    })
+            created = self.create(vals_list)
+            auto_matches = created.filtered(lambda m: m.state == 'auto')
+            auto_matches._apply()
+            stats['transactions'] += len(batch)
+            stats['auto'] += len(auto_matches)
+            stats['proposed'] += len(created) - len(auto_matches)
+
+        _logger.info(f"Сопоставление платежей: автоматически {stats['auto']}, на проверку {stats['proposed']}")
+        return stats
+# End of file projects/models/dino_payment_match.py
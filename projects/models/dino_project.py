@@ -1,14 +1,19 @@
 # -*- File: projects/models/dino_project.py -*-
 import logging
 from odoo import api, fields, models, _
+from odoo.addons.dino_erp.core.mixins.related_count_mixin import related_count
 from odoo.addons.dino_erp.nextcloud.tools.nextcloud_api import NextcloudConnector
 
 _logger = logging.getLogger(__name__)
 
 class DinoProject(models.Model):
     _name = 'dino.project'
-    _inherit = ['mail.thread', 'mail.activity.mixin', 'nextcloud.file.project.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'nextcloud.file.project.mixin', 'mixin.related.count']
     _description = _('Project')
+    _related_counts = {
+        'document_count': ('dino.operation.document', 'project_id'),
+        'payment_count': ('dino.project.payment', 'project_id'),
+    }
 
     name = fields.Char(string=_('Project Name'), required=True)
     date = fields.Date(string=_('Date'), required=True, default=fields.Date.today)
@@ -29,11 +34,11 @@ class DinoProject(models.Model):
 
     # Documents link
     document_ids = fields.One2many('dino.operation.document', 'project_id', string='Documents')
-    document_count = fields.Integer(string='Documents Count', compute='_compute_document_count')
+    document_count = fields.Integer(string='Documents Count', compute=related_count('document_count'))
 
     # Payments link
     payment_ids = fields.One2many('dino.project.payment', 'project_id', string=_('Payments'))
-    payment_count = fields.Integer(string=_('Payments Count'), compute='_compute_payment_count')
+    payment_count = fields.Integer(string=_('Payments Count'), compute=related_count('payment_count'))
 
     # VAT rate
     vat_rate = fields.Float(string='VAT Rate (%)', related='partner_id.tax_system_id.vat_rate', readonly=True)
@@ -62,17 +67,6 @@ class DinoProject(models.Model):
             'file_id': new_id
         })
 
-    def _compute_document_count(self):
-        for rec in self:
-            if 'dino.operation.document' in self.env:
-                rec.document_count = self.env['dino.operation.document'].search_count([('project_id', '=', rec.id)])
-            else:
-                rec.document_count = 0
-
-    def _compute_payment_count(self):
-        for rec in self:
-            rec.payment_count = self.env['dino.project.payment'].search_count([('project_id', '=', rec.id)])
-
     def action_view_documents(self):
         self.ensure_one()
         return {
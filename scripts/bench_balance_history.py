@@ -0,0 +1,108 @@
+#
+#  -*- File: scripts/bench_balance_history.py -*-
+#
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк import_balance_history на записанном дампе истории балансов.
+
+Запуск в odoo shell (env доступен глобально):
+    BALANCE_DUMP=/path/to/privat_balance_1y.json \\
+        python3 odoo-bin shell -d dino24_dev < scripts/bench_balance_history.py
+
+Формат дампа - JSON список страниц, как их отдает /statements/balance:
+    [[{"acc": "...", "dpd": "01.01.2025 00:00:00", "balanceIn": "...", ...}, ...], ...]
+Если BALANCE_DUMP не задан - генерируется синтетический год по активным счетам.
+
+Выводит количество SQL запросов (cr.sql_log_count) и строк/сек для двух прогонов:
+первый - все записи новые (create), второй - повторный импорт (update).
+Для сравнения "до/после" запустите скрипт на предыдущем коммите.
+Все изменения откатываются.
+"""
+import json
+import os
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+
+def _synthetic_dump(accounts, days=365, page_size=100):
+    rows = []
+    start = date.today() - timedelta(days=days)
+    for acc in accounts:
+        balance = 1000.0
+        for i in range(days):
+            d = start + timedelta(days=i)
+            debit, credit = float(i % 7) * 10, float(i % 5) * 12
+            rows.append({
+                'acc': acc.external_id,
+                'dpd': d.strftime('%d.%m.%Y') + ' 00:00:00',
+                'balanceIn': balance,
+                'balanceOut': balance + credit - debit,
+                'turnoverDebt': debit,
+                'turnoverCred': credit,
+                'is_final_bal': True,
+            })
+            balance += credit - debit
+    return [rows[i:i + page_size] for i in range(0, len(rows), page_size)]
+
+
+class ReplayClient:
+    """Отдает страницы из дампа вместо похода в API."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_balance_history_generator(self, account_num=None, with_follow_id=False, **kwargs):
+        for page in self.pages:
+            yield (page, None) if with_follow_id else page
+
+    def iter_pages(self, generator_name, account_nums=None, prefetch=2, **kwargs):
+        return getattr(self, generator_name)(**kwargs)
+
+
+def run_bench():
+    from odoo.addons.dino_erp.api_integration.services import privat_balance_history
+
+    bank = env['dino.bank'].search([('mfo', '=', '305299')], limit=1)
+    accounts = env['dino.bank.account'].search([('bank_id', '=', bank.id), ('active', '=', True)])
+    if not bank or not accounts:
+        print("ОШИБКА: нужен ПриватБанк (МФО 305299) с активными счетами.")
+        return
+
+    dump_path = os.environ.get('BALANCE_DUMP')
+    if dump_path:
+        with open(dump_path, encoding='utf-8') as fh:
+            pages = json.load(fh)
+    else:
+        pages = _synthetic_dump(accounts.filtered('external_id'))
+    rows = sum(len(p) for p in pages)
+    print(f"Дамп: {len(pages)} страниц, {rows} записей")
+
+    endpoint = SimpleNamespace(
+        name='bench', bank_id=bank, start_date=date.today() - timedelta(days=366),
+        force_full_sync=True, auth_token='bench', auth_api_key=None,
+    )
+    original_get_client = privat_balance_history.get_client
+    privat_balance_history.get_client = lambda ep: ReplayClient(pages)
+    cr = env.cr
+    cr.execute('SAVEPOINT bench_balance_history')
+    try:
+        env['dino.bank.balance.history'].search([('bank_account_id', 'in', accounts.ids)]).unlink()
+        for label in ('create', 'update'):
+            queries_before = cr.sql_log_count
+            started = time.perf_counter()
+            result = privat_balance_history.import_balance_history(endpoint)
+            env.flush_all()
+            elapsed = time.perf_counter() - started
+            queries = cr.sql_log_count - queries_before
+            print(f"[{label}] {result['stats']}")
+            print(f"[{label}] {elapsed:.2f}s, {rows / elapsed:.0f} rows/s, "
+                  f"{queries} SQL queries ({queries / max(rows, 1):.3f} per row, {queries / max(len(pages), 1):.1f} per page)")
+    finally:
+        cr.execute('ROLLBACK TO SAVEPOINT bench_balance_history')
+        env.invalidate_all()
+        privat_balance_history.get_client = original_get_client
+
+run_bench()
+# End of file scripts/bench_balance_history.py
@@ -0,0 +1,169 @@
+#
+#  -*- File: scripts/bench_bank_imports.py -*-
+#
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пропускная способность банковых импортов без живых API.
+
+Запуск в odoo shell (env доступен глобально):
+    BENCH_SCALES=10000,100000 \\
+        python3 odoo-bin shell -d dino24_dev < scripts/bench_bank_imports.py
+
+Для каждого масштаба (строк) и импорта - import_transactions,
+import_balance_history, import_nbu_rates - выводит строк/сек, число SQL
+запросов (cr.sql_log_count), HTTP запросов и пиковый RSS процесса.
+
+Источник данных:
+  - по умолчанию SyntheticBank (N счетов x M дней x K операций в день);
+  - BENCH_RECORD=/path/session.json.gz - прогон против живых API настроенного
+    эндпоинта BENCH_ENDPOINT (id dino.api.endpoint) с записью сессии;
+  - BENCH_REPLAY=/path/session.json.gz - воспроизведение записанной сессии
+    (масштаб = сколько записано). Параметры запросов зависят от дат, поэтому
+    BENCH_DATE (YYYY-MM-DD) должен совпадать с днем записи.
+Параметры синтетики: BENCH_ACCOUNTS (10), BENCH_PER_DAY (50), BENCH_TARGETS
+(transactions,balances,nbu). Все изменения в БД откатываются.
+"""
+import os
+import resource
+import time
+from datetime import date, timedelta
+
+MAX_DAYS = 1095
+
+
+def _rss_mb():
+    # ru_maxrss на Linux - КБ; это пик процесса, а не текущий RSS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _shape(target, scale, min_accounts, per_day, currencies):
+    """
+    (счетов, дней, операций в день), дающие ~scale строк импорта target.
+    История счетов не глубже MAX_DAYS (API Привата отдает 3 года) - масштаб
+    набирается числом счетов; курсы НБУ - только числом дней.
+    """
+    if target == 'nbu':
+        return 1, max(1, scale // currencies), 1
+    rows_per_account_day = per_day if target == 'transactions' else 1
+    days = max(1, min(MAX_DAYS, scale // (min_accounts * rows_per_account_day)))
+    accounts = max(min_accounts, scale // (days * rows_per_account_day))
+    return accounts, days, rows_per_account_day
+
+
+def _bench_env(bank_name, accounts, days):
+    """Банк, счета и эндпоинт бенчмарка (создаются внутри savepoint)."""
+    uah = env.ref('base.UAH')
+    bank = env['dino.bank'].create({'name': bank_name, 'mfo': '999999'})
+    env['dino.bank.account'].create([{
+        'name': f"Bench {number[-4:]}",
+        'bank_id': bank.id,
+        'account_number': number,
+        'external_id': number,
+        'currency_id': uah.id,
+    } for number in accounts])
+    endpoint = env['dino.api.endpoint'].create({
+        'name': f"{bank_name} endpoint",
+        'bank_id': bank.id,
+        'operation_type': 'privat_transactions',
+        'auth_token': 'bench-token',
+        'start_date': date.today() - timedelta(days=days - 1),
+        'force_full_sync': True,
+    })
+    return endpoint
+
+
+def _measure(label, rows, func):
+    cr = env.cr
+    queries_before = cr.sql_log_count
+    started = time.perf_counter()
+    result = func()
+    env.flush_all()
+    elapsed = time.perf_counter() - started
+    queries = cr.sql_log_count - queries_before
+    stats = result.get('stats') if isinstance(result, dict) else None
+    if not rows and stats:
+        rows = sum(stats.get(key, 0) for key in ('created', 'updated', 'skipped'))
+    print(f"  [{label}] {rows} rows, {elapsed:.1f}s, {rows / max(elapsed, 1e-9):.0f} rows/s, "
+          f"{queries} SQL ({queries / max(rows, 1):.3f}/row), peak RSS {_rss_mb():.0f} MB")
+    if stats:
+        print(f"  [{label}] {stats}")
+
+
+def _run_targets(targets, endpoint, end, days, rows_hint):
+    from odoo.addons.dino_erp.api_integration.services import nbu_service, privat_balance_history, privat_service
+
+    start = end - timedelta(days=days - 1)
+    if 'transactions' in targets:
+        _measure('transactions', rows_hint['transactions'],
+                 lambda: privat_service.import_transactions(endpoint, startDate=start, rate_limit=1e6))
+    if 'balances' in targets:
+        _measure('balances', rows_hint['balances'],
+                 lambda: privat_balance_history.import_balance_history(endpoint, startDate=start, rate_limit=1e6))
+    if 'nbu' in targets:
+        _measure('nbu', rows_hint['nbu'],
+                 lambda: nbu_service.import_nbu_rates(env, start_date=start, end_date=end, overwrite=True))
+
+
+def _savepoint(name, func):
+    cr = env.cr
+    cr.execute(f'SAVEPOINT {name}')
+    try:
+        return func()
+    finally:
+        cr.execute(f'ROLLBACK TO SAVEPOINT {name}')
+        env.invalidate_all()
+
+
+def run_bench():
+    from odoo.addons.dino_erp.api_integration.services import http_replay
+    from odoo.addons.dino_erp.api_integration.services.synthetic_bank import NBU_CURRENCIES, SyntheticBank
+
+    targets = [t.strip() for t in os.environ.get('BENCH_TARGETS', 'transactions,balances,nbu').split(',') if t.strip()]
+    record_path = os.environ.get('BENCH_RECORD')
+    replay_path = os.environ.get('BENCH_REPLAY')
+    end = date.fromisoformat(os.environ.get('BENCH_DATE') or date.today().isoformat())
+
+    if record_path or replay_path:
+        endpoint = env['dino.api.endpoint'].browse(int(os.environ['BENCH_ENDPOINT']))
+        days = (end - endpoint.start_date).days + 1
+        no_hint = {t: 0 for t in targets}
+        if record_path:
+            print(f"Запись живой сессии {endpoint.name} за {days} дней -> {record_path}")
+            session = http_replay.recording(record_path)
+        else:
+            print(f"Воспроизведение {replay_path} ({endpoint.name}, {days} дней по {end})")
+            session = http_replay.replaying(replay_path)
+        with session as cassette:
+            _savepoint('bench_session', lambda: _run_targets(targets, endpoint, end, days, no_hint))
+        print(f"HTTP ответов в записи: {len(cassette)}")
+        return
+
+    min_accounts = int(os.environ.get('BENCH_ACCOUNTS', 10))
+    per_day = int(os.environ.get('BENCH_PER_DAY', 50))
+    scales = [int(s) for s in os.environ.get('BENCH_SCALES', '10000,100000,1000000').split(',') if s.strip()]
+    currencies = env['res.currency'].search([('name', 'in', [c[0] for c in NBU_CURRENCIES])]).mapped('name')
+    currencies = [c for c in NBU_CURRENCIES if c[0] in currencies] or list(NBU_CURRENCIES)
+
+    for scale in scales:
+        print(f"\n=== {scale} строк ===")
+        for target in targets:
+            accounts, days, target_per_day = _shape(target, scale, min_accounts, per_day, len(currencies))
+            bank = SyntheticBank(accounts=accounts, days=days, per_day=target_per_day, end=end, currencies=currencies)
+            rows = {
+                'transactions': bank.total_transactions(),
+                'balances': accounts * days,
+                'nbu': len(currencies) * days,
+            }
+
+            def _run():
+                endpoint = _bench_env(f"Bench {target} {scale}", bank.accounts, days)
+                with http_replay.use_transport(lambda adapter: bank):
+                    _run_targets([target], endpoint, end, days, rows)
+                print(f"  [{target}] HTTP requests {bank.requests}")
+
+            _savepoint('bench_bank_imports', _run)
+
+
+run_bench()
+# End of file scripts/bench_bank_imports.py
@@ -0,0 +1,88 @@
+#
+#  -*- File: scripts/bench_nbu_import.py -*-
+#
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк import_rates_to_dino на 5-летней мультивалютной истории НБУ.
+
+Запуск в odoo shell (env доступен глобально):
+    NBU_DUMP=/path/to/nbu_exchange_5y.json \\
+        python3 odoo-bin shell -d dino24_dev < scripts/bench_nbu_import.py
+
+Формат дампа - JSON список, как его отдает NBU /exchange:
+    [{"cc": "USD", "rate": 41.25, "exchangedate": "01.01.2025"}, ...]
+Если NBU_DUMP не задан - генерируется синтетическая история за 5 лет
+по всем активным валютам (кроме UAH).
+
+Три прогона: create (все записи новые), skip (повторный импорт без overwrite),
+update (overwrite с измененными курсами). Для каждого выводит число SQL
+запросов (cr.sql_log_count) - оно не должно расти с числом строк.
+Для сравнения "до/после" запустите скрипт на предыдущем коммите.
+Все изменения откатываются.
+"""
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+
+def _synthetic_history(codes, years=5):
+    start = date.today() - timedelta(days=365 * years)
+    rows = []
+    for i in range(365 * years):
+        d = (start + timedelta(days=i)).strftime('%d.%m.%Y')
+        for n, code in enumerate(codes):
+            rows.append({'cc': code, 'rate': round(10 + n + (i % 97) / 100, 4), 'exchangedate': d})
+    return rows
+
+
+def _to_rates_data(rows, shift=0.0):
+    return [{
+        'currency_code': row['cc'],
+        'rate': row['rate'] + shift,
+        'date': datetime.strptime(row['exchangedate'], '%d.%m.%Y').date().isoformat(),
+    } for row in rows]
+
+
+def run_bench():
+    from odoo.addons.dino_erp.api_integration.services.nbu_service import import_rates_to_dino
+
+    dump_path = os.environ.get('NBU_DUMP')
+    if dump_path:
+        with open(dump_path, encoding='utf-8') as fh:
+            rows = json.load(fh)
+    else:
+        codes = env['res.currency'].search([('active', '=', True), ('name', '!=', 'UAH')]).mapped('name')
+        if not codes:
+            print("ОШИБКА: нет активных валют кроме UAH.")
+            return
+        rows = _synthetic_history(codes)
+    print(f"История: {len(rows)} курсов")
+
+    runs = [
+        ('create', _to_rates_data(rows), False),
+        ('skip', _to_rates_data(rows), False),
+        ('update', _to_rates_data(rows, shift=0.01), True),
+    ]
+    cr = env.cr
+    cr.execute('SAVEPOINT bench_nbu_import')
+    try:
+        env['dino.currency.rate'].search([('source', '=', 'nbu'), ('rate_type', '=', 'official')]).unlink()
+        env.flush_all()
+        for label, rates_data, overwrite in runs:
+            queries_before = cr.sql_log_count
+            started = time.perf_counter()
+            result = import_rates_to_dino(env, rates_data, 'nbu', 'official', overwrite)
+            env.flush_all()
+            elapsed = time.perf_counter() - started
+            queries = cr.sql_log_count - queries_before
+            print(f"[{label}] {result['stats']}")
+            print(f"[{label}] {elapsed:.2f}s, {len(rates_data) / elapsed:.0f} rows/s, "
+                  f"{queries} SQL queries ({queries / max(len(rates_data), 1):.4f} per row)")
+    finally:
+        cr.execute('ROLLBACK TO SAVEPOINT bench_nbu_import')
+        env.invalidate_all()
+
+run_bench()
+# End of file scripts/bench_nbu_import.py
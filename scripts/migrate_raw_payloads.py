@@ -0,0 +1,96 @@
+#
+#  -*- File: scripts/migrate_raw_payloads.py -*-
+#
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Перенос dino_bank_transaction.raw_data в сжатое хранилище dino.bank.transaction.raw.
+
+Запускать после обновления модуля (поле raw_data стало вычисляемым, старая
+колонка осталась в таблице и ORM ее больше не читает):
+    python3 odoo-bin shell -d dino24_dev < scripts/migrate_raw_payloads.py
+
+Старые значения - repr() словаря Python (импорт Привата) или JSON - приводятся
+к каноническому JSON и сжимаются (finance/services/raw_payload.py).
+Пачки по BATCH строк, коммит после каждой: скрипт можно прервать и запустить снова.
+Уже сохраненные payload (новый импорт после обновления модуля) не перезаписываются
+старым значением колонки: вставка идет с ON CONFLICT DO NOTHING.
+После переноса колонка raw_data удаляется (KEEP_RAW_COLUMN=1 - оставить).
+Место на диске освобождает только VACUUM FULL dino_bank_transaction
+(блокирует таблицу - запускать в окно обслуживания).
+
+Выводит объем данных до/после и размеры таблиц.
+"""
+import os
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from odoo.addons.dino_erp.finance.services import raw_payload
+
+BATCH = 5000
+
+
+def _size(cr, table):
+    cr.execute("SELECT pg_total_relation_size(%s)", [table])
+    return cr.fetchone()[0]
+
+
+def _mb(value):
+    return f"{(value or 0) / 1024 / 1024:.1f} MB"
+
+
+def run_migration():
+    cr = env.cr
+    Raw = env['dino.bank.transaction.raw']
+
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_name = 'dino_bank_transaction' AND column_name = 'raw_data'
+    """)
+    if not cr.fetchone():
+        print("Колонка dino_bank_transaction.raw_data уже удалена - переносить нечего.")
+        return
+
+    cr.execute("SELECT count(*), sum(octet_length(raw_data)) FROM dino_bank_transaction WHERE raw_data IS NOT NULL")
+    total_rows, raw_bytes = cr.fetchone()
+    table_before = _size(cr, 'dino_bank_transaction')
+    print(f"Строк с raw_data: {total_rows}, объем текста: {_mb(raw_bytes)}, таблица: {_mb(table_before)}")
+
+    last_id, done = 0, 0
+    while True:
+        cr.execute("""
+            SELECT id, raw_data FROM dino_bank_transaction
+             WHERE raw_data IS NOT NULL AND id > %s
+             ORDER BY id LIMIT %s
+        """, (last_id, BATCH))
+        rows = cr.fetchall()
+        if not rows:
+            break
+        packed = [(tid, psycopg2.Binary(raw_payload.pack(data))) for tid, data in rows if data]
+        execute_values(
+            cr,
+            f'INSERT INTO {Raw._table} (transaction_id, payload) VALUES %s '
+            f'ON CONFLICT (transaction_id) DO NOTHING',
+            packed, page_size=1000,
+        )
+        last_id = rows[-1][0]
+        done += len(rows)
+        env.cr.commit()
+        print(f"  перенесено {done}/{total_rows}")
+
+    cr.execute(f"SELECT sum(octet_length(payload)) FROM {Raw._table}")
+    packed_bytes = cr.fetchone()[0]
+
+    if not os.environ.get('KEEP_RAW_COLUMN'):
+        cr.execute("ALTER TABLE dino_bank_transaction DROP COLUMN raw_data")
+        env.cr.commit()
+        print("Колонка dino_bank_transaction.raw_data удалена.")
+
+    ratio = (raw_bytes or 0) / packed_bytes if packed_bytes else 0
+    print(f"raw_data: {_mb(raw_bytes)} -> {_mb(packed_bytes)} сжатого JSON (в {ratio:.1f} раз меньше)")
+    print(f"dino_bank_transaction: {_mb(table_before)} -> {_mb(_size(cr, 'dino_bank_transaction'))} "
+          f"(до VACUUM FULL), {Raw._table}: {_mb(_size(cr, Raw._table))}")
+
+run_migration()
+# End of file scripts/migrate_raw_payloads.py
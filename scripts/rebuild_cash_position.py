@@ -0,0 +1,36 @@
+#
+#  -*- File: scripts/rebuild_cash_position.py -*-
+#
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Полный пересчет дневных остатков dino.bank.cash.position.
+
+Импортеры обновляют только затронутые дни; пересчет нужен после первой
+установки, ручных правок транзакций или удаления истории балансов.
+
+Запуск: odoo shell -d <db> < scripts/rebuild_cash_position.py
+Параметры через переменные окружения:
+    CASH_ACCOUNTS=1,2,3     - только эти счета (id dino.bank.account)
+    CASH_FROM=2024-01-01    - с даты
+    CASH_TO=2024-12-31      - по дату
+"""
+import os
+import time
+
+
+def rebuild_cash_position():
+    # 'env' is globally available in odoo shell
+    accounts = [int(x) for x in os.environ.get('CASH_ACCOUNTS', '').split(',') if x.strip()]
+    date_from = os.environ.get('CASH_FROM') or None
+    date_to = os.environ.get('CASH_TO') or None
+
+    print(f"Пересчет дневных остатков: счета={accounts or 'все'}, период={date_from or '...'}..{date_to or '...'}")
+    started = time.perf_counter()
+    rows = env['dino.bank.cash.position'].rebuild(account_ids=accounts or None, date_from=date_from, date_to=date_to)
+    env.cr.commit()
+    print(f"Готово: {rows} строк за {time.perf_counter() - started:.1f} с")
+
+
+rebuild_cash_position()
+# End of file scripts/rebuild_cash_position.py
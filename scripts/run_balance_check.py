@@ -50,8 +50,39 @@ def run_balance_check():
             print("ОШИБКА: Не удалось получить балансы или API вернул пустой список.")
         print("---------------------------------")
 
+        # --- Шаг 3: Сверка с дневными остатками (dino.bank.cash.position) ---
+        if balances_response:
+            compare_with_cash_position(bank, balances_response)
+
     except Exception as e:
         print(f"Произошла непредвиденная ошибка: {e}")
 
+
+def compare_with_cash_position(bank, balances):
+    """Сравнивает balanceOut из API с последним закрывающим остатком агрегата."""
+    accounts = env['dino.bank.account'].search([('bank_id', '=', bank.id), ('external_id', '!=', False)])
+    account_map = {acc.external_id: acc for acc in accounts}
+    positions = env['dino.bank.cash.position'].search_fetch(
+        [('bank_account_id', 'in', accounts.ids)], ['bank_account_id', 'date', 'closing'], order='date desc',
+    )
+    latest = {}
+    for position in positions:
+        latest.setdefault(position.bank_account_id.id, position)
+
+    print("\n--- Шаг 3: Сверка с dino.bank.cash.position ---")
+    for balance in balances:
+        account = account_map.get(balance.get('acc'))
+        if not account:
+            continue
+        position = latest.get(account.id)
+        api_closing = float(balance.get('balanceOut') or 0)
+        if not position:
+            print(f"{balance.get('acc')}: API {api_closing:.2f}, в агрегате нет строк")
+            continue
+        mark = "OK" if abs(position.closing - api_closing) < 0.005 else "РАСХОЖДЕНИЕ"
+        print(f"{balance.get('acc')}: API {api_closing:.2f}, агрегат {position.closing:.2f} на {position.date} - {mark}")
+    print("---------------------------------")
+
+
 run_balance_check()
 # End of file scripts/run_balance_check.py
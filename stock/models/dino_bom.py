@@ -63,7 +63,7 @@ class DinoBomLine(models.Model):
     def _compute_cost(self):
         """
         Предварительный расчет цены для отображения.
-        Реальная цена гарантированно обновляется методом action_update_cost_recursive.
+        Реальная цена гарантированно обновляется при коммите (dino.nomenclature._flush_cost_queue).
         """
         for line in self:
             total_price = sum(nom.total_cost for nom in line.nomenclature_ids)
@@ -97,30 +97,17 @@ class DinoBomLine(models.Model):
         parents = self.mapped('parent_nomenclature_id')
         result = super().unlink()
         
-        # Запускаем поиск корней для осиротевших родителей
-        if parents:
-            # Используем хелпер для поиска корней от списка номенклатур
-            top_levels = self.env['dino.bom.line']._find_roots_from_nodes(parents)
-            for nom in top_levels:
-                nom.action_update_cost_recursive()
+        # Осиротевшие родители (и все выше) пересчитаются при коммите
+        parents._enqueue_cost_recalc()
         return result
 
     def _trigger_top_down_recalc(self):
         """
-        Находит корневые сборки для текущих строк BOM и запускает их пересчет.
+        Ставит родителей текущих строк BOM в очередь пересчета стоимости.
+        Они и все сборки выше пересчитываются один раз при коммите
+        (dino.nomenclature._flush_cost_queue).
         """
-        # 1. Берем непосредственных родителей (в чьих BOM мы находимся)
-        direct_parents = self.mapped('parent_nomenclature_id')
-        
-        if not direct_parents:
-            return
-
-        # 2. Ищем их самые верхние сборки (Roots)
-        top_levels = self._find_roots_from_nodes(direct_parents)
-        
-        # 3. Запускаем рекурсивный пересчет на Вершинах
-        for nom in top_levels:
-            nom.action_update_cost_recursive()
+        self.mapped('parent_nomenclature_id')._enqueue_cost_recalc()
 
     @api.model
     def _find_roots_from_nodes(self, start_nodes):
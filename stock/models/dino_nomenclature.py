@@ -4,12 +4,59 @@
 # --- МОДЕЛЬ: НОМЕНКЛАТУРА (ИСПОЛНЕНИЕ / КОНКРЕТНЫЙ ТОВАР)
 # --- ФАЙЛ: models/dino_nomenclature.py
 
+import logging
+from collections import defaultdict
+
 from odoo import fields, models, _, api
+from odoo.addons.dino_erp.core.mixins.related_count_mixin import related_count
+
+_logger = logging.getLogger(__name__)
+
+# Ключ в cr.precommit.data: ID номенклатур, ожидающих пересчета родителей
+_COST_QUEUE_KEY = 'dino.nomenclature.cost_queue'
+
+
+def _topological_order(node_ids, children):
+    """
+    Порядок пересчета: дети раньше родителей.
+
+    :param node_ids: ID узлов под-графа
+    :param children: dict {id: set(ID детей внутри под-графа)}
+    :return: list ID; узлы цикла (ошибка данных BOM) - в конце
+    """
+    parents = defaultdict(set)
+    pending = {}
+    for node_id in node_ids:
+        kids = children.get(node_id, set()) & node_ids
+        pending[node_id] = len(kids)
+        for kid in kids:
+            parents[kid].add(node_id)
+
+    order = []
+    ready = sorted(node_id for node_id, count in pending.items() if not count)
+    while ready:
+        node_id = ready.pop()
+        order.append(node_id)
+        for parent_id in parents[node_id]:
+            pending[parent_id] -= 1
+            if not pending[parent_id]:
+                ready.append(parent_id)
+
+    if len(order) < len(node_ids):
+        cyclic = sorted(set(node_ids) - set(order))
+        _logger.warning(f"Цикл в BOM, номенклатуры {cyclic} пересчитаны без учета порядка")
+        order.extend(cyclic)
+    return order
+
 
 class DinoNomenclature(models.Model):
     _name = 'dino.nomenclature'
     _description = 'Nomenclature (Variant/Execution)'
-    _inherit = ['mail.thread', 'mail.activity.mixin', 'mixin.auto.translate']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'mixin.auto.translate', 'mixin.related.count']
+    _related_counts = {
+        'supplier_line_count': ('dino.operation.document.specification', 'nomenclature_id'),
+        'bom_count': ('dino.bom.line', 'parent_nomenclature_id'),
+    }
     _rec_name = 'fullname'
     _order = 'fullname'
 
@@ -49,18 +96,13 @@ class DinoNomenclature(models.Model):
     description = fields.Html(string=_('Internal Notes'), translate=True)
     
     # === SMART BUTTONS ===
-    supplier_line_count = fields.Integer(compute='_compute_supplier_line_count')
-    bom_count = fields.Integer(compute='_compute_bom_count')
+    supplier_line_count = fields.Integer(compute=related_count('supplier_line_count'))
+    bom_count = fields.Integer(compute=related_count('bom_count'))
     
     # Поле поиска для фильтра "Top Level Assemblies"
     used_in_count = fields.Integer(string="Used In Count", compute='_compute_used_in_count', search='_search_used_in_count')
 
     # --- Smart Buttons Logic ---
-    
-    @api.depends('bom_line_ids')
-    def _compute_bom_count(self):
-        for rec in self:
-            rec.bom_count = len(rec.bom_line_ids)
 
     def _compute_used_in_count(self):
         for rec in self:
@@ -90,15 +132,6 @@ class DinoNomenclature(models.Model):
         else:
             return [('id', 'in', used_ids)]
 
-    def _compute_supplier_line_count(self):
-        for rec in self:
-            if 'dino.operation.document.specification' in self.env:
-                rec.supplier_line_count = self.env['dino.operation.document.specification'].search_count([
-                    ('nomenclature_id', '=', rec.id)
-                ])
-            else:
-                rec.supplier_line_count = 0
-    
     def action_view_supplier_prices(self):
         self.ensure_one()
         return {
@@ -198,25 +231,90 @@ class DinoNomenclature(models.Model):
 
     def _trigger_parents_recalc(self):
         """
-        Находит все места, где используется эта номенклатура,
-        находит их самые верхние сборки (Roots) и запускает пересчет.
+        Ставит номенклатуру в очередь пересчета родителей.
+        Пересчет выполняется один раз при коммите транзакции
+        (_flush_cost_queue), сколько бы раз цена ни менялась до этого.
         """
-        # 1. Находим строки BOM, где используется текущая номенклатура
-        usage_lines = self.env['dino.bom.line'].search([('nomenclature_ids', 'in', self.ids)])
-        
-        if not usage_lines:
+        self._enqueue_cost_recalc()
+
+    def _enqueue_cost_recalc(self):
+        """Добавляет ID в очередь транзакции; обработчик коммита регистрируется один раз."""
+        if not self:
             return
+        precommit = self.env.cr.precommit
+        queue = precommit.data.get(_COST_QUEUE_KEY)
+        if queue is None:
+            queue = precommit.data[_COST_QUEUE_KEY] = set()
+            precommit.add(self.env['dino.nomenclature'].sudo()._flush_cost_queue)
+        queue.update(self.ids)
+
+    @api.model
+    def _flush_cost_queue(self):
+        """
+        Пересчитывает стоимость для накопленной очереди.
+        Вызывается при коммите; можно вызвать явно, чтобы получить цены сразу.
+        """
+        queue = self.env.cr.precommit.data.pop(_COST_QUEUE_KEY, None)
+        if not queue:
+            return
+        nomenclatures = self.browse(sorted(queue)).exists()
+        _logger.info(f"Пересчет стоимости BOM: {len(nomenclatures)} измененных номенклатур")
+        nomenclatures._recompute_material_costs()
+        # precommit вызывается уже после flush транзакции - без этого записи останутся только в кэше
+        self.env.flush_all()
 
-        # 2. Берем родителей этих строк
-        parents = usage_lines.mapped('parent_nomenclature_id')
+    def _recompute_material_costs(self):
+        """
+        Пересчет material_cost для self и всех сборок, куда они входят.
 
-        # 3. Ищем КОРНИ (самые верхние изделия) для этих родителей
-        # Используем метод поиска корней из модели BOM
-        top_levels = self.env['dino.bom.line']._find_roots_from_nodes(parents)
+        Затронутый под-граф (self + предки) собирается по уровням, по запросу
+        на уровень; узлы пересчитываются один раз, дети раньше родителей.
+        Узлы вне под-графа не менялись - берется их сохраненная total_cost.
+        """
+        BomLine = self.env['dino.bom.line']
+
+        # 1. Под-граф: стартовые узлы и все их предки
+        affected = set(self.ids)
+        frontier = set(self.ids)
+        while frontier:
+            usage_lines = BomLine.search_fetch([('nomenclature_ids', 'in', list(frontier))],
+                                               ['parent_nomenclature_id'])
+            parent_ids = set(usage_lines.parent_nomenclature_id.ids)
+            frontier = parent_ids - affected
+            affected |= parent_ids
+
+        # 2. Строки BOM всех затронутых сборок - одним запросом
+        lines_by_parent = defaultdict(list)
+        for line in BomLine.search_fetch([('parent_nomenclature_id', 'in', list(affected))],
+                                         ['parent_nomenclature_id', 'nomenclature_ids', 'qty', 'cost', 'total_cost']):
+            lines_by_parent[line.parent_nomenclature_id.id].append(line)
+        children = {
+            parent_id: {child_id for line in lines for child_id in line.nomenclature_ids.ids}
+            for parent_id, lines in lines_by_parent.items()
+        }
+
+        # 3. Снизу вверх
+        totals = {}
+        for record in self.browse(_topological_order(affected, children)):
+            lines = lines_by_parent.get(record.id)
+            if not lines:
+                # Покупной товар: своя цена уже записана
+                continue
+
+            total_material_cost = 0.0
+            for line in lines:
+                costs = [totals.get(nom.id, nom.total_cost) for nom in line.nomenclature_ids]
+                line_avg_cost = sum(costs) / len(costs) if costs else 0.0
+                if line.cost != line_avg_cost or line.total_cost != line.qty * line_avg_cost:
+                    line.write({
+                        'cost': line_avg_cost,
+                        'total_cost': line.qty * line_avg_cost
+                    })
+                total_material_cost += line.qty * line_avg_cost
 
-        # 4. Запускаем рекурсию сверху вниз
-        for nom in top_levels:
-            nom.action_update_cost_recursive()
+            if record.material_cost != total_material_cost:
+                record.write({'material_cost': total_material_cost})
+            totals[record.id] = record.cost + total_material_cost
 
     def action_update_cost_recursive(self):
         """
@@ -2,6 +2,7 @@
 #  -*- File: stock/models/dino_uom.py -*-
 #
 from odoo import fields, models, api, _
+from odoo.osv import expression
 
 class DinoUoM(models.Model):
     _name = 'dino.uom'
@@ -50,4 +51,30 @@ class DinoUoM(models.Model):
             })
         
         return uom
+
+    @api.model
+    def find_or_create_multi(self, unit_names):
+        """
+        Batch version of find_or_create: one search for all names, missing units are created together
+
+        :param unit_names: iterable of unit names
+        :return: dict {stripped lowercase name: dino.uom record}
+        """
+        names = {}
+        for unit_name in unit_names:
+            if unit_name and unit_name.strip():
+                names.setdefault(unit_name.strip().lower(), unit_name.strip())
+        if not names:
+            return {}
+
+        uoms = {}
+        domain = expression.OR([[('name', '=ilike', name)] for name in names.values()])
+        for uom in self.search(domain):
+            uoms.setdefault(uom.name.strip().lower(), uom)
+
+        missing = [name for key, name in names.items() if key not in uoms]
+        if missing:
+            for uom in self.create([{'name': name} for name in missing]):
+                uoms[uom.name.lower()] = uom
+        return uoms
 # End of file stock/models/dino_uom.py
@@ -0,0 +1,82 @@
+#
+#  -*- File: tests/test_bank_transaction_create.py -*-
+#
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+
+class TestBankTransactionCreate(TransactionCase):
+
+    def setUp(self):
+        super(TestBankTransactionCreate, self).setUp()
+        self.Transaction = self.env['dino.bank.transaction']
+        self.Partner = self.env['dino.partner']
+        bank = self.env['dino.bank'].create({'name': 'Test Bank'})
+        self.account = self.env['dino.bank.account'].create({
+            'name': 'Main', 'account_number': 'UA000001', 'bank_id': bank.id,
+            'currency_id': self.env.ref('base.UAH').id,
+        })
+
+    def _vals(self, ext_id, edrpou, iban=None, name=None):
+        return {
+            'bank_account_id': self.account.id,
+            'external_id': ext_id,
+            'datetime': '2024-03-15 10:00:00',
+            'amount': 100.0,
+            'counterparty_edrpou': edrpou,
+            'counterparty_name': name,
+            'counterparty_iban': iban,
+            'counterparty_bank_mfo': '305299',
+        }
+
+    def test_batch_links_existing_and_new_partners(self):
+        """One create call reuses existing partners and creates each missing one once"""
+        existing = self.Partner.create({'name': 'Existing', 'egrpou': '11111111'})
+        transactions = self.Transaction.create([
+            self._vals('T1', '11111111', iban='UA11'),
+            self._vals('T2', '22222222', iban='UA22', name='New Partner'),
+            self._vals('T3', '22222222', iban='UA22'),
+        ])
+
+        self.assertEqual(transactions[0].partner_id, existing)
+        new_partner = self.Partner.search([('egrpou', '=', '22222222')])
+        self.assertEqual(len(new_partner), 1)
+        self.assertEqual(new_partner.name, 'New Partner')
+        self.assertEqual(transactions[1:].partner_id, new_partner)
+
+        accounts = self.env['dino.partner.bank.account'].search([('iban', 'in', ['UA11', 'UA22'])])
+        self.assertEqual(len(accounts), 2)
+        self.assertEqual(set(accounts.mapped('bank_mfo')), {'305299'})
+
+    def test_queries_do_not_grow_with_counterparties(self):
+        """Counterparty resolution does not query per row"""
+        self.Transaction.create([self._vals('W0', '30000000', iban='UA30')])
+        vals_small = [self._vals(f'S{i}', f'{31000000 + i}', iban=f'UAS{i}') for i in range(2)]
+        vals_large = [self._vals(f'L{i}', f'{32000000 + i}', iban=f'UAL{i}') for i in range(20)]
+
+        self.env.flush_all()
+        queries = self.cr.sql_log_count
+        self.Transaction.create(vals_small)
+        self.env.flush_all()
+        small = self.cr.sql_log_count - queries
+
+        queries = self.cr.sql_log_count
+        self.Transaction.create(vals_large)
+        self.env.flush_all()
+        large = self.cr.sql_log_count - queries
+
+        self.assertLess(large, small * 3)
+
+    def test_orm_changes_refresh_cash_position(self):
+        """Create, moving to another day and unlink keep the daily aggregates current"""
+        Position = self.env['dino.bank.cash.position']
+        trx = self.Transaction.create([self._vals('P1', '40000000')])
+        domain = [('bank_account_id', '=', self.account.id)]
+        self.assertEqual(Position.search(domain).mapped('credit'), [100.0])
+
+        trx.write({'datetime': '2024-03-16 10:00:00'})
+        self.assertEqual([str(day) for day in Position.search(domain).mapped('date')], ['2024-03-16'])
+
+        trx.unlink()
+        self.assertFalse(Position.search(domain))
+# End of file tests/test_bank_transaction_create.py
@@ -0,0 +1,75 @@
+#
+#  -*- File: tests/test_cost_propagation.py -*-
+#
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.dino_erp.stock.models.dino_nomenclature import _topological_order
+
+
+class TestCostPropagation(TransactionCase):
+
+    def setUp(self):
+        super(TestCostPropagation, self).setUp()
+        self.Nomenclature = self.env['dino.nomenclature']
+        self.component = self.env['dino.component'].create({'name': 'Parts'})
+        self.bolt = self._nomenclature('Bolt', cost=10.0)
+        self.nut = self._nomenclature('Nut', cost=5.0)
+        self.frame = self._nomenclature('Frame')
+        self.panel = self._nomenclature('Panel')
+        self.cabinet = self._nomenclature('Cabinet')
+        self._bom(self.frame, self.bolt, 2)
+        self._bom(self.panel, self.bolt, 1)
+        self._bom(self.panel, self.nut, 3)
+        self._bom(self.cabinet, self.frame, 1)
+        self._bom(self.cabinet, self.panel, 1)
+        self.Nomenclature._flush_cost_queue()
+
+    def _nomenclature(self, name, cost=0.0):
+        return self.Nomenclature.create({'name': name, 'component_id': self.component.id, 'cost': cost})
+
+    def _bom(self, parent, child, qty):
+        return self.env['dino.bom.line'].create({
+            'parent_nomenclature_id': parent.id,
+            'component_id': self.component.id,
+            'nomenclature_ids': [(6, 0, child.ids)],
+            'qty': qty,
+        })
+
+    def test_flush_recomputes_whole_dag(self):
+        """Shared sub-assemblies roll up into the top-level assembly"""
+        self.assertEqual(self.frame.material_cost, 20.0)
+        self.assertEqual(self.panel.material_cost, 25.0)
+        self.assertEqual(self.cabinet.material_cost, 45.0)
+
+    def test_cost_changes_are_deferred_and_coalesced(self):
+        """Repeated cost writes only queue the nomenclature until the flush"""
+        self.bolt.write({'cost': 15.0})
+        self.bolt.write({'cost': 20.0})
+
+        self.assertEqual(self.cabinet.material_cost, 45.0)
+        self.assertEqual(self.env.cr.precommit.data['dino.nomenclature.cost_queue'], {self.bolt.id})
+
+        self.env.cr.flush()
+
+        self.assertEqual(self.frame.material_cost, 40.0)
+        self.assertEqual(self.panel.material_cost, 35.0)
+        self.assertEqual(self.cabinet.material_cost, 75.0)
+
+    def test_flush_persists_costs_in_database(self):
+        """Costs recomputed by the commit hook are written to the database"""
+        self.bolt.write({'cost': 20.0})
+        self.env.cr.flush()
+        self.env.invalidate_all()
+
+        self.env.cr.execute("SELECT material_cost FROM dino_nomenclature WHERE id = %s", (self.cabinet.id,))
+        self.assertEqual(float(self.env.cr.fetchone()[0]), 75.0)
+        self.assertEqual(self.cabinet.material_cost, 75.0)
+
+    def test_topological_order_children_first(self):
+        order = _topological_order({1, 2, 3, 4}, {4: {2, 3}, 2: {1}, 3: {1}})
+        self.assertEqual(order[0], 1)
+        self.assertEqual(order[-1], 4)
+        # Цикл не зацикливает пересчет
+        self.assertEqual(sorted(_topological_order({1, 2}, {1: {2}, 2: {1}})), [1, 2])
+# End of file tests/test_cost_propagation.py
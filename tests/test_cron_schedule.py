@@ -0,0 +1,150 @@
+#
+#  -*- File: tests/test_cron_schedule.py -*-
+#
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from dateutil import relativedelta
+from hypothesis import given, settings, strategies as st
+
+from api_integration.services.cron_schedule import (
+    CronSchedule, float_to_time, next_run_time, schedule_from_record,
+)
+
+WEEKDAY_FIELDS = ['cron_monday', 'cron_tuesday', 'cron_wednesday', 'cron_thursday',
+                  'cron_friday', 'cron_saturday', 'cron_sunday']
+
+
+def brute_force_next_run(record, base_time, now):
+    """Прежний DinoApiEndpoint._calculate_next_run_time (now передается явно)."""
+    interval = record.cron_interval_number or 1
+    itype = record.cron_interval_type or 'days'
+    candidate = base_time
+
+    for _ in range(1000):
+        if itype == 'minutes':
+            candidate += timedelta(minutes=interval)
+        elif itype == 'hours':
+            candidate += timedelta(hours=interval)
+        elif itype == 'days':
+            candidate += timedelta(days=interval)
+        elif itype == 'weeks':
+            candidate += timedelta(weeks=interval)
+        else:
+            candidate += relativedelta.relativedelta(months=interval)
+
+        if itype in ('days', 'weeks', 'months'):
+            hours = int(record.cron_start_time)
+            minutes = int((record.cron_start_time - hours) * 60)
+            candidate = candidate.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+            if itype == 'months':
+                if record.cron_last_day_of_month:
+                    next_month = candidate.replace(day=28) + timedelta(days=4)
+                    candidate = next_month - timedelta(days=next_month.day)
+                elif record.cron_day_of_month:
+                    try:
+                        candidate = candidate.replace(day=record.cron_day_of_month)
+                    except ValueError:
+                        next_month = candidate.replace(day=28) + timedelta(days=4)
+                        candidate = next_month - timedelta(days=next_month.day)
+        else:
+            start_h = int(record.cron_start_time)
+            start_m = int((record.cron_start_time - start_h) * 60)
+            end_h = int(record.cron_end_time)
+            end_m = int((record.cron_end_time - end_h) * 60)
+            start_window = candidate.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
+            end_window = candidate.replace(hour=end_h, minute=end_m, second=0, microsecond=0)
+            if candidate < start_window:
+                candidate = start_window
+            elif candidate > end_window:
+                candidate = (candidate + timedelta(days=1)).replace(hour=start_h, minute=start_m, second=0, microsecond=0)
+
+        allowed_weekdays = [day for day, field in enumerate(WEEKDAY_FIELDS) if getattr(record, field)]
+        if allowed_weekdays:
+            current_wd = candidate.weekday()
+            if current_wd not in allowed_weekdays:
+                days_ahead = min((wd - current_wd) % 7 for wd in allowed_weekdays)
+                candidate += timedelta(days=days_ahead or 7)
+
+        if candidate > now:
+            return candidate
+    return None
+
+
+@st.composite
+def endpoints(draw, interval_types=('minutes', 'hours', 'days', 'weeks', 'months')):
+    itype = draw(st.sampled_from(interval_types))
+    if itype == 'minutes':
+        interval = draw(st.sampled_from([1, 5, 7, 15, 30, 45, 90]))
+    else:
+        interval = draw(st.integers(min_value=1, max_value=30 if itype == 'hours' else 4))
+    # Окно задается с шагом 15 минут, end > start
+    start = draw(st.integers(min_value=0, max_value=90))
+    end = draw(st.integers(min_value=start + 1, max_value=95))
+    weekdays = draw(st.lists(st.booleans(), min_size=7, max_size=7))
+    return SimpleNamespace(
+        cron_interval_number=interval,
+        cron_interval_type=itype,
+        cron_start_time=start / 4.0,
+        cron_end_time=end / 4.0,
+        cron_day_of_month=draw(st.sampled_from([0, 1, 15, 29, 30, 31])),
+        cron_last_day_of_month=draw(st.booleans()),
+        **dict(zip(WEEKDAY_FIELDS, weekdays)),
+    )
+
+
+moments = st.datetimes(min_value=datetime(2024, 1, 1), max_value=datetime(2027, 12, 31)).map(
+    lambda d: d.replace(second=0, microsecond=0))
+
+
+@settings(max_examples=2000, deadline=None)
+@given(record=endpoints(), base=moments, gap_minutes=st.integers(min_value=0, max_value=60 * 24 * 120))
+def test_matches_brute_force(record, base, gap_minutes):
+    now = base + timedelta(minutes=gap_minutes)
+    expected = brute_force_next_run(record, base, now)
+    result = next_run_time(schedule_from_record(record), base, now)
+
+    assert result > now
+    if expected is not None:
+        assert result == expected
+
+
+@settings(max_examples=500, deadline=None)
+@given(record=endpoints(interval_types=('minutes', 'hours')), base=moments,
+       gap_minutes=st.integers(min_value=0, max_value=60 * 24 * 400))
+def test_intraday_slot_is_valid(record, base, gap_minutes):
+    now = base + timedelta(minutes=gap_minutes)
+    schedule = schedule_from_record(record)
+    result = next_run_time(schedule, base, now)
+
+    assert result > now
+    if schedule.weekdays:
+        assert result.weekday() in schedule.weekdays
+    assert float_to_time(record.cron_start_time) <= result.time() <= float_to_time(record.cron_end_time)
+
+
+def test_tight_weekday_filter_does_not_give_up():
+    """Старый цикл исчерпывал 1000 попыток: минутный интервал, только суббота, база месяц назад."""
+    schedule = CronSchedule(1, 'minutes', 9.0, 18.0, frozenset({5}), 0, False)
+    base = datetime(2025, 3, 3, 12, 0)   # понедельник
+    now = datetime(2025, 4, 2, 10, 0)    # среда
+
+    assert next_run_time(schedule, base, now) == datetime(2025, 4, 5, 9, 0)
+
+
+def test_empty_window_means_no_window():
+    """Окно 0:00-0:00 (не заполнено) не прижимает запуск к полуночи."""
+    schedule = CronSchedule(15, 'minutes', 0.0, 0.0, frozenset(), 0, False)
+    base = datetime(2025, 3, 3, 12, 7)
+
+    assert next_run_time(schedule, base, base) == datetime(2025, 3, 3, 12, 22)
+    assert next_run_time(schedule, base, datetime(2025, 3, 10, 8, 0)) == datetime(2025, 3, 10, 8, 7)
+
+
+def test_last_day_of_month():
+    schedule = CronSchedule(1, 'months', 20.5, 0.0, frozenset(), 0, True)
+    base = datetime(2025, 1, 31, 20, 30)
+
+    assert next_run_time(schedule, base, base) == datetime(2025, 2, 28, 20, 30)
+    assert next_run_time(schedule, base, datetime(2025, 6, 1)) == datetime(2025, 6, 30, 20, 30)
+# End of file tests/test_cron_schedule.py
@@ -0,0 +1,72 @@
+#
+#  -*- File: tests/test_currency_converter.py -*-
+#
+from datetime import date, datetime
+
+import pytest
+
+from finance.services import currency_converter
+from finance.services.currency_converter import CurrencyConverter, RateNotFound
+
+UAH, USD, EUR = 1, 2, 3
+
+ROWS = [
+    (USD, date(2024, 1, 1), 38.0),
+    (USD, date(2024, 1, 3), 39.0),
+    (USD, date(2024, 1, 10), 40.0),
+    (EUR, date(2024, 1, 1), 42.0),
+    (EUR, date(2024, 1, 5), 43.0),
+]
+
+
+@pytest.fixture
+def converter():
+    return CurrencyConverter.from_rows(ROWS, base_currency_id=UAH)
+
+
+def test_rate_on_or_before_date(converter):
+    assert converter.rate(USD, date(2024, 1, 1)) == 38.0
+    assert converter.rate(USD, '2024-01-02') == 38.0
+    assert converter.rate(USD, datetime(2024, 1, 9, 23, 59)) == 39.0
+    assert converter.rate(USD, date(2025, 1, 1)) == 40.0
+    assert converter.rate(UAH, date(2000, 1, 1)) == 1.0
+    with pytest.raises(RateNotFound):
+        converter.rate(USD, date(2023, 12, 31))
+
+
+def test_convert_between_foreign_currencies(converter):
+    assert converter.convert(100.0, USD, UAH, date(2024, 1, 3)) == pytest.approx(3900.0)
+    assert converter.convert(3900.0, UAH, USD, date(2024, 1, 3)) == pytest.approx(100.0)
+    assert converter.convert(100.0, USD, EUR, date(2024, 1, 5)) == pytest.approx(100.0 * 39.0 / 43.0)
+    assert converter.convert(5.0, EUR, EUR, date(1990, 1, 1)) == 5.0
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+def test_convert_many_matches_single_conversions(converter, monkeypatch, with_numpy):
+    if not with_numpy:
+        monkeypatch.setattr(currency_converter, 'numpy', None)
+    elif currency_converter.numpy is None:
+        pytest.skip("numpy not installed")
+
+    days = [date(2024, 1, d) for d in (1, 2, 3, 5, 9, 10, 20)]
+    currencies = [USD, EUR, UAH, USD, EUR, USD, EUR]
+    amounts = [10.0 * (i + 1) for i in range(len(days))]
+
+    result = converter.convert_many(amounts, currencies, UAH, days)
+
+    expected = [converter.convert(a, c, UAH, d) for a, c, d in zip(amounts, currencies, days)]
+    assert result == pytest.approx(expected)
+    assert converter.convert_many([1.0, 2.0], USD, EUR, '2024-01-05') == pytest.approx([39.0 / 43.0, 78.0 / 43.0])
+
+
+def test_convert_many_reports_missing_rate(converter):
+    with pytest.raises(RateNotFound):
+        converter.convert_many([1.0, 1.0], [USD, EUR], UAH, [date(2024, 1, 2), date(2023, 6, 1)])
+
+
+def test_system_rates_are_inverted():
+    # res.currency.rate: единиц валюты за единицу валюты компании (UAH)
+    converter = CurrencyConverter.from_rows([(USD, date(2024, 1, 1), 0.025)], base_currency_id=UAH, invert=True)
+
+    assert converter.convert(1.0, USD, UAH, date(2024, 2, 1)) == pytest.approx(40.0)
+# End of file tests/test_currency_converter.py
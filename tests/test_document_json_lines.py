@@ -0,0 +1,87 @@
+#
+#  -*- File: tests/test_document_json_lines.py -*-
+#
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.dino_erp.documents.services.document_json_service import DocumentJSONService
+
+
+class TestDocumentJSONLines(TransactionCase):
+
+    def setUp(self):
+        super(TestDocumentJSONLines, self).setUp()
+        self.partner = self.env['dino.partner'].create({'name': 'Lines Supplier', 'egrpou': '33333333'})
+        self.document = self.env['dino.operation.document'].create({
+            'number': 'L-1', 'partner_id': self.partner.id,
+        })
+
+    def _line(self, number, name, unit='шт', price=10.0):
+        return {'line_number': number, 'name': name, 'unit': unit, 'quantity': 2.0,
+                'price_unit': price, 'tax_percent': 20}
+
+    def test_bulk_creates_lines_and_references(self):
+        """Units and supplier items are created once per distinct value"""
+        result = DocumentJSONService._process_lines(self.document, [
+            self._line(1, 'Bolt M8', unit='ШТ '),
+            self._line(2, 'Nut M8', unit='шт'),
+            self._line(3, 'Cable', unit='м'),
+        ])
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (3, 0, []))
+        lines = self.document.specification_ids.sorted('sequence')
+        self.assertEqual(lines.mapped('name'), ['Bolt M8', 'Nut M8', 'Cable'])
+        self.assertEqual(lines[0].dino_uom_id, lines[1].dino_uom_id)
+        self.assertAlmostEqual(lines[0].price_tax, 12.0)
+        self.assertEqual(len(lines.mapped('supplier_nomenclature_id')), 3)
+
+    def test_reimport_updates_by_sequence_and_name(self):
+        """Lines are matched by sequence, legacy default-sequence lines by name"""
+        DocumentJSONService._process_lines(self.document, [self._line(1, 'Bolt M8')])
+        legacy = self.env['dino.operation.document.specification'].create({
+            'document_id': self.document.id, 'name': 'Washer', 'price_untaxed': 1.0,
+        })
+
+        result = DocumentJSONService._process_lines(self.document, [
+            self._line(1, 'Bolt M8', price=11.0),
+            self._line(2, 'Washer', price=2.0),
+            self._line(3, 'Spring', price=3.0),
+        ])
+
+        self.assertEqual((result['created'], result['updated']), (1, 2))
+        self.assertEqual(len(self.document.specification_ids), 3)
+        self.assertEqual(legacy.sequence, 2)
+        self.assertEqual(legacy.price_untaxed, 2.0)
+
+    def test_nomenclature_cost_updated_once(self):
+        """Cost of a linked nomenclature takes the latest price after the import"""
+        component = self.env['dino.component'].create({'name': 'Bolts'})
+        nomenclature = self.env['dino.nomenclature'].create({'name': 'M8', 'component_id': component.id})
+        self.env['dino.partner.nomenclature'].create({
+            'partner_id': self.partner.id, 'name': 'Bolt M8', 'nomenclature_id': nomenclature.id,
+        })
+
+        DocumentJSONService._process_lines(self.document, [
+            self._line(1, 'Bolt M8', price=10.0),
+            self._line(2, 'Bolt M8', price=20.0),
+        ])
+
+        self.assertEqual(self.document.specification_ids.nomenclature_id, nomenclature)
+        self.assertAlmostEqual(nomenclature.cost, 24.0)
+
+    def test_bad_line_does_not_drop_document(self):
+        """A supplier item that cannot be created is reported, the other lines are imported"""
+        self.env['dino.partner.nomenclature'].create({
+            'partner_id': self.partner.id, 'name': 'Bolt M8', 'active': False,
+        })
+
+        result = DocumentJSONService._process_lines(self.document, [
+            self._line(1, 'Bolt M8'),
+            self._line(2, 'Nut M8'),
+        ])
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(len(result['errors']), 1)
+        self.assertTrue(result['errors'][0].startswith('Рядок 1'))
+        self.assertEqual(self.document.specification_ids.mapped('name'), ['Nut M8'])
+# End of file tests/test_document_json_lines.py
@@ -0,0 +1,106 @@
+#
+#  -*- File: tests/test_http_replay.py -*-
+#
+from datetime import date, datetime, timezone
+
+import pytest
+import requests
+
+from api_integration.services import http_replay
+from api_integration.services.http_replay import Cassette, ReplayMiss, recording, replaying, use_transport
+from api_integration.services.mono_client import MonoClient
+from api_integration.services.nbu_client import NBUClient, split_period
+from api_integration.services.privat_client import PrivatClient
+from api_integration.services.synthetic_bank import SyntheticBank
+
+END = date(2024, 3, 31)
+
+
+def _privat_pages(**kwargs):
+    client = PrivatClient(api_key="fake-token", request_delay=0)
+    return list(client.get_transactions_generator(start_date='01-03-2024', limit=100, **kwargs))
+
+
+def test_synthetic_privat_transactions_are_paged():
+    bank = SyntheticBank(accounts=3, days=31, per_day=5, end=END)
+    with use_transport(lambda adapter: bank):
+        pages = _privat_pages()
+        one_account = _privat_pages(account_num=bank.accounts[1])
+
+    rows = [row for page in pages for row in page]
+    assert len(rows) == bank.total_transactions() == 465
+    assert len(pages) == 5 and bank.requests == 5 + 2
+    assert len({row['ID'] for row in rows}) == len(rows)
+    assert {row['AUT_MY_ACC'] for page in one_account for row in page} == {bank.accounts[1]}
+
+
+def test_synthetic_balances_match_turnover():
+    bank = SyntheticBank(accounts=2, days=10, per_day=7, end=END)
+    with use_transport(lambda adapter: bank):
+        client = PrivatClient(api_key="fake-token", request_delay=0)
+        balances = [row for page in client.get_balance_history_generator(
+            account_num=bank.accounts[0], start_date='22-03-2024', limit=3) for row in page]
+
+    assert len(balances) == 10
+    for previous, current in zip(balances, balances[1:]):
+        assert previous['balanceOut'] == current['balanceIn']
+    for row in balances:
+        closing = float(row['balanceIn']) + float(row['turnoverCred']) - float(row['turnoverDebt'])
+        assert float(row['balanceOut']) == pytest.approx(closing, abs=0.01)
+
+
+def test_record_then_replay_without_network(tmp_path):
+    path = tmp_path / 'privat.json.gz'
+    bank = SyntheticBank(accounts=2, days=31, per_day=4, end=END)
+    with use_transport(lambda adapter: bank):
+        with recording(path) as cassette:
+            recorded = _privat_pages()
+    assert len(cassette) == 3
+
+    with replaying(path):
+        replayed = _privat_pages()
+        with pytest.raises(ReplayMiss):
+            _privat_pages(account_num='UA-unknown')
+
+    assert replayed == recorded
+
+
+def test_replay_keeps_non_utf8_body():
+    cassette = Cassette()
+    request = requests.Request('GET', 'https://acp.privatbank.ua/api/statements/settings').prepare()
+    body = '{"status": "SUCCESS", "settings": {"phase": "WRK", "name": "Тест"}}'.encode('cp1251')
+    cassette.record(request, http_replay.build_response(request, 200, body, {'Content-Type': 'application/json'}))
+
+    restored = Cassette(cassette.interactions)
+    assert 'body_b64' in restored.interactions[0]
+    with replaying(cassette=restored):
+        response = PrivatClient(api_key="fake-token", request_delay=0).session.get(request.url)
+
+    assert response.status_code == 200
+    assert response.content == body
+
+
+def test_synthetic_nbu_chunks():
+    bank = SyntheticBank(accounts=1, days=91, per_day=1, end=END)
+    with use_transport(lambda adapter: bank):
+        chunks = split_period(date(2024, 1, 1), END, months=1)
+        data = [rows for _start, _end, rows in NBUClient().iter_exchange_chunks(chunks, workers=2)]
+
+    assert [len(rows) for rows in data] == [31 * 4, 29 * 4, 31 * 4]
+    assert data[0][0]['exchangedate'] == '01.01.2024'
+
+
+def test_synthetic_mono_statement_is_limited_and_newest_first():
+    bank = SyntheticBank(accounts=1, days=31, per_day=40, end=END)
+    start = int(datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp())
+    end = int(datetime(2024, 3, 31, 23, 59, 59, tzinfo=timezone.utc).timestamp())
+    with use_transport(lambda adapter: bank):
+        client = MonoClient(api_key="fake-token")
+        accounts = client.fetch_accounts()
+        rows = client.fetch_statement(accounts[0]['id'], start, end)
+
+    assert len(rows) == 500
+    times = [row['time'] for row in rows]
+    assert times == sorted(times, reverse=True)
+    assert times[0] <= end
+# End of file tests/test_http_replay.py
@@ -0,0 +1,119 @@
+#
+#  -*- File: tests/test_http_sessions.py -*-
+#
+import responses
+
+from api_integration.services.http_sessions import SessionRegistry
+from api_integration.services.privat_client import PrivatClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_same_origin_and_credentials_share_session():
+    registry = SessionRegistry()
+    a = registry.get("https://acp.privatbank.ua/api", credentials=("token", None), headers={'token': 'token'})
+    b = registry.get("https://acp.privatbank.ua/api/statements", credentials=("token", None), headers={'token': 'token'})
+    c = registry.get("https://acp.privatbank.ua/api", credentials=("other", None), headers={'token': 'other'})
+
+    assert a is b
+    assert a is not c
+    assert a.headers['token'] == 'token'
+    assert len(registry) == 2
+
+
+def test_pool_size_and_retry_policy():
+    registry = SessionRegistry(pool_maxsize=16, retries=5)
+    adapter = registry.get("https://bank.gov.ua").get_adapter("https://bank.gov.ua/x")
+
+    assert adapter._pool_maxsize == 16
+    assert adapter.max_retries.total == 5
+    assert 429 in adapter.max_retries.status_forcelist
+
+
+def test_retries_only_idempotent_methods_and_per_client():
+    registry = SessionRegistry(retries=5)
+    retry = registry.get("https://cloud.example.com").get_adapter("https://cloud.example.com/x").max_retries
+
+    assert retry.is_retry('GET', 503)
+    assert not retry.is_retry('PUT', 503)
+    assert not retry.is_retry('DELETE', 503)
+    assert not retry.is_retry('POST', 503)
+
+    no_retry = registry.get("https://cloud.example.com", retries=0)
+    assert no_retry is not registry.get("https://cloud.example.com")
+    assert no_retry.get_adapter("https://cloud.example.com/x").max_retries.total == 0
+
+
+def test_idle_sessions_are_evicted():
+    clock = FakeClock()
+    registry = SessionRegistry(clock=clock, idle_timeout=60)
+    first = registry.get("https://adm.tools")
+
+    clock.now += 30
+    assert registry.get("https://adm.tools") is first
+
+    clock.now += 61
+    assert registry.get("https://adm.tools") is not first
+
+
+def test_response_keeps_session_alive():
+    clock = FakeClock()
+    registry = SessionRegistry(clock=clock, idle_timeout=60)
+    session = registry.get("https://adm.tools")
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.GET, "https://adm.tools/action/gov/api/", body="<x/>", status=200)
+        clock.now += 50
+        session.get("https://adm.tools/action/gov/api/")
+
+    clock.now += 50
+    assert registry.get("https://adm.tools") is session
+
+
+def test_configure_drops_sessions_with_old_pool_settings():
+    registry = SessionRegistry()
+    old = registry.get("https://bank.gov.ua")
+
+    registry.configure(pool_maxsize=10)  # без изменений
+    assert registry.get("https://bank.gov.ua") is old
+
+    registry.configure(pool_maxsize=32)
+    assert registry.get("https://bank.gov.ua") is not old
+
+
+def test_configure_keeps_in_use_session_open_until_idle():
+    clock = FakeClock()
+    registry = SessionRegistry(clock=clock, idle_timeout=60)
+    old = registry.get("https://bank.gov.ua")
+    closed = []
+    old.close = lambda: closed.append(old)
+
+    registry.configure(pool_maxsize=32)
+    assert closed == []
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.GET, "https://bank.gov.ua/rates", body="{}", status=200)
+        clock.now += 50
+        old.get("https://bank.gov.ua/rates")  # сессией еще пользуется другой поток
+
+    clock.now += 50
+    registry.get("https://bank.gov.ua")
+    assert closed == []
+
+    clock.now += 61
+    registry.get("https://bank.gov.ua")
+    assert closed == [old]
+
+
+def test_privat_clone_reuses_pooled_session():
+    client = PrivatClient(api_key="fake-token", client_id="42")
+
+    assert client._clone().session is client.session
+    assert client.session.headers['id'] == '42'
+# End of file tests/test_http_sessions.py
@@ -0,0 +1,102 @@
+#
+#  -*- File: tests/test_mono_client.py -*-
+#
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api_integration.services.mono_client import MonoClient, MonoRateLimited
+from api_integration.services.mono_schedule import PAGE_SIZE, StatementQueue, plan_windows
+
+ACCOUNT = "acc1"
+# 650 операций по одной в минуту, от новых к старым - как отдает Mono
+TRANSACTIONS = [{"id": f"t{i}", "time": 1700000000 + i * 60, "amount": -100 * i} for i in range(650)]
+
+
+class StubMonoHandler(BaseHTTPRequestHandler):
+    """Локальная заглушка Monobank API: client-info, выписка с лимитом 500 и 429."""
+    rate_limited = False
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('X-Token')))
+        if self.server.rate_limited:
+            return self._send(429, {"errorDescription": "Too many requests"})
+        if self.path == '/personal/client-info':
+            return self._send(200, {"clientId": "c1", "accounts": [
+                {"id": ACCOUNT, "iban": "UA733220010000026201234567890", "currencyCode": 980,
+                 "balance": 10000, "type": "black", "maskedPan": ["537541******1234"]},
+            ]})
+        match = re.match(r'^/personal/statement/([^/]+)/(\d+)/(\d+)$', self.path)
+        if match:
+            date_from, date_to = int(match.group(2)), int(match.group(3))
+            rows = [t for t in TRANSACTIONS if date_from <= t['time'] <= date_to]
+            rows.sort(key=lambda t: t['time'], reverse=True)
+            return self._send(200, rows[:PAGE_SIZE])
+        return self._send(404, {})
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubMonoHandler)
+    server.requests = []
+    server.rate_limited = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server):
+    return MonoClient(api_url=f"http://127.0.0.1:{server.server_address[1]}", api_key="token")
+
+
+def test_fetch_accounts_sends_token(stub_server):
+    accounts = _client(stub_server).fetch_accounts()
+
+    assert [a['id'] for a in accounts] == [ACCOUNT]
+    assert stub_server.requests == [('/personal/client-info', 'token')]
+
+
+def test_statement_queue_pages_through_full_window(stub_server):
+    client = _client(stub_server)
+    first, last = TRANSACTIONS[0]['time'], TRANSACTIONS[-1]['time']
+    queue = StatementQueue(plan_windows(ACCOUNT, first, last), min_interval=60)
+    now = 0.0
+    seen = set()
+
+    while queue:
+        assert queue.wait_time(now) == 0
+        window = queue.peek()
+        rows = client.fetch_statement(window['account'], window['from'], window['to'])
+        seen.update(row['id'] for row in rows)
+        queue.record(window, rows, now)
+        # Следующий запрос разрешен только через min_interval
+        assert queue.wait_time(now + 30) == 30
+        now += 60
+
+    # Полная страница (500) + остаток по тому же окну с to = самой старой операции
+    assert len(stub_server.requests) == 2
+    assert seen == {t['id'] for t in TRANSACTIONS}
+
+
+def test_rate_limit_is_not_retried(stub_server):
+    stub_server.rate_limited = True
+
+    with pytest.raises(MonoRateLimited):
+        _client(stub_server).fetch_statement(ACCOUNT, 1700000000, 1700003600)
+    assert len(stub_server.requests) == 1
@@ -0,0 +1,54 @@
+#
+#  -*- File: tests/test_mono_schedule.py -*-
+#
+from api_integration.services.mono_schedule import (
+    PAGE_SIZE, WINDOW_SECONDS, StatementQueue, plan_windows,
+)
+
+DAY = 86400
+
+
+def test_plan_windows_covers_period_without_overlap():
+    start, end = 1_700_000_000, 1_700_000_000 + 100 * DAY
+    windows = plan_windows('acc', start, end)
+
+    assert len(windows) == 4
+    assert windows[0]['from'] == start
+    assert windows[-1]['to'] == end
+    for prev, nxt in zip(windows, windows[1:]):
+        assert nxt['from'] == prev['to'] + 1
+    assert all(w['to'] - w['from'] <= WINDOW_SECONDS for w in windows)
+
+
+def test_plan_windows_empty_period():
+    assert plan_windows('acc', 100, 99) == []
+
+
+def test_queue_orders_oldest_first_and_round_trips_json():
+    queue = StatementQueue(plan_windows('b', 0, 40 * DAY) + plan_windows('a', 10 * DAY, 20 * DAY))
+    assert [(w['account'], w['from']) for w in queue.windows][:2] == [('b', 0), ('a', 10 * DAY)]
+
+    restored = StatementQueue.from_json(queue.to_json(), last_request=100.0, min_interval=60)
+    assert restored.windows == queue.windows
+    assert restored.wait_time(130.0) == 30.0
+    assert restored.wait_time(200.0) == 0
+
+
+def test_full_page_narrows_window_partial_page_removes_it():
+    queue = StatementQueue([{'account': 'a', 'from': 0, 'to': 10_000}])
+    window = queue.peek()
+
+    full_page = [{'id': str(i), 'time': 10_000 - i} for i in range(PAGE_SIZE)]
+    queue.record(window, full_page, now=1.0)
+    assert queue.peek() == {'account': 'a', 'from': 0, 'to': 10_000 - PAGE_SIZE + 1}
+    assert queue.last_request == 1.0
+
+    queue.record(queue.peek(), [{'id': 'x', 'time': 5}], now=61.0)
+    assert len(queue) == 0
+
+
+def test_full_page_in_one_second_still_progresses():
+    queue = StatementQueue([{'account': 'a', 'from': 0, 'to': 500}])
+    same_second = [{'id': str(i), 'time': 500} for i in range(PAGE_SIZE)]
+    queue.record(queue.peek(), same_second, now=0)
+    assert queue.peek()['to'] == 499
@@ -2,8 +2,10 @@
 #  -*- File: tests/test_nbu_client.py -*-
 #
 import json
+from datetime import date
+
 import responses
-from api_integration.services.nbu_client import NBUClient
+from api_integration.services.nbu_client import NBUClient, split_period
 
 BASE = "https://bank.gov.ua"
 
@@ -70,4 +72,35 @@ def test_get_bank_info_success():
     with responses.RequestsMock() as rsps:
         rsps.add(rsps.GET, url, json=body, status=200)
         info = client.get_bank_info(mfo)
-        assert info == body# End of file tests/test_nbu_client.py
+        assert info == body
+
+
+def test_split_period_by_month_and_quarter():
+    assert split_period(date(2023, 1, 15), date(2023, 3, 10)) == [
+        (date(2023, 1, 15), date(2023, 1, 31)),
+        (date(2023, 2, 1), date(2023, 2, 28)),
+        (date(2023, 3, 1), date(2023, 3, 10)),
+    ]
+    assert split_period(date(2023, 11, 1), date(2024, 6, 30), months=3) == [
+        (date(2023, 11, 1), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 4, 30)),
+        (date(2024, 5, 1), date(2024, 6, 30)),
+    ]
+    assert split_period(date(2023, 2, 1), date(2023, 1, 1)) == []
+
+
+def test_iter_exchange_chunks_keeps_order():
+    client = NBUClient()
+    chunks = split_period(date(2023, 1, 1), date(2023, 6, 30))
+
+    def callback(request):
+        start = request.params['start']
+        return 200, {}, json.dumps([{"cc": "USD", "rate": 36.5, "start": start}])
+
+    with responses.RequestsMock() as rsps:
+        rsps.add_callback(rsps.GET, f"{BASE}/NBU_Exchange/exchange_site", callback=callback)
+        result = list(client.iter_exchange_chunks(chunks, workers=3))
+
+    assert [(s, e) for s, e, _ in result] == chunks
+    assert [data[0]["start"] for _, _, data in result] == [s.strftime('%Y%m%d') for s, _ in chunks]
+# End of file tests/test_nbu_client.py
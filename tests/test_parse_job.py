@@ -0,0 +1,77 @@
+#
+#  -*- File: tests/test_parse_job.py -*-
+#
+# -*- coding: utf-8 -*-
+import base64
+
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+class TestParseJob(TransactionCase):
+
+    def setUp(self):
+        super(TestParseJob, self).setUp()
+        self.Job = self.env['dino.parse.job']
+        self.agent = self.env['dino.parser.agent'].create({
+            'name': 'Queue Test Agent', 'agent_type': 'regex_universal', 'parse_concurrency': 2,
+        })
+        self.documents = self.env['dino.operation.document'].create([{
+            'number': f'Q-{i}',
+            'parser_agent_id': self.agent.id,
+            'import_text_content': f'<p>Рахунок № {i}</p>',
+        } for i in range(4)])
+
+    def test_enqueue_skips_pending_documents(self):
+        """A document that already has a queued job is not queued twice"""
+        first = self.Job.enqueue_documents(self.documents[:2])
+        second = self.Job.enqueue_documents(self.documents)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second.document_id, self.documents[2:])
+        self.assertEqual(set(self.documents.mapped('parse_state')), {'queued'})
+
+    def test_pdf_attachment_without_agent_is_rejected(self):
+        """PDF files of a document without a parser agent are not queued"""
+        document = self.env['dino.operation.document'].create({'number': 'Q-NA'})
+        attachment = self.env['dino.document.attachment'].create({
+            'document_id': document.id, 'filename': 'invoice.pdf',
+            'file_data': base64.b64encode(b'%PDF-1.4'),
+        })
+
+        with self.assertRaises(UserError):
+            self.Job.enqueue_attachments(attachment)
+        self.assertFalse(self.Job.search([('attachment_id', '=', attachment.id)]))
+
+    def test_pick_respects_agent_concurrency(self):
+        """No more jobs of an agent are picked than its parse_concurrency allows"""
+        jobs = self.Job.enqueue_documents(self.documents)
+        jobs[0]._mark_running()
+
+        picked = self.Job._pick_job_ids(limit=10)
+
+        self.assertEqual(len(picked), 1)
+        self.assertNotIn(jobs[0].id, picked)
+
+    def test_failed_job_is_retried_then_errors(self):
+        """Technical errors go back to the queue until max_attempts is reached"""
+        job = self.Job.enqueue_documents(self.documents[:1])
+        job.max_attempts = 2
+        job._mark_running()
+        job._mark_failed(ConnectionError('timeout'))
+        self.assertEqual(job.state, 'queued')
+
+        job._mark_running()
+        job._mark_failed(ConnectionError('timeout'))
+        self.assertEqual(job.state, 'error')
+        self.assertEqual(self.documents[0].parse_state, 'error')
+
+    def test_agent_stats_are_incremented_outside_job_transaction(self):
+        """Agent counters are added in place and visible after the ORM cache is reset"""
+        self.agent._add_stats({'usage_count': 1, 'cache_misses': 2}, latencies=[1.5, 4.0])
+        self.agent._add_stats({'usage_count': 1})
+
+        self.assertEqual(self.agent.usage_count, 2)
+        self.assertEqual(self.agent.cache_misses, 2)
+        self.assertEqual(self.agent.latency_samples, 2)
+# End of file tests/test_parse_job.py
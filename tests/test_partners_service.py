@@ -0,0 +1,66 @@
+#
+#  -*- File: tests/test_partners_service.py -*-
+#
+import threading
+import time
+
+import api_integration.services.partners_service as partners_service
+from api_integration.services.partners_service import RateLimiter, fetch_registry_batch
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    clock = FakeClock()
+    limiter = RateLimiter(4, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        limiter.wait('adm.tools')
+    limiter.wait('other.host')
+
+    # 4 req/s -> 0.25s between slots on the same host, other host is independent
+    assert clock.sleeps == [0.25, 0.5]
+
+
+def test_rate_limiter_disabled():
+    clock = FakeClock()
+    limiter = RateLimiter(0, clock=clock, sleep=clock.sleep)
+    limiter.wait('adm.tools')
+    limiter.wait('adm.tools')
+    assert clock.sleeps == []
+
+
+def test_fetch_registry_batch_runs_in_parallel(monkeypatch):
+    active = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def fake_fetch(code):
+        with lock:
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+        time.sleep(0.05)
+        with lock:
+            active['now'] -= 1
+        if code == 'bad':
+            raise ValueError('registry down')
+        return {'egrpou': code, 'name': f'Company {code}'}
+
+    monkeypatch.setattr(partners_service, 'fetch_partner_registry_data', fake_fetch)
+
+    codes = [str(i) for i in range(8)] + ['bad']
+    results, errors = fetch_registry_batch(codes, workers=4, rate=0)
+
+    assert set(results) == set(codes) - {'bad'}
+    assert results['3'] == {'egrpou': '3', 'name': 'Company 3'}
+    assert errors == {'bad': 'registry down'}
+    assert 1 < active['max'] <= 4
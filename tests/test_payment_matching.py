@@ -0,0 +1,84 @@
+#
+#  -*- File: tests/test_payment_matching.py -*-
+#
+from datetime import date
+
+from finance.services.payment_matching import (
+    Candidate, MatchIndex, Transaction, description_numbers, match_transactions, normalize_number,
+)
+
+DAY = date(2024, 3, 15)
+
+
+def _payment(id, amount, number=None, edrpou='40000001', partner_id=1, day=DAY):
+    return Candidate('payment', id, partner_id, edrpou, amount, day, number, 100 + id)
+
+
+def _transaction(id, amount, description='', edrpou='40000001', partner_id=None, day=DAY):
+    return Transaction(id, partner_id, edrpou, amount, day, description)
+
+
+def test_normalize_number():
+    assert normalize_number('№ 00123') == '123'
+    assert normalize_number('рах-45/2') == 'РАХ-45/2'
+    assert normalize_number('N12') == '12'
+    assert normalize_number('без номера') is None
+    assert description_numbers('Оплата за товар згідно рах. №0045 від 01.03.2024') >= {'45', '2024'}
+
+
+def test_partner_amount_number_is_auto():
+    index = MatchIndex([_payment(1, 1500.0, '45'), _payment(2, 900.0, '46')])
+    results = match_transactions(index, [_transaction(10, 1500.0, 'Оплата згідно рахунку №45')])
+
+    transaction, matches, auto = results[0]
+    assert auto and matches[0].candidate.id == 1
+    assert matches[0].score == 1.0
+    assert set(matches[0].reasons) == {'partner', 'amount', 'number', 'date'}
+
+
+def test_ambiguous_amount_goes_to_review():
+    index = MatchIndex([_payment(1, 500.0), _payment(2, 500.0)])
+    (transaction, matches, auto), = match_transactions(index, [_transaction(10, 500.0)])
+
+    assert not auto
+    assert [m.candidate.id for m in matches] == [1, 2]
+
+
+def test_auto_match_consumes_candidate():
+    index = MatchIndex([_payment(1, 700.0, '7')])
+    results = match_transactions(index, [
+        _transaction(10, 700.0, 'рахунок 7'),
+        _transaction(11, 700.0, 'рахунок 7'),
+    ])
+
+    assert [(t.id, auto) for t, _matches, auto in results] == [(10, True)]
+    assert len(index) == 0
+
+
+def test_date_window_and_number_without_partner():
+    far = date(2024, 6, 1)
+    index = MatchIndex([_payment(1, 250.0, day=far), _payment(2, 250.0, 'INV-9', edrpou=None, partner_id=None, day=far)])
+    (transaction, matches, auto), = match_transactions(index, [_transaction(10, 250.0, 'invoice INV-9')])
+
+    # Платеж 1 вне окна дат и без номера - отброшен; платеж 2 найден по сумме и номеру
+    assert [m.candidate.id for m in matches] == [2]
+    assert matches[0].reasons == ['amount', 'number'] and not auto
+
+
+def test_no_candidates_no_result():
+    index = MatchIndex([_payment(1, 100.0)])
+    assert match_transactions(index, [_transaction(10, 101.0, edrpou='39999999')]) == []
+
+
+def test_direction_and_currency_must_agree():
+    index = MatchIndex([
+        Candidate('document', 1, 1, '40000001', -1500.0, DAY, '45', None, 980),
+        Candidate('payment', 2, 1, '40000001', 1500.0, DAY, '45', 100, 980),
+    ])
+    incoming_usd = Transaction(10, None, '40000001', 1500.0, DAY, 'рахунок 45', 840)
+    assert match_transactions(index, [incoming_usd]) == []
+
+    incoming_uah = incoming_usd._replace(currency_id=980)
+    (transaction, matches, auto), = match_transactions(index, [incoming_uah])
+    assert auto and [(m.candidate.kind, m.candidate.id) for m in matches] == [('payment', 2)]
+# End of file tests/test_payment_matching.py
@@ -2,8 +2,9 @@
 #  -*- File: tests/test_privat_client.py -*-
 #
 import json
+import pytest
 import responses
-from api_integration.services.privat_client import PrivatClient
+from api_integration.services.privat_client import PrivatClient, TokenBucket, iter_prefetched
 
 BASE = "https://acp.privatbank.ua/api"
 
@@ -49,4 +50,29 @@ def test_fetch_transactions_iter_pagination():
         assert len(pages) == 2
         assert pages[0]['transactions'][0]['id'] == 1
         assert pages[1]['transactions'][0]['id'] == 2
+
+
+def test_iter_prefetched_merges_all_sources():
+    sources = [iter([[1], [2]]), iter([[3]]), iter([])]
+    pages = list(iter_prefetched(sources, depth=1))
+    assert sorted(p[0] for p in pages) == [1, 2, 3]
+
+
+def test_iter_prefetched_propagates_producer_error():
+    def failing():
+        yield [1]
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        list(iter_prefetched([failing()], depth=2))
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    import time
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # первый токен сразу, еще 5 - по 20 мс
+    assert time.monotonic() - started >= 0.09
 # End of file tests/test_privat_client.py
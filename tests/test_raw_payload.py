@@ -0,0 +1,31 @@
+#
+#  -*- File: tests/test_raw_payload.py -*-
+#
+import json
+
+from finance.services.raw_payload import pack, to_canonical_json, unpack
+
+PRIVAT_ROW = {'ID': '12345', 'SUM': '100.50', 'TRANTYPE': 'D', 'OSND': 'Оплата за товар', 'REF': None, 'FL_REAL': True}
+
+
+def test_legacy_repr_and_json_give_same_canonical_form():
+    from_repr = to_canonical_json(str(PRIVAT_ROW))
+    from_json = to_canonical_json(json.dumps(PRIVAT_ROW, indent=4, ensure_ascii=False))
+    from_dict = to_canonical_json(PRIVAT_ROW)
+
+    assert from_repr == from_json == from_dict
+    assert json.loads(from_repr) == PRIVAT_ROW
+    assert ' ' not in from_dict.replace('Оплата за товар', '')
+
+
+def test_pack_roundtrip_and_compression():
+    rows = [dict(PRIVAT_ROW, ID=str(i)) for i in range(50)]
+    packed = pack(str(rows))
+
+    assert json.loads(unpack(packed)) == rows
+    assert len(packed) < len(str(rows)) / 4
+
+
+def test_unrecognized_text_is_kept():
+    assert json.loads(unpack(pack('not a dict {'))) == 'not a dict {'
+    assert unpack(None) == ''
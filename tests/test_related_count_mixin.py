@@ -0,0 +1,46 @@
+#
+#  -*- File: tests/test_related_count_mixin.py -*-
+#
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+
+class TestRelatedCountMixin(TransactionCase):
+
+    def setUp(self):
+        super(TestRelatedCountMixin, self).setUp()
+        self.Bank = self.env['dino.bank']
+        self.BankAccount = self.env['dino.bank.account']
+
+    def test_counts_for_recordset(self):
+        """All counters of a recordset are correct, banks without accounts get 0"""
+        banks = self.Bank.create([{'name': 'Bank A'}, {'name': 'Bank B'}, {'name': 'Bank C'}])
+        currency = self.env.ref('base.UAH')
+        self.BankAccount.create([
+            {'name': 'A1', 'account_number': 'UAA1', 'bank_id': banks[0].id, 'currency_id': currency.id},
+            {'name': 'A2', 'account_number': 'UAA2', 'bank_id': banks[0].id, 'currency_id': currency.id},
+            {'name': 'B1', 'account_number': 'UAB1', 'bank_id': banks[1].id, 'currency_id': currency.id},
+        ])
+        banks.invalidate_recordset(['account_count'])
+
+        self.assertEqual(banks.mapped('account_count'), [2, 1, 0])
+
+    def test_one_query_per_relation(self):
+        """The number of queries does not grow with the number of records"""
+        banks = self.Bank.create([{'name': f'Bank {i}'} for i in range(20)])
+        banks.invalidate_recordset(['account_count'])
+
+        with self.assertQueryCount(1):
+            banks.mapped('account_count')
+
+    def test_only_read_counter_is_computed(self):
+        """Reading one of several counters runs only its own grouped query"""
+        partners = self.env['dino.partner'].create([{'name': f'Partner {i}'} for i in range(5)])
+        self.env['dino.partner.bank.account'].create({'partner_id': partners[0].id, 'iban': 'UA01'})
+        self.env.flush_all()
+        partners.invalidate_recordset()
+
+        with self.assertQueryCount(1):
+            counts = partners.mapped('bank_account_count')
+        self.assertEqual(counts, [1, 0, 0, 0, 0])
+# End of file tests/test_related_count_mixin.py
@@ -0,0 +1,57 @@
+#
+#  -*- File: tests/test_run_metrics.py -*-
+#
+import threading
+from types import SimpleNamespace
+
+import requests
+import responses
+
+from api_integration.services import run_metrics
+from api_integration.services.run_metrics import RunMetrics
+
+
+def test_http_time_counted_only_inside_run():
+    session = run_metrics.instrument_session(requests.Session())
+    run_metrics.instrument_session(session)
+    assert session.hooks['response'].count(run_metrics._response_hook) == 1
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.GET, "https://example.test/page", json={}, status=200)
+        rsps.add(rsps.GET, "https://example.test/page", json={}, status=200)
+        session.get("https://example.test/page")  # вне запуска - не учитывается
+
+        with RunMetrics() as metrics:
+            session.get("https://example.test/page")
+
+    assert metrics.http_requests == 1
+    assert metrics.wall_time > 0
+
+
+def test_background_thread_bound_to_run():
+    with RunMetrics() as metrics:
+        def worker(bound):
+            with run_metrics.bind(bound):
+                run_metrics.count('pages', 3)
+            run_metrics.count('pages')  # после выхода из bind - no-op
+
+        t = threading.Thread(target=worker, args=(run_metrics.current(),))
+        t.start()
+        t.join()
+        run_metrics.count('pages')
+
+    assert metrics.counters == {'pages': 4}
+    assert run_metrics.current() is None
+
+
+def test_log_vals_and_query_count():
+    cr = SimpleNamespace(sql_log_count=10)
+    with RunMetrics(cr) as metrics:
+        cr.sql_log_count += 5
+    metrics.set_rows({'steps': [], 'final': {'status': 'success', 'data': {'created': 7, 'updated': 2, 'skipped': 1}}})
+
+    vals = metrics.as_log_vals()
+    assert vals['query_count'] == 5
+    assert vals['rows'] == 10
+    assert vals['rows_per_sec'] > 0
+# End of file tests/test_run_metrics.py